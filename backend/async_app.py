@@ -0,0 +1,502 @@
+# ============================================================
+# PastCAST-AI Backend — async serving mode (aiohttp)
+#
+# Same routes and JSON contracts as app.py, on one event loop per worker:
+#
+#   cd backend && gunicorn -c gunicorn.conf.py async_app:create_app \
+#       --worker-class aiohttp.GunicornWebWorker
+#   (or: python async_app.py)
+#
+# - Weather and knowledge lookups are coroutines over one pooled aiohttp
+#   client (utils.async_http): hundreds of concurrent lookups wait on
+#   sockets, not threads, and never queue behind generation.
+# - SQLite reads (history, ETags, prompt memory) run on DB_EXECUTOR.
+# - LLM generation, streaming, translation and the semantic cache run on
+#   MODEL_EXECUTOR, sized to what admission control lets through; LLM
+#   requests beyond that are shed at once, as in the threaded app.
+# - Probability, trends and metrics rendering use asyncio's default pool.
+# - Request deadlines, traces, CORS, compression and /metrics behave as
+#   in app.py; both share utils.chat_service (routing, tools, bodies),
+#   and create_app() runs its boot() like app.py does at import.
+# Needs `pip install -r requirements-async.txt`.
+# ============================================================
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import ETag, web
+
+from utils.chat_service import (
+    HISTORY_LIMIT, HISTORY_SYNC_LIMIT, RETRY_AFTER_SECONDS, WEATHER_NO_KEY,
+    assistant_capabilities, client_budget, conversation_history, describe_weather, done_event,
+    health_body, history_etag, history_rows, knowledge_reply, probability_batch_response,
+    probability_response, remember_answer, reply_body, retry_prompt_for, routed, semantic_eligible,
+    session_id_for, shed, shed_body, sse_event, translate_response, trends_for, wants_timings,
+    weather_city,
+)
+from utils import admission, async_http, chat_service, http_compression, metrics
+from utils.admission import Overloaded
+from utils.db import add_message, clear_history
+from utils.intent_router import CAPABILITIES, TRANSLATION, WEATHER, classify
+from utils.model_loader import generate_nlm_reply, stream_nlm_reply, translate_text
+from utils.weather_tools import OPENWEATHER_API, weather_client
+from utils.wiki_search import knowledge
+
+# One thread per generation slot admission control can hand out or queue,
+# plus a few for translation / semantic-cache calls.
+ASYNC_MODEL_THREADS = int(os.getenv(
+    "ASYNC_MODEL_THREADS", str(admission.NLM_MAX_CONCURRENT + admission.NLM_MAX_WAITING + 4)))
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", "4"))
+
+# ============================================================
+# EXECUTORS
+# ============================================================
+
+MODEL_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_MODEL_THREADS, thread_name_prefix="async-model")
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix="async-db")
+
+_model_jobs = 0     # model calls submitted and not finished (only touched on the event loop)
+
+metrics.GaugeFunc("pastcast_async_model_jobs", "Model calls running or queued on the async model executor.",
+                  lambda: _model_jobs)
+
+
+async def in_executor(executor, fn, *args, **kwargs):
+    """Run a blocking call on `executor` with this request's deadline and trace."""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def in_db(fn, *args, **kwargs):
+    return await in_executor(DB_EXECUTOR, fn, *args, **kwargs)
+
+
+async def in_model(fn, *args, **kwargs):
+    global _model_jobs
+    _model_jobs += 1
+    try:
+        return await in_executor(MODEL_EXECUTOR, fn, *args, **kwargs)
+    finally:
+        _model_jobs -= 1
+
+
+def admit_llm():
+    """Shed at once when every model thread is taken: the job would only wait out its deadline in the queue."""
+    if _model_jobs >= ASYNC_MODEL_THREADS:
+        raise Overloaded("queue_full", "async model executor is saturated")
+
+
+_DONE = object()
+
+
+async def iterate_in(executor, fn, *args, **kwargs):
+    """
+    Async iterator over the blocking generator fn(*args, **kwargs): the
+    generator is created and advanced on `executor`, and closed there
+    (releasing its generation slot) once the consumer stops.
+    """
+    global _model_jobs
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    _model_jobs += 1
+    gen = pending = None
+    try:
+        gen = await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+        while True:
+            pending = executor.submit(ctx.run, next, gen, _DONE)
+            item = await asyncio.wrap_future(pending)
+            pending = None
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        _model_jobs -= 1
+        if gen is not None:
+            def close(_=None):
+                executor.submit(ctx.run, gen.close)
+            # A next() still running on its thread must finish before the close
+            if pending is None:
+                close()
+            else:
+                pending.add_done_callback(close)
+
+# ============================================================
+# HTTP PLUMBING
+# ============================================================
+
+def dumps(obj) -> str:
+    """Same JSON bytes as Flask's jsonify (sorted keys, compact, ASCII)."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def json_response(body, status: int = 200, headers=None) -> web.Response:
+    return web.json_response(body, status=status, headers=headers, dumps=dumps)
+
+
+async def json_body(request, silent=False) -> dict:
+    """
+    Flask's request.get_json() or {}: a non-JSON content type is a 415 and
+    a malformed body a 400, or {} for both with silent=True.
+    """
+    mimetype = request.content_type
+    is_json = mimetype == "application/json" or (mimetype.startswith("application/") and mimetype.endswith("+json"))
+    if not is_json:
+        if silent:
+            return {}
+        raise web.HTTPUnsupportedMediaType(text="Did not attempt to load JSON data because the request "
+                                                "Content-Type was not 'application/json'.")
+    try:
+        return json.loads(await request.text()) or {}
+    except ValueError:
+        if silent:
+            return {}
+        raise web.HTTPBadRequest(text="Failed to decode JSON object")
+
+
+def route_of(request) -> str:
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else "unmatched"
+
+
+@web.middleware
+async def request_trace(request, handler):
+    """Per-request trace, deadline and latency histogram (app.py's before/after_request hooks)."""
+    started = time.perf_counter()
+    metrics.start_trace()
+    admission.start_deadline(client_budget(request.headers))
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            route=route_of(request), method=request.method, status=status,
+        )
+
+
+@web.middleware
+async def compress(request, handler):
+    """Compress whole JSON bodies like http_compression.compress_response (streams pass through)."""
+    response = await handler(request)
+    if (
+        not http_compression.COMPRESS
+        or not isinstance(response, web.Response)
+        or not 200 <= response.status < 300 or response.status == 204
+        or "Content-Encoding" in response.headers
+        or not (response.content_type or "").startswith(http_compression.COMPRESSIBLE_TYPES)
+        or not isinstance(response.body, bytes)
+    ):
+        return response
+    vary = response.headers.get("Vary")
+    response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+    data = response.body
+    if len(data) < http_compression.COMPRESS_MIN_BYTES:
+        return response
+    accept = http_compression.parse_accept_encoding(request.headers.get("Accept-Encoding"))
+    encoding = http_compression.choose_encoding(accept)
+    if encoding is None:
+        return response
+
+    response.body = await asyncio.to_thread(http_compression.encode, data, encoding)
+    response.headers["Content-Encoding"] = encoding
+    etag = response.etag
+    if etag is not None and not etag.is_weak:
+        response.etag = ETag(value=etag.value, is_weak=True)
+    return response
+
+
+CORS_ALLOW_METHODS = "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+@web.middleware
+async def cors_preflight(request, handler):
+    """Answer CORS preflights for any path (flask-cors does the same)."""
+    if request.method == "OPTIONS" and "Access-Control-Request-Method" in request.headers:
+        headers = {"Access-Control-Allow-Methods": CORS_ALLOW_METHODS}
+        if "Access-Control-Request-Headers" in request.headers:
+            headers["Access-Control-Allow-Headers"] = request.headers["Access-Control-Request-Headers"]
+        return web.Response(status=200, headers=headers)
+    return await handler(request)
+
+
+async def cors_headers(request, response):
+    """on_response_prepare: CORS headers on every response, streams included."""
+    origin = request.headers.get("Origin")
+    if origin in chat_service.CORS_ORIGINS:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Access-Control-Expose-Headers"] = ", ".join(chat_service.CORS_EXPOSE_HEADERS)
+        vary = response.headers.get("Vary")
+        response.headers["Vary"] = f"{vary}, Origin" if vary else "Origin"
+
+# ============================================================
+# MASTER ROUTER — async stages
+# ============================================================
+
+async def get_weather(city: str):
+    """chat_service.get_weather on the event loop (pooled, cached, coalesced)."""
+    if not OPENWEATHER_API:
+        return WEATHER_NO_KEY
+
+    cleaned_city = weather_city(city)
+    try:
+        r = await weather_client.current_async(cleaned_city, timeout=admission.budget(weather_client.timeout))
+    except Exception:
+        return f"Couldn't fetch weather for {cleaned_city}."
+    return describe_weather(cleaned_city, r)
+
+
+async def semantic_answer(user_input: str):
+    # Tool and follow-up messages never touch the embedding model
+    if not semantic_eligible(user_input):
+        return None
+    return await in_model(chat_service.semantic_answer, user_input)
+
+
+async def plan_response(user_input: str, session_id):
+    """chat_service.plan_response with the lookups awaited instead of blocking a thread."""
+    with metrics.stage("route"):
+        intent = classify(user_input)
+
+    # 1) TRANSLATION
+    if intent.kind == TRANSLATION:
+        routed("translation")
+        if not intent.target:
+            return "Please specify a target language (e.g., Hindi).", None
+        trends = await asyncio.to_thread(trends_for, user_input)
+        with metrics.stage("translate"):
+            return trends + await in_model(translate_text, intent.phrase, intent.target), None
+
+    # 2) CAPABILITIES
+    if intent.kind == CAPABILITIES:
+        routed("capabilities")
+        return assistant_capabilities(), None
+
+    # 3) WEATHER — never waits on the model executor
+    if intent.kind == WEATHER:
+        routed("weather")
+        if not intent.city:
+            return "Please specify a city, e.g., 'weather in Pune'.", None
+        with metrics.stage("weather"):
+            return await get_weather(intent.city), None
+
+    # 4–6) WHO-IS / WIKIPEDIA / DUCKDUCKGO
+    with metrics.stage("knowledge_lookup"):
+        found = await knowledge.lookup_async(user_input, person=intent.who,
+                                             deadline=admission.budget(knowledge.deadline))
+    # trends_for reads the CSV index
+    return await asyncio.to_thread(knowledge_reply, user_input, intent.who, found)
+
+
+async def full_response(user_input: str, session_id):
+    """chat_service.full_response: Overloaded carries the tool output in `partial`."""
+    cached = await semantic_answer(user_input)
+    if cached is not None:
+        return cached
+    text, prompt = await plan_response(user_input, session_id)
+    if prompt is None:
+        return text
+    try:
+        admit_llm()
+        history = await in_db(conversation_history, user_input, session_id)
+        with metrics.stage("nlm"):
+            reply = text + await in_model(generate_nlm_reply, prompt, history=history)
+    except Overloaded as e:
+        e.partial = text
+        raise
+    await in_model(remember_answer, user_input, reply.strip())
+    return reply
+
+
+async def stream_reply(request, user_input: str, session_id, timings=False):
+    """app.stream_reply as an aiohttp StreamResponse (same SSE frames)."""
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    async def send(frame: str):
+        await response.write(frame.encode("utf-8"))
+
+    parts = []
+    shed_reason = None
+    planned = False
+    try:
+        cached = await semantic_answer(user_input)
+        text, prompt = (cached, None) if cached is not None else await plan_response(user_input, session_id)
+        planned = prompt is not None
+
+        if text:
+            parts.append(text)
+            await send(sse_event({"delta": text}))
+
+        history = None
+        if prompt is None and not text.strip():
+            prompt = retry_prompt_for(user_input)
+        elif prompt is not None:
+            history = await in_db(conversation_history, user_input, session_id)
+
+        if prompt is not None:
+            admit_llm()
+            t0 = time.perf_counter()
+            # aclosing: a client that disconnects mid-stream closes the generator,
+            # which stops its generation at the next decoding step
+            async with contextlib.aclosing(iterate_in(MODEL_EXECUTOR, stream_nlm_reply,
+                                                      prompt, history=history)) as chunks:
+                async for chunk in chunks:
+                    if len(parts) == bool(text):
+                        metrics.record("nlm_first_chunk", time.perf_counter() - t0)
+                    parts.append(chunk)
+                    await send(sse_event({"delta": chunk}))
+            metrics.record("nlm_stream", time.perf_counter() - t0)
+    except Overloaded as e:
+        shed_reason = e.reason
+        notice = ("\n\n" if parts else "") + shed(e)
+        parts.append(notice)
+        await send(sse_event({"delta": notice}))
+
+    reply = "".join(parts).strip()
+    if shed_reason is None:
+        await in_db(add_message, "ai", reply, session_id)
+        if planned:
+            await in_model(remember_answer, user_input, reply)
+    await send(done_event(reply, shed_reason, timings))
+    await response.write_eof()
+    return response
+
+# ============================================================
+# ROUTES
+# ============================================================
+
+routes = web.RouteTableDef()
+
+
+@routes.post("/weather/probability")
+async def weather_probability(request):
+    body, status = await asyncio.to_thread(probability_response, await json_body(request))
+    return json_response(body, status)
+
+
+@routes.post("/weather/probability/batch")
+async def weather_probability_batch(request):
+    body, status = await asyncio.to_thread(probability_batch_response, await json_body(request))
+    return json_response(body, status)
+
+
+@routes.post("/api/message")
+async def api_message(request):
+    data = await json_body(request)
+    user_input = (data.get("text") or "").strip()
+    session_id = session_id_for(data, request.headers, request.query)
+
+    if not user_input:
+        return json_response({"reply": "Please enter a message."})
+
+    await in_db(add_message, "user", user_input, session_id)
+
+    timings = wants_timings(data, request.headers, request.query)
+    stream = data.get("stream") or request.query.get("stream", "").lower() in ("1", "true", "yes")
+    if stream:
+        return await stream_reply(request, user_input, session_id, timings)
+
+    try:
+        reply = (await full_response(user_input, session_id)).strip()
+
+        if not reply:
+            admit_llm()
+            reply = await in_model(generate_nlm_reply, retry_prompt_for(user_input))
+    except Overloaded as e:
+        return json_response(shed_body(e), 503, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    await in_db(add_message, "ai", reply, session_id)
+    return json_response(reply_body(reply, timings))
+
+
+@routes.post("/api/translate")
+async def api_translate(request):
+    body, status = await in_model(translate_response, await json_body(request))
+    return json_response(body, status)
+
+
+@routes.get("/api/history")
+async def api_history(request):
+    """app.api_history: ETag / 304 and ?after_id= sync, with the SQLite reads off the loop."""
+    session_id = session_id_for(None, request.headers, request.query)
+    try:
+        after_id = int(request.query["after_id"]) if "after_id" in request.query else None
+    except ValueError:
+        after_id = None
+    limit = HISTORY_LIMIT if after_id is None else HISTORY_SYNC_LIMIT
+    etag = await in_db(history_etag, session_id, after_id, limit)
+
+    if any(tag.value in (etag, "*") for tag in request.if_none_match or ()):
+        metrics.HISTORY_POLLS.inc(result="not_modified")
+        response = web.Response(status=304)
+    else:
+        metrics.HISTORY_POLLS.inc(result="full" if after_id is None else "delta")
+        response = json_response(await in_db(history_rows, session_id, after_id, limit))
+    response.etag = ETag(value=etag, is_weak=True)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "X-Session-ID"
+    return response
+
+
+@routes.post("/api/clear")
+async def api_clear(request):
+    data = await json_body(request, silent=True)
+    await in_db(clear_history, session_id_for(data, request.headers, request.query))
+    return json_response({"message": "Chat memory cleared."})
+
+
+@routes.get("/metrics")
+async def metrics_endpoint(request):
+    text = await asyncio.to_thread(metrics.render)
+    return web.Response(body=text.encode("utf-8"), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+@routes.get("/health")
+async def health(request):
+    body, ready = await asyncio.to_thread(health_body)
+    body["serving"] = {
+        "mode": "async",
+        "model_threads": ASYNC_MODEL_THREADS,
+        "model_jobs": _model_jobs,
+        "db_threads": ASYNC_DB_THREADS,
+    }
+
+    # Readiness probes (/health?ready=1) get a 503 until the LLM is loaded
+    if request.query.get("ready") and not ready:
+        return json_response(body, 503)
+    return json_response(body)
+
+
+async def close_clients(application):
+    await async_http.close()
+
+
+async def create_app():
+    """aiohttp application factory (gunicorn: async_app:create_app)."""
+    chat_service.boot()
+    application = web.Application(middlewares=[cors_preflight, request_trace, compress])
+    application.add_routes(routes)
+    application.on_response_prepare.append(cors_headers)
+    application.on_cleanup.append(close_clients)
+    return application
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
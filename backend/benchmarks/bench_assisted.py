@@ -0,0 +1,83 @@
+# backend/benchmarks/bench_assisted.py
+#
+# Assisted (speculative) decoding vs plain greedy decoding on a fixed prompt set.
+#
+#   cd backend && NLM_DRAFT_MODEL_ID=Qwen/Qwen2.5-0.5B-Instruct \
+#       python benchmarks/bench_assisted.py --max-tokens 128 [--draft-tokens 3,5,8]
+#
+# Loads the base + draft model once, then generates every prompt without the
+# draft and with it (for each --draft-tokens value). Reports per-reply
+# latency, the share of drafted tokens the base model accepted, and whether
+# every reply is identical to plain greedy decoding (it must be).
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from eval_precision import PROMPTS, SYSTEM  # noqa: E402
+
+
+def run(nlp_model, max_tokens: int) -> dict:
+    latencies, outputs = [], []
+    before = dict(nlp_model._draft_totals)
+    for p in PROMPTS:
+        prompt = f"{SYSTEM}<|user|> {p}\n<|assistant|>"
+        t = time.perf_counter()
+        text, _ = nlp_model._generate_batch(max_tokens, [(prompt, ())])[0]
+        latencies.append(time.perf_counter() - t)
+        outputs.append(text)
+    drafted = nlp_model._draft_totals["drafted"] - before["drafted"]
+    accepted = nlp_model._draft_totals["accepted"] - before["accepted"]
+    return {
+        "latencies": latencies,
+        "outputs": outputs,
+        "acceptance": accepted / drafted if drafted else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-tokens", type=int, default=128)
+    ap.add_argument("--draft-tokens", default="", help="comma-separated NLM_DRAFT_TOKENS values to try")
+    args = ap.parse_args()
+
+    from utils import nlp_model
+    if not nlp_model.NLM_DRAFT_MODEL_ID:
+        sys.exit("Set NLM_DRAFT_MODEL_ID to the draft checkpoint to compare against.")
+
+    nlp_model.load_base_model()
+    draft = nlp_model.draft_model
+    if draft is None:
+        sys.exit("Draft model failed to load (see above).")
+
+    nlp_model._generate_batch(4, [(f"{SYSTEM}<|user|> Hello\n<|assistant|>", ())])  # warm-up
+
+    nlp_model.draft_model = None
+    results = {"greedy": run(nlp_model, args.max_tokens)}
+    nlp_model.draft_model = draft
+
+    ks = [int(k) for k in args.draft_tokens.split(",") if k.strip()] or [nlp_model.NLM_DRAFT_TOKENS]
+    for k in ks:
+        draft.generation_config.num_assistant_tokens = k
+        results[f"draft k={k}"] = run(nlp_model, args.max_tokens)
+
+    ref = results["greedy"]
+    base_p50 = statistics.median(ref["latencies"])
+    print(f"\nbase: {nlp_model.BASE_MODEL_ID}   draft: {nlp_model.NLM_DRAFT_MODEL_ID}   "
+          f"prompts: {len(PROMPTS)}   max_tokens: {args.max_tokens}\n")
+    print(f"{'mode':<12}{'p50 s':>8}{'total s':>9}{'speedup':>9}{'accept':>8}{'identical':>11}")
+    for mode, r in results.items():
+        p50 = statistics.median(r["latencies"])
+        identical = sum(a == b for a, b in zip(ref["outputs"], r["outputs"]))
+        accept = f"{r['acceptance']:.0%}" if r["acceptance"] is not None else "-"
+        print(f"{mode:<12}{p50:>8.3f}{sum(r['latencies']):>9.2f}{base_p50 / p50:>8.2f}x"
+              f"{accept:>8}{identical:>8}/{len(PROMPTS)}")
+
+
+if __name__ == "__main__":
+    main()
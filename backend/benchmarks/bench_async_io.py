@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_async_io.py
+#
+# Concurrent knowledge lookups: the threaded path (KnowledgeLookup.lookup
+# from one thread per request, as under gunicorn gthread) against the
+# event-loop path used by async_app.py (lookup_async, one task each).
+#
+#   cd backend && python benchmarks/bench_async_io.py --concurrency 50,200,500 --latency-ms 150
+#
+# Both run on a FixtureBackend whose every call sleeps --latency-ms, so the
+# numbers isolate how each model waits on upstream I/O. The cache is reset
+# before each run; results are checked for equality before timings print.
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.wiki_search import FixtureBackend, KnowledgeLookup  # noqa: E402
+
+
+def fixture(n: int, latency_ms: float) -> dict:
+    return {
+        "search": {f"topic {i}": [f"Topic {i}", f"Topic {i} (disambiguation)"] for i in range(n)},
+        "summaries": {f"Topic {i}": f"Topic {i} is a thing. It has facts. More facts." for i in range(n)},
+        "instant": {f"topic {i}": f"Instant {i}" for i in range(n)},
+        "latency_ms": latency_ms,
+    }
+
+
+def percentiles(lat: list) -> tuple:
+    lat = sorted(lat)
+    return statistics.median(lat), lat[min(len(lat) - 1, int(0.99 * len(lat)))]
+
+
+def run_threaded(knowledge: KnowledgeLookup, queries: list) -> tuple:
+    results, latencies = [None] * len(queries), [0.0] * len(queries)
+    start = threading.Barrier(len(queries) + 1)
+
+    def one(i, q):
+        start.wait()
+        t = time.perf_counter()
+        results[i] = knowledge.lookup(q)
+        latencies[i] = time.perf_counter() - t
+
+    threads = [threading.Thread(target=one, args=(i, q)) for i, q in enumerate(queries)]
+    for th in threads:
+        th.start()
+    t0 = time.perf_counter()
+    start.wait()
+    for th in threads:
+        th.join()
+    return results, latencies, time.perf_counter() - t0
+
+
+async def run_async(knowledge: KnowledgeLookup, queries: list) -> tuple:
+    async def one(q):
+        t = time.perf_counter()
+        found = await knowledge.lookup_async(q)
+        return found, time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    out = await asyncio.gather(*(one(q) for q in queries))
+    return [r for r, _ in out], [s for _, s in out], time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", default="50,200,500")
+    ap.add_argument("--latency-ms", type=float, default=150)
+    ap.add_argument("--workers", type=int, default=16, help="KnowledgeLookup pool size (KNOWLEDGE_WORKERS)")
+    args = ap.parse_args()
+
+    print(f"upstream latency: {args.latency_ms:.0f} ms per call   knowledge pool: {args.workers} threads\n")
+    print(f"{'concurrency':>12}{'mode':>10}{'wall s':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'timeouts':>10}")
+    for n in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        queries = [f"topic {i}" for i in range(n)]
+        rows = {}
+        for mode in ("threads", "async"):
+            knowledge = KnowledgeLookup(FixtureBackend(fixture(n, args.latency_ms)), max_workers=args.workers)
+            if mode == "threads":
+                results, lat, wall = run_threaded(knowledge, queries)
+            else:
+                results, lat, wall = asyncio.run(run_async(knowledge, queries))
+            rows[mode] = [(r.person, r.wiki, r.ddg) for r in results]
+            p50, p99 = percentiles(lat)
+            print(f"{n:>12}{mode:>10}{wall:>9.2f}{n / wall:>9.0f}{p50 * 1000:>9.0f}{p99 * 1000:>9.0f}"
+                  f"{knowledge.stats()['timeouts']:>10}")
+        answered = sum(a == b for a, b in zip(rows["threads"], rows["async"]))
+        print(f"{'':>12}{'same':>10} {answered}/{n} results identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# backend/benchmarks/bench_backends.py
+#
+# Parity + latency of the inference backends (utils.inference_backend).
+#
+#   cd backend && pip install "optimum[onnxruntime]" && \
+#       python benchmarks/bench_backends.py --max-tokens 64 [--threads 4,8] [--lang hindi]
+#
+# Each backend runs in its own subprocess: chat generation over the
+# eval_precision prompt set and one translation batch. The first ONNX run
+# exports the models into ONNX_EXPORT_DIR (reported as load time; later
+# runs reuse the export). Decoding is greedy, so parity with torch is
+# measured exactly: identical replies / translations and the share of
+# leading tokens that match.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from eval_precision import PROMPTS, SYSTEM, prefix_agreement, rss_mb  # noqa: E402
+
+SENTENCES = [
+    "The weather today is sunny with a light breeze.",
+    "Carry an umbrella, rain is expected in the evening.",
+    "Temperatures will drop sharply after midnight.",
+    "How are you feeling today?",
+    "The monsoon usually arrives in early June.",
+    "Please drink plenty of water during the heatwave.",
+]
+
+
+def worker(max_tokens: int, lang: str):
+    from utils import nlp_model
+    from utils.translation import translator
+
+    t0 = time.perf_counter()
+    tok, _ = nlp_model.load_base_model()
+    load_s = time.perf_counter() - t0
+
+    nlp_model._generate_batch(4, [(f"{SYSTEM}<|user|> Hello\n<|assistant|>", ())])  # warm-up
+
+    outputs, latencies, new_tokens = [], [], 0
+    for p in PROMPTS:
+        prompt = f"{SYSTEM}<|user|> {p}\n<|assistant|>"
+        t = time.perf_counter()
+        text, _ = nlp_model._generate_batch(max_tokens, [(prompt, ())])[0]
+        latencies.append(time.perf_counter() - t)
+        outputs.append(text)
+        new_tokens += len(tok(text, add_special_tokens=False)["input_ids"])
+
+    t = time.perf_counter()
+    translator.pool.get(lang)
+    translation_load_s = time.perf_counter() - t
+    translator._translate_segments(lang, ["Good morning."])    # warm-up, bypasses the cache
+    t = time.perf_counter()
+    translated = translator._translate_segments(lang, SENTENCES)
+    translation_s = time.perf_counter() - t
+
+    print(json.dumps({
+        "backend": nlp_model.backend.name,
+        "translation_backend": translator.pool.backend.name,
+        "load_s": load_s,
+        "rss_mb": rss_mb(),
+        "latencies": latencies,
+        "tokens_per_s": new_tokens / sum(latencies),
+        "outputs": outputs,
+        "translation_load_s": translation_load_s,
+        "translation_s": translation_s,
+        "translations": [translated[s] for s in SENTENCES],
+    }))
+
+
+def run_mode(name: str, env_extra: dict, max_tokens: int, lang: str) -> dict:
+    env = dict(os.environ, RESPONSE_CACHE_DB="", SEMANTIC_CACHE="0", **env_extra)
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", "--max-tokens", str(max_tokens), "--lang", lang],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} run failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    wanted = env_extra["NLM_BACKEND"]
+    if result["backend"] != wanted or result["translation_backend"] != wanted:
+        raise RuntimeError(f"{name}: asked for {wanted}, got {result['backend']} "
+                           f"(is optimum[onnxruntime] installed?)")
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-tokens", type=int, default=64)
+    ap.add_argument("--lang", default="hindi")
+    ap.add_argument("--threads", default="", help="comma-separated ORT_INTRA_OP_THREADS values to try")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--json", help="also write the raw results here")
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args.max_tokens, args.lang)
+        return
+
+    modes = {"torch": {"NLM_BACKEND": "torch", "TRANSLATION_BACKEND": "torch"}}
+    threads = [t.strip() for t in args.threads.split(",") if t.strip()] or [os.getenv("ORT_INTRA_OP_THREADS", "0")]
+    for n in threads:
+        modes[f"onnx t={n}"] = {"NLM_BACKEND": "onnx", "TRANSLATION_BACKEND": "onnx", "ORT_INTRA_OP_THREADS": n}
+
+    results = {}
+    for name, env_extra in modes.items():
+        print(f"… running {name}", flush=True)
+        results[name] = run_mode(name, env_extra, args.max_tokens, args.lang)
+
+    from transformers import AutoTokenizer
+    from utils.nlp_model import BASE_MODEL_ID
+    tok = AutoTokenizer.from_pretrained(BASE_MODEL_ID)
+    ref = results["torch"]
+
+    print(f"\nmodel: {BASE_MODEL_ID}   prompts: {len(PROMPTS)}   max_tokens: {args.max_tokens}   "
+          f"translation: {args.lang} × {len(SENTENCES)}\n")
+    print(f"{'backend':<12}{'load s':>8}{'RSS MB':>9}{'p50 s':>8}{'p90 s':>8}{'tok/s':>8}"
+          f"{'exact':>8}{'prefix':>8}{'mt s':>8}{'mt exact':>10}")
+    for name, r in results.items():
+        lat = sorted(r["latencies"])
+        p90 = lat[min(len(lat) - 1, int(0.9 * len(lat)))]
+        exact = sum(a == b for a, b in zip(ref["outputs"], r["outputs"])) / len(PROMPTS)
+        prefix = statistics.mean(prefix_agreement(tok, a, b) for a, b in zip(ref["outputs"], r["outputs"]))
+        mt_exact = sum(a == b for a, b in zip(ref["translations"], r["translations"])) / len(SENTENCES)
+        r["exact_match"], r["prefix_agreement"], r["translation_exact_match"] = exact, prefix, mt_exact
+        print(f"{name:<12}{r['load_s']:>8.2f}{r['rss_mb']:>9.0f}{statistics.median(lat):>8.3f}{p90:>8.3f}"
+              f"{r['tokens_per_s']:>8.1f}{exact:>8.0%}{prefix:>8.0%}{r['translation_s']:>8.3f}{mt_exact:>10.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# backend/benchmarks/bench_e2e.py
+#
+# Offline end-to-end benchmark for chat_service.full_response() (the request
+# path behind POST /api/message).
+#
+#   cd backend && python benchmarks/bench_e2e.py --concurrency 1,4,8 --requests 140
+#
+# No network: OpenWeather, Wikipedia and DuckDuckGo are served by a local
+# stub (e2e_fixtures.StubServer), and the Qwen / MarianMT checkpoints are
+# replaced by tiny randomly initialised models built on first run. A fixed
+# query mix covers every router branch; each branch is checked to route
+# where it should before anything is timed.
+#
+# Reports p50/p95/p99 latency and throughput per branch and concurrency.
+# Caches (response, weather, knowledge) are off by default so every call
+# does the full work; --cache on measures the warm path instead.
+#
+# Regression gate:
+#   python benchmarks/bench_e2e.py --json base.json            # on main
+#   python benchmarks/bench_e2e.py --baseline base.json        # on the branch
+# exits 1 if any branch's p95 is more than --tolerance above the baseline.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND)
+
+from e2e_fixtures import StubServer, build_tiny_lm, build_tiny_marian  # noqa: E402
+
+BRANCHES = ["translation", "capabilities", "weather", "who_is", "wiki", "ddg", "general"]
+
+QUERIES = {
+    "translation": [
+        "Translate 'good morning, how are you?' to hindi",
+        "Translate 'thank you very much' into tamil",
+    ],
+    "capabilities": [
+        "What can you do?",
+        "What are your capabilities",
+    ],
+    "weather": [
+        "What's the weather in Pune?",
+        "Temperature in Mumbai",
+        "weather forecast for Delhi",
+        "humidity in Chennai today",
+    ],
+    "who_is": [
+        "Who is Ada Lovelace?",
+        "Who was Alan Turing",
+    ],
+    "wiki": [
+        "Explain photosynthesis",
+        "How does the monsoon work",
+    ],
+    "ddg": [
+        "What is the melting point of tungsten",
+        "How fast is the speed of sound",
+    ],
+    "general": [
+        "Tell me a joke about cats",
+        "Write a short poem about the sea",
+    ],
+}
+
+CACHES_OFF = {
+    "RESPONSE_CACHE_TTL": "-1",
+    "RESPONSE_CACHE_DB": "",
+    "WEATHER_CACHE_TTL": "-1",
+    "WEATHER_STALE_TTL": "-1",
+    "KNOWLEDGE_CACHE_TTL": "-1",
+    "SEMANTIC_CACHE": "0",
+    "SEMANTIC_CACHE_PATH": "",
+}
+
+
+def percentile(sorted_vals: list, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+def classify(service, query: str) -> str:
+    """Which router branch plan_response() takes for `query`."""
+    text, prompt = service.plan_response(query)
+    if prompt is None:
+        kind = service.classify(query).kind
+        return kind if kind in ("translation", "capabilities", "weather") else "who_is"
+    if prompt.startswith(service.WIKI_SYSTEM_PROMPT):
+        return "wiki"
+    if prompt.startswith(service.DDG_SYSTEM_PROMPT):
+        return "ddg"
+    return "general"
+
+
+def setup(args):
+    """Build models, start stubs, configure the environment and boot the chat service."""
+    model_dir = args.model_dir or os.path.join(tempfile.gettempdir(), "pastcast-e2e-models")
+    t0 = time.perf_counter()
+    lm = build_tiny_lm(os.path.join(model_dir, "lm"))
+    mt = build_tiny_marian(os.path.join(model_dir, "marian"))
+    print(f"tiny models ready in {time.perf_counter() - t0:.1f}s ({model_dir})")
+
+    stubs = StubServer(latency_ms=args.stub_latency_ms).start()
+    work = tempfile.mkdtemp(prefix="pastcast-e2e-")
+    os.environ.update(stubs.env())
+    os.environ.update({
+        "NLM_MODEL_ID": lm,
+        "NLM_PRELOAD": "0",
+        "CHAT_DB_PATH": os.path.join(work, "chat.db"),
+    })
+    if args.cache == "off":
+        os.environ.update(CACHES_OFF)
+
+    os.chdir(BACKEND)   # data/trends.csv is resolved relative to the backend
+    from utils import chat_service as service
+    from utils import model_loader
+    from utils.translation import translator
+
+    translator.pool.model_ids = {lang: mt for lang in translator.pool.model_ids}
+
+    t0 = time.perf_counter()
+    service.boot(preload=False)
+    service.trends_store.load()
+    model_loader.start_background_load(warmup=True).join()
+    translator.preload("all")
+    status = model_loader.status()
+    if not status["ready"]:
+        raise SystemExit(f"model failed to load: {status.get('error')}")
+    print(f"app ready in {time.perf_counter() - t0:.1f}s")
+    return service, stubs
+
+
+def check_routing(service):
+    wrong = []
+    for branch, queries in QUERIES.items():
+        for q in queries:
+            got = classify(service, q)
+            if got != branch:
+                wrong.append(f"{q!r}: expected {branch}, routed to {got}")
+    if wrong:
+        raise SystemExit("query mix no longer covers the router as intended:\n  " + "\n  ".join(wrong))
+
+
+def run_level(service, concurrency: int, total: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    mix = [(b, q) for b in BRANCHES for q in QUERIES[b]]
+    jobs = [mix[i % len(mix)] for i in range(total)]
+    rng.shuffle(jobs)
+
+    samples = {b: [] for b in BRANCHES}
+    errors = {b: 0 for b in BRANCHES}
+    lock = threading.Lock()
+
+    def one(job):
+        branch, query = job
+        t = time.perf_counter()
+        try:
+            service.full_response(query)
+            ok = True
+        except Exception:
+            ok = False
+        dt = time.perf_counter() - t
+        with lock:
+            samples[branch].append(dt)
+            errors[branch] += not ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, jobs))
+    wall = time.perf_counter() - t0
+
+    out = {"wall_s": wall, "requests": total, "throughput_rps": total / wall, "branches": {}}
+    for b in BRANCHES:
+        lat = sorted(samples[b])
+        out["branches"][b] = {
+            "n": len(lat),
+            "errors": errors[b],
+            "p50_ms": percentile(lat, 50) * 1000,
+            "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000,
+            "mean_ms": statistics.mean(lat) * 1000 if lat else 0.0,
+            "throughput_rps": len(lat) / wall,
+        }
+    return out
+
+
+def print_level(concurrency: int, r: dict):
+    print(f"\nconcurrency {concurrency}: {r['requests']} requests in {r['wall_s']:.2f}s "
+          f"→ {r['throughput_rps']:.1f} req/s")
+    print(f"  {'branch':<13}{'n':>5}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for b, s in r["branches"].items():
+        print(f"  {b:<13}{s['n']:>5}{s['errors']:>5}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+              f"{s['p99_ms']:>10.1f}{s['throughput_rps']:>9.1f}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Branches whose p95 regressed by more than `tolerance` (fraction) vs the baseline."""
+    regressions = []
+    for level, r in results["levels"].items():
+        base = baseline.get("levels", {}).get(level)
+        if not base:
+            continue
+        for b, s in r["branches"].items():
+            ref = base["branches"].get(b, {}).get("p95_ms")
+            if ref and s["p95_ms"] > ref * (1 + tolerance):
+                regressions.append(f"c={level} {b}: p95 {s['p95_ms']:.1f} ms vs baseline {ref:.1f} ms")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", default="1,4,8", help="comma-separated worker counts")
+    ap.add_argument("--requests", type=int, default=70, help="requests per concurrency level")
+    ap.add_argument("--stub-latency-ms", type=float, default=20.0, help="delay added by every stub API call")
+    ap.add_argument("--cache", choices=["off", "on"], default="off")
+    ap.add_argument("--model-dir", help="where the tiny models are built/reused")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", help="write results here (use as a later --baseline)")
+    ap.add_argument("--baseline", help="results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown vs baseline")
+    args = ap.parse_args()
+
+    service, stubs = setup(args)
+    try:
+        check_routing(service)
+        for q in (q for qs in QUERIES.values() for q in qs):   # warm-up pass, not timed
+            service.full_response(q)
+
+        results = {"config": vars(args), "levels": {}}
+        for c in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+            r = run_level(service, c, args.requests, args.seed)
+            results["levels"][str(c)] = r
+            print_level(c, r)
+        results["stub_requests"] = stubs.requests()
+    finally:
+        stubs.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ p95 regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\n✅ no branch regressed more than {args.tolerance:.0%} at p95")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_router.py
+#
+# Micro-benchmark for utils.intent_router.classify() against the old
+# chain of lower()/`in`/re.search checks from plan_response().
+#
+#   cd backend && python benchmarks/bench_router.py --queries 100000
+#
+# Every query's intent and slots are checked for equality with the legacy
+# router before timings are reported.
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.intent_router import CAPABILITIES, LOOKUP, TRANSLATION, WEATHER, Intent, classify  # noqa: E402
+
+CITIES = ["Pune", "Mumbai", "New Delhi", "Bengaluru tomorrow", "Chennai", "São Paulo", "Cape Town"]
+PEOPLE = ["Ada Lovelace", "Alan Turing", "Marie Curie", "A. P. J. Abdul Kalam", "Grace Hopper"]
+TOPICS = ["photosynthesis", "the monsoon", "black holes", "the French revolution", "quantum computing"]
+PHRASES = ["good morning", "how are you?", "thank you very much", "where is the station"]
+LANGS = ["hindi", "Marathi", "tamil", "telugu", "french"]
+
+TEMPLATES = [
+    lambda r: f"What's the weather in {r.choice(CITIES)}?",
+    lambda r: f"temperature for {r.choice(CITIES)}",
+    lambda r: f"Will it rain? forecast at {r.choice(CITIES)}!",
+    lambda r: "humidity today",
+    lambda r: f"Translate '{r.choice(PHRASES)}' to {r.choice(LANGS)}",
+    lambda r: f"please translate {r.choice(PHRASES)} into {r.choice(LANGS)}",
+    lambda r: "translate this",
+    lambda r: "What can you do?",
+    lambda r: "I need help with my homework",
+    lambda r: f"Who is {r.choice(PEOPLE)}?",
+    lambda r: f"who was {r.choice(PEOPLE)} from",
+    lambda r: f"Explain {r.choice(TOPICS)} in simple words",
+    lambda r: f"Tell me something interesting about {r.choice(TOPICS)}",
+    lambda r: "Write a short poem about the sea and the sky and the long summer evenings " * 3,
+]
+
+
+# ------------------------------------------------------------
+# The router as it was (per-call lower(), `in` scans, uncompiled regexes)
+# ------------------------------------------------------------
+
+def legacy_extract_location(text):
+    cleaned = text.strip()
+    cleaned = re.sub(r"[?.!]+$", "", cleaned)
+    m = re.search(r"\b(?:in|at|for)\s+([A-Za-z\s\.,-]+)$", cleaned, re.I)
+    return m.group(1).strip(" .,-") if m else None
+
+
+def legacy_parse_who_name(q):
+    m = re.match(r"^\s*who\s+(is|was)\s+(.+?)\??\s*$", q, re.I)
+    if not m:
+        return None
+    return re.sub(r"\b(in|from|of|at)\s*$", "", m.group(2), flags=re.I).strip()
+
+
+def legacy_parse_translation_query(text):
+    q = re.search(r"[\"'“”‘’](.+?)[\"'“”‘’]", text)
+    lang = re.search(r"\b(to|into)\s+([A-Za-z]+)$", text.strip(), re.I)
+    return (q.group(1) if q else None), (lang.group(2) if lang else None)
+
+
+def legacy_route(user_input):
+    text = user_input.lower().strip()
+    if "translate" in text.lower():
+        phrase, target = legacy_parse_translation_query(user_input)
+        if not phrase:
+            phrase = re.sub(r"translate", "", text, flags=re.I).strip()
+        return Intent(TRANSLATION, phrase=phrase, target=target)
+    keys = ["what can you do", "capabilities", "help", "what do you do"]
+    if any(k in text.lower() for k in keys):
+        return Intent(CAPABILITIES)
+    weather_terms = ["weather", "temp", "temperature", "forecast", "humidity"]
+    if any(w in text for w in weather_terms):
+        return Intent(WEATHER, city=legacy_extract_location(user_input))
+    return Intent(LOOKUP, who=legacy_parse_who_name(user_input))
+
+
+def bench(fn, queries):
+    t0 = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3, help="best of N timing runs")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [rng.choice(TEMPLATES)(rng) for _ in range(args.queries)]
+
+    mismatches = [q for q in queries if classify(q) != legacy_route(q)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} queries route differently, e.g.:")
+        for q in mismatches[:5]:
+            print(f"   {q!r}: legacy={legacy_route(q)} new={classify(q)}")
+        sys.exit(1)
+
+    kinds = {}
+    for q in queries:
+        k = classify(q).kind
+        kinds[k] = kinds.get(k, 0) + 1
+
+    legacy = min(bench(legacy_route, queries) for _ in range(args.repeat))
+    new = min(bench(classify, queries) for _ in range(args.repeat))
+
+    n = len(queries)
+    print(f"{n:,} queries  mix: {kinds}  (identical routing)")
+    print(f"legacy router : {legacy:.3f}s  {legacy / n * 1e6:.2f} µs/query")
+    print(f"intent_router : {new:.3f}s  {new / n * 1e6:.2f} µs/query  ({legacy / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
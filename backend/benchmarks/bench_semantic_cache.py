@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_semantic_cache.py
+#
+# Calibrate SEMANTIC_CACHE_THRESHOLD for the configured embedding model.
+#
+#   cd backend && python benchmarks/bench_semantic_cache.py [--threshold 0.92]
+#
+# Embeds pairs of questions that should share an answer and pairs that must
+# not, prints the similarity spread of both groups and how many pairs each
+# threshold gets right. A threshold that lets any "different" pair through
+# serves wrong answers; pick the lowest one that keeps that count at 0.
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+SAME = [
+    ("who invented the telephone", "telephone inventor?"),
+    ("what is the capital of japan", "capital city of japan"),
+    ("how does photosynthesis work", "explain photosynthesis"),
+    ("when did world war 2 end", "what year did ww2 end"),
+    ("what is machine learning", "define machine learning"),
+    ("how tall is mount everest", "height of mount everest"),
+    ("who wrote pride and prejudice", "author of pride and prejudice"),
+    ("what causes earthquakes", "why do earthquakes happen"),
+    ("how many bones are in the human body", "number of bones in a human body"),
+    ("what is the speed of light", "how fast does light travel"),
+]
+
+DIFFERENT = [
+    ("who invented the telephone", "who invented the television"),
+    ("what is the capital of japan", "what is the capital of china"),
+    ("how does photosynthesis work", "how does respiration work"),
+    ("when did world war 2 end", "when did world war 1 end"),
+    ("what is machine learning", "what is deep sea fishing"),
+    ("how tall is mount everest", "how tall is the eiffel tower"),
+    ("who wrote pride and prejudice", "who wrote war and peace"),
+    ("what causes earthquakes", "what causes rainbows"),
+    ("how many bones are in the human body", "how many teeth do adults have"),
+    ("what is the speed of light", "what is the speed of sound"),
+]
+
+
+def similarities(nlp_model, pairs) -> list:
+    return [float(nlp_model.embed_query(nlp_model._semantic_key(a)) @ nlp_model.embed_query(nlp_model._semantic_key(b)))
+            for a, b in pairs]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threshold", type=float, default=None, help="also report this threshold")
+    args = ap.parse_args()
+
+    from utils import nlp_model
+    t = time.perf_counter()
+    nlp_model.embed_query("warm up")
+    print(f"encoder: {nlp_model.semantic_cache.model}   ready in {time.perf_counter() - t:.1f}s")
+
+    t = time.perf_counter()
+    same = similarities(nlp_model, SAME)
+    different = similarities(nlp_model, DIFFERENT)
+    per_query = (time.perf_counter() - t) / (2 * (len(SAME) + len(DIFFERENT))) * 1000
+
+    for name, sims in (("same", same), ("different", different)):
+        print(f"{name:<10} min {min(sims):.3f}  median {statistics.median(sims):.3f}  max {max(sims):.3f}")
+    print(f"embedding: {per_query:.1f} ms per query\n")
+
+    thresholds = sorted(set(np.round(np.arange(0.80, 0.995, 0.01), 2).tolist()
+                            + ([args.threshold] if args.threshold else [])))
+    print(f"{'threshold':>9}{'hits':>8}{'wrong':>8}")
+    for th in thresholds:
+        hits = sum(s >= th for s in same)
+        wrong = sum(s >= th for s in different)
+        print(f"{th:>9.2f}{hits:>5}/{len(SAME)}{wrong:>5}/{len(DIFFERENT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_trends.py
+#
+# Benchmark for utils.trends_store against the old per-request pandas scan.
+#
+#   cd backend && python benchmarks/bench_trends.py --rows 1000000
+#
+# Writes a synthetic trends CSV (Year, Domain, Trend, Region), builds the
+# index once, then times lookups for a mix of hit / miss / short queries.
+# The legacy scan is timed on a few queries only (it is O(rows) per call),
+# and every query's result is checked against it for equality.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.trends_store import TrendsStore  # noqa: E402
+
+DOMAINS = ["Technology", "Society", "Healthcare", "Energy", "Climate", "Finance", "Agriculture", "Transport"]
+ADJECTIVES = ["AI-driven", "Remote", "Renewable", "Decentralized", "Urban", "Sustainable", "Digital", "Coastal"]
+NOUNS = ["automation", "work expansion", "energy adoption", "telemedicine", "farming", "mobility", "heatwaves", "monsoon shifts"]
+REGIONS = ["Asia", "Europe", "Africa", "Americas", "Oceania"]
+
+QUERIES = [
+    "telemedicine",            # common hit
+    "monsoon shifts",          # common hit
+    "renewable energy",        # hit (multi-word)
+    "what is climate change",  # typical chat message, miss
+    "weather in pune",         # miss
+    "sustainable farming #4",  # rare hit
+    "ai",                      # short query (no trigram)
+    "zzz-not-present",         # miss with unknown trigrams
+]
+
+
+def write_csv(path: str, rows: int, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Year,Domain,Trend,Region\n")
+        for _ in range(rows):
+            trend = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{rng.randrange(5000)}"
+            f.write(f"{rng.randrange(1990, 2025)},{rng.choice(DOMAINS)},{trend},{rng.choice(REGIONS)}\n")
+
+
+def legacy_scan(path: str, text: str) -> str:
+    """The original analyze_trends() body (pandas scan per call, literal match)."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    mask = df.select_dtypes(include=["object", "string"]).apply(
+        lambda col: col.str.contains(text, case=False, na=False, regex=False)
+    ).any(axis=1)
+    matches = df[mask]
+    if matches.empty:
+        return ""
+    col = matches.select_dtypes(include=["object", "string"]).columns[0]
+    values = ", ".join(matches[col].head(3).values)
+    return f"Historical trends related: {values}. "
+
+
+def pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--lookups", type=int, default=20_000)
+    ap.add_argument("--legacy", type=int, default=3, help="legacy scans to time (0 to skip)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trends.csv")
+        t = time.perf_counter()
+        write_csv(path, args.rows)
+        print(f"synthetic CSV: {args.rows:,} rows, {os.path.getsize(path) / 1e6:.1f} MB "
+              f"({time.perf_counter() - t:.1f}s to write)")
+
+        store = TrendsStore(path)
+        t = time.perf_counter()
+        store.related("warm")
+        print(f"index build: {time.perf_counter() - t:.2f}s  {store.stats()}")
+
+        samples = {q: [] for q in QUERIES}
+        for i in range(args.lookups):
+            q = QUERIES[i % len(QUERIES)]
+            t = time.perf_counter()
+            store.related(q)
+            samples[q].append(time.perf_counter() - t)
+
+        print(f"\n{'query':<26}{'p50 µs':>10}{'p99 µs':>10}")
+        for q, s in samples.items():
+            print(f"{q:<26}{pct(s, 50) * 1e6:>10.1f}{pct(s, 99) * 1e6:>10.1f}")
+        every = [x for s in samples.values() for x in s]
+        print(f"{'ALL':<26}{pct(every, 50) * 1e6:>10.1f}{pct(every, 99) * 1e6:>10.1f}")
+
+        if args.legacy:
+            print("\nlegacy pandas scan (per call) + equality check:")
+            for q in QUERIES[:args.legacy]:
+                t = time.perf_counter()
+                old = legacy_scan(path, q)
+                took = time.perf_counter() - t
+                same = old == store.related(q)
+                print(f"  {q:<24}{took * 1000:>10.1f} ms   same result: {same}")
+
+
+if __name__ == "__main__":
+    main()
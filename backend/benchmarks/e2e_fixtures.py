@@ -0,0 +1,256 @@
+# backend/benchmarks/e2e_fixtures.py
+#
+# Offline stand-ins for everything full_response() talks to, used by
+# bench_e2e.py:
+#
+# - build_tiny_lm / build_tiny_marian: randomly initialised Qwen2 causal LM
+#   and MarianMT model with locally trained tokenizers (no hub download).
+#   Outputs are gibberish, but every tensor op of the real generate() path
+#   runs, so relative performance changes show up.
+# - StubServer: one threaded HTTP server answering the OpenWeather
+#   /weather, MediaWiki action API and DuckDuckGo Instant Answer calls
+#   with canned payloads after a configurable delay.
+
+import json
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CORPUS = [
+    "What is the weather like in Pune today?",
+    "Photosynthesis converts light energy into chemical energy in plants.",
+    "Ada Lovelace wrote the first published algorithm for a machine.",
+    "Give a short, correct answer. No repetition. No filler.",
+    "Provide 3–5 accurate bullet points based on the provided context.",
+    "The monsoon brings heavy rain to India between June and September.",
+    "Tungsten has the highest melting point of all metals.",
+    "Good morning, how are you? Thank you very much.",
+    "Tell me a joke about cats and dogs and the weather.",
+    "<|system|> <|user|> <|assistant|> Human: User: Assistant: System:",
+]
+
+# ------------------------------------------------------------
+# Tiny models
+# ------------------------------------------------------------
+
+
+def build_tiny_lm(path: str, seed: int = 0) -> str:
+    """Random 2-layer Qwen2 + byte-level BPE tokenizer, saved to `path` (reused if present)."""
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+    specials = ["<|endoftext|>", "<|im_end|>"]
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(CORPUS * 4, trainers.BpeTrainer(
+        vocab_size=512, special_tokens=specials,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    ))
+    tok = PreTrainedTokenizerFast(
+        tokenizer_object=bpe,
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        model_input_names=["input_ids", "attention_mask"],
+    )
+
+    torch.manual_seed(seed)
+    config = Qwen2Config(
+        vocab_size=len(tok),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=4096,
+        tie_word_embeddings=True,
+        eos_token_id=tok.eos_token_id,
+        pad_token_id=tok.pad_token_id,
+    )
+    Qwen2ForCausalLM(config).save_pretrained(path)
+    tok.save_pretrained(path)
+    return path
+
+
+def build_tiny_marian(path: str, seed: int = 0) -> str:
+    """Random 1-layer MarianMT + SentencePiece vocab, saved to `path` (reused if present)."""
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    import sentencepiece as spm
+    import torch
+    from transformers import MarianConfig, MarianMTModel, MarianTokenizer
+
+    os.makedirs(path, exist_ok=True)
+    corpus = os.path.join(path, "corpus.txt")
+    with open(corpus, "w", encoding="utf-8") as f:
+        f.write("\n".join(CORPUS * 4))
+    spm.SentencePieceTrainer.train(
+        input=corpus, model_prefix=os.path.join(path, "spm"), vocab_size=120,
+        character_coverage=1.0, model_type="unigram", bos_id=-1, eos_id=-1, unk_id=0, minloglevel=2,
+    )
+    os.replace(os.path.join(path, "spm.model"), os.path.join(path, "source.spm"))
+    shutil.copyfile(os.path.join(path, "source.spm"), os.path.join(path, "target.spm"))
+
+    sp = spm.SentencePieceProcessor(model_file=os.path.join(path, "source.spm"))
+    vocab = {"</s>": 0, "<unk>": 1, "<pad>": 2}
+    for i in range(sp.get_piece_size()):
+        vocab.setdefault(sp.id_to_piece(i), len(vocab))
+    with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    for leftover in ("spm.vocab", "corpus.txt"):
+        os.remove(os.path.join(path, leftover))
+
+    tok = MarianTokenizer(
+        source_spm=os.path.join(path, "source.spm"),
+        target_spm=os.path.join(path, "target.spm"),
+        vocab=os.path.join(path, "vocab.json"),
+    )
+
+    torch.manual_seed(seed)
+    config = MarianConfig(
+        vocab_size=len(vocab),
+        d_model=32,
+        encoder_layers=1,
+        decoder_layers=1,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=64,
+        decoder_ffn_dim=64,
+        max_position_embeddings=512,
+        pad_token_id=vocab["<pad>"],
+        eos_token_id=vocab["</s>"],
+        decoder_start_token_id=vocab["<pad>"],
+        forced_eos_token_id=vocab["</s>"],
+    )
+    MarianMTModel(config).save_pretrained(path)
+    tok.save_pretrained(path)
+    return path
+
+
+# ------------------------------------------------------------
+# Stub HTTP APIs
+# ------------------------------------------------------------
+
+WEATHER = {
+    "pune": ("light rain", 26.4, 84),
+    "mumbai": ("haze", 31.0, 70),
+    "delhi": ("clear sky", 35.2, 22),
+    "chennai": ("scattered clouds", 33.1, 66),
+}
+
+# keyword → (wikipedia title, extract)
+WIKI = {
+    "ada lovelace": ("Ada Lovelace", "Ada Lovelace was an English mathematician. She worked on the "
+                     "Analytical Engine. Her notes contain the first published algorithm. She is "
+                     "regarded as one of the first computer programmers."),
+    "alan turing": ("Alan Turing", "Alan Turing was an English mathematician and computer scientist. "
+                    "He formalised computation with the Turing machine. He worked at Bletchley Park."),
+    "photosynthesis": ("Photosynthesis", "Photosynthesis is the process plants use to turn light into "
+                       "chemical energy. It takes place in chloroplasts. It releases oxygen."),
+    "monsoon": ("Monsoon", "A monsoon is a seasonal reversal of winds with heavy rain. The South Asian "
+                "monsoon lasts from June to September."),
+}
+
+# keyword → DuckDuckGo AbstractText (only for things the wiki stub doesn't know)
+DDG = {
+    "tungsten": "Tungsten has the highest melting point of all metals, 3422 °C.",
+    "speed of sound": "The speed of sound in dry air at 20 °C is about 343 m/s.",
+}
+
+
+def _match(table: dict, text: str):
+    text = (text or "").lower()
+    return next((v for k, v in table.items() if k in text), None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real APIs
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        time.sleep(self.server.latency)
+        self.server.count(url.path)
+
+        if url.path.endswith("/weather"):
+            hit = WEATHER.get((q.get("q") or "").lower().strip())
+            if not hit:
+                return self._send(404, {"cod": "404", "message": "city not found"})
+            desc, temp, humidity = hit
+            return self._send(200, {"weather": [{"description": desc}],
+                                    "main": {"temp": temp, "humidity": humidity}})
+
+        if url.path.endswith("/w/api.php"):
+            if q.get("list") == "search":
+                hit = _match(WIKI, q.get("srsearch"))
+                return self._send(200, {"query": {"search": [{"title": hit[0]}] if hit else []}})
+            hit = next((v for v in WIKI.values() if v[0] == q.get("titles")), None)
+            page = {"title": q.get("titles"), "extract": hit[1]} if hit else {"missing": ""}
+            return self._send(200, {"query": {"pages": {"1": page}}})
+
+        if url.path.endswith("/ddg"):
+            return self._send(200, {"AbstractText": _match(DDG, q.get("q")) or "", "RelatedTopics": []})
+
+        self._send(404, {"error": "unknown stub path"})
+
+
+class StubServer:
+    """Serves the weather, Wikipedia and DuckDuckGo stubs on 127.0.0.1 in a daemon thread."""
+
+    def __init__(self, latency_ms: float = 20.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency_ms / 1000.0
+        self.httpd.requests = {}
+        lock = threading.Lock()
+
+        def count(path):
+            with lock:
+                self.httpd.requests[path] = self.httpd.requests.get(path, 0) + 1
+
+        self.httpd.count = count
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="e2e-stubs", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment that points the app's clients at this server."""
+        return {
+            "OPENWEATHER_API": "stub-key",
+            "OPENWEATHER_BASE_URL": f"{self.base_url}/data/2.5",
+            "WIKIPEDIA_API_URL": f"{self.base_url}/w/api.php",
+            "DUCKDUCKGO_API_URL": f"{self.base_url}/ddg",
+        }
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def requests(self) -> dict:
+        return dict(self.httpd.requests)
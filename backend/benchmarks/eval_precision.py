@@ -0,0 +1,160 @@
+# backend/benchmarks/eval_precision.py
+#
+# Compare NLM_PRECISION modes (fp32 / bf16 / int8) on a fixed prompt set.
+#
+#   cd backend && python benchmarks/eval_precision.py --max-tokens 64
+#
+# Each mode runs in its own subprocess (so RSS is not polluted by the other
+# modes' weights) and reports load time, resident memory, per-prompt latency
+# and throughput. Outputs are greedy, so agreement with fp32 is measured
+# exactly: identical replies, and the share of leading tokens that match.
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+PROMPTS = [
+    "What is the capital of France?",
+    "Explain photosynthesis in two sentences.",
+    "Give me three tips for staying focused while studying.",
+    "What causes the monsoon in India?",
+    "Write a short, friendly greeting for a weather app.",
+    "What is the difference between weather and climate?",
+    "Summarize the plot of Romeo and Juliet in one paragraph.",
+    "How do vaccines train the immune system?",
+]
+
+SYSTEM = (
+    "<|system|>\n"
+    "You are a helpful, friendly assistant. Answer clearly and concisely.\n"
+)
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc; falls back to the peak)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def worker(max_tokens: int):
+    from utils import nlp_model
+
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    tok, _ = nlp_model.load_base_model()
+    load_s = time.perf_counter() - t0
+    model_rss = rss_mb()
+
+    nlp_model._generate_batch(4, [(f"{SYSTEM}<|user|> Hello\n<|assistant|>", ())])  # warm-up
+
+    outputs, latencies, new_tokens = [], [], 0
+    for p in PROMPTS:
+        prompt = f"{SYSTEM}<|user|> {p}\n<|assistant|>"
+        t = time.perf_counter()
+        text, _ = nlp_model._generate_batch(max_tokens, [(prompt, ())])[0]
+        latencies.append(time.perf_counter() - t)
+        outputs.append(text)
+        new_tokens += len(tok(text, add_special_tokens=False)["input_ids"])
+
+    print(json.dumps({
+        "mode": nlp_model.NLM_PRECISION,
+        "load_s": load_s,
+        "rss_mb": model_rss,
+        "model_mb": model_rss - base_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "latencies": latencies,
+        "tokens_per_s": new_tokens / sum(latencies),
+        "outputs": outputs,
+    }))
+
+
+def run_mode(mode: str, max_tokens: int) -> dict:
+    env = dict(os.environ, NLM_PRECISION=mode, RESPONSE_CACHE_DB="")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", "--max-tokens", str(max_tokens)],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def prefix_agreement(tok, ref: str, other: str) -> float:
+    """Share of the reference's tokens reproduced before the first divergence."""
+    a = tok(ref, add_special_tokens=False)["input_ids"]
+    b = tok(other, add_special_tokens=False)["input_ids"]
+    if not a:
+        return 1.0 if not b else 0.0
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n / len(a)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", default="fp32,bf16,int8")
+    ap.add_argument("--max-tokens", type=int, default=64)
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--json", help="also write the raw results here")
+    args = ap.parse_args()
+
+    if args.worker:
+        worker(args.max_tokens)
+        return
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if "fp32" not in modes:
+        modes.insert(0, "fp32")  # the baseline everything is compared against
+
+    results = {}
+    for mode in modes:
+        print(f"… running {mode}", flush=True)
+        results[mode] = run_mode(mode, args.max_tokens)
+
+    from transformers import AutoTokenizer
+    from utils.nlp_model import BASE_MODEL_ID
+    tok = AutoTokenizer.from_pretrained(BASE_MODEL_ID)
+    ref = results["fp32"]["outputs"]
+
+    print(f"\nmodel: {BASE_MODEL_ID}   prompts: {len(PROMPTS)}   max_tokens: {args.max_tokens}\n")
+    print(f"{'mode':<6}{'load s':>8}{'RSS MB':>9}{'model MB':>10}{'p50 s':>8}{'p90 s':>8}"
+          f"{'tok/s':>8}{'exact':>8}{'prefix':>8}")
+    for mode, r in results.items():
+        lat = sorted(r["latencies"])
+        p90 = lat[min(len(lat) - 1, int(0.9 * len(lat)))]
+        exact = sum(a == b for a, b in zip(ref, r["outputs"])) / len(ref)
+        prefix = statistics.mean(prefix_agreement(tok, a, b) for a, b in zip(ref, r["outputs"]))
+        r["exact_match"], r["prefix_agreement"] = exact, prefix
+        print(f"{mode:<6}{r['load_s']:>8.2f}{r['rss_mb']:>9.0f}{r['model_mb']:>10.0f}"
+              f"{statistics.median(lat):>8.3f}{p90:>8.3f}{r['tokens_per_s']:>8.1f}"
+              f"{exact:>8.0%}{prefix:>8.0%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# backend/gunicorn.conf.py
+#
+# Production serving: several lightweight HTTP workers plus ONE model server.
+#
+#   cd backend && gunicorn -c gunicorn.conf.py app:app
+#
+# Async serving mode (aiohttp, see async_app.py):
+#
+#   cd backend && GUNICORN_WORKER_CLASS=aiohttp.GunicornWebWorker \
+#       gunicorn -c gunicorn.conf.py async_app:create_app
+#
+# The gunicorn master starts utils.model_server (which loads Qwen/MarianMT
+# once) before forking workers, and stops it on shutdown. Workers inherit
+# MODEL_SERVER_SOCKET, so utils.model_loader forwards every model call over
+# that Unix socket and the workers themselves never import torch.
+# Set MODEL_SERVER_EXTERNAL=1 if the model server is run separately
+# (e.g. its own systemd unit / container sharing the socket); then set the
+# same MODEL_SERVER_SOCKET and a random MODEL_SERVER_AUTHKEY for both.
+# Otherwise on_starting generates a fresh authkey per launch and the socket
+# goes in a private 0700 runtime directory (see utils/model_server.py).
+
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND)
+
+from utils.model_server import default_socket, ensure_private_dir  # noqa: E402
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")     # gthread: SSE streams hold a thread each
+threads = int(os.getenv("GUNICORN_THREADS", "8"))                # gthread only
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))   # a cold CPU generation can take minutes
+graceful_timeout = 30
+chdir = BACKEND
+
+os.environ.setdefault("MODEL_SERVER_SOCKET", default_socket())
+MODEL_SERVER_START_TIMEOUT = float(os.getenv("MODEL_SERVER_START_TIMEOUT", "30"))
+
+_model_server = None
+
+
+def on_starting(server):
+    """Start the model server before any worker forks."""
+    global _model_server
+    if os.getenv("MODEL_SERVER_EXTERNAL") == "1":
+        return
+    socket_path = os.environ["MODEL_SERVER_SOCKET"]
+    ensure_private_dir(os.path.dirname(os.path.abspath(socket_path)))
+    # Fresh per launch; the model server and the workers (forked later) inherit it
+    os.environ["MODEL_SERVER_AUTHKEY"] = secrets.token_hex(32)
+    _model_server = subprocess.Popen([sys.executable, "-m", "utils.model_server", "--socket", socket_path,
+                                      "--exit-with-parent"],
+                                     cwd=BACKEND)
+
+    # Wait for the socket (not the weights: /health reports loading progress)
+    deadline = time.time() + MODEL_SERVER_START_TIMEOUT
+    while not os.path.exists(socket_path) and time.time() < deadline:
+        if _model_server.poll() is not None:
+            raise RuntimeError(f"model server exited with code {_model_server.returncode}")
+        time.sleep(0.1)
+    server.log.info("Model server pid %s on %s", _model_server.pid, socket_path)
+
+
+def on_exit(server):
+    if _model_server is not None and _model_server.poll() is None:
+        _model_server.terminate()
+        try:
+            _model_server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _model_server.kill()
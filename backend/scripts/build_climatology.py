@@ -0,0 +1,42 @@
+# backend/scripts/build_climatology.py
+#
+# Build the memory-mapped climatology served by /weather/probability.
+#
+#   cd backend && python scripts/build_climatology.py data/obs/*.csv \
+#       --out data/climatology.bin --resolution 2.5 [--bbox 6,38,68,98]
+#
+# Inputs are daily observations, one row per day and point, with columns
+# date, lat, lon, precip_mm, tmax_c, wind_kmh, cloud_pct (common aliases
+# such as latitude/prcp/tmax/cloud_cover are accepted). NetCDF files
+# (*.nc) are read through xarray when it is installed. The output replaces
+# --out atomically, so running workers switch over on their next lookup.
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.climatology import CLIMATOLOGY_PATH, build  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+", help="CSV / NetCDF files of daily observations")
+    ap.add_argument("--out", default=CLIMATOLOGY_PATH)
+    ap.add_argument("--resolution", type=float, default=2.5, help="grid cell size in degrees")
+    ap.add_argument("--bbox", help="lat_min,lat_max,lon_min,lon_max (default: whole globe)")
+    ap.add_argument("--window", type=int, default=15, help="days pooled around each day of year (odd)")
+    ap.add_argument("--source", help="dataset name reported in data_sources")
+    args = ap.parse_args()
+
+    bbox = tuple(float(v) for v in args.bbox.split(",")) if args.bbox else None
+    if bbox is not None and len(bbox) != 4:
+        ap.error("--bbox needs lat_min,lat_max,lon_min,lon_max")
+
+    build(args.inputs, args.out, resolution=args.resolution, bbox=bbox,
+          window=args.window, source=args.source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# backend/tests/conftest.py
+#
+# Offline test environment, set up before any utils module reads its config:
+# - OpenWeather, MediaWiki and DuckDuckGo point at the e2e stub server
+#   (benchmarks/e2e_fixtures.py); nothing leaves the machine
+# - chat store in a temp directory, response / weather / knowledge caches
+#   off so every request does the full work
+# - the chat model is the tiny random Qwen2 from e2e_fixtures, built on
+#   first use by the `tiny_lm` fixture and never preloaded
+#
+#   cd backend && python -m pytest -q
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
+
+from e2e_fixtures import StubServer, build_tiny_lm  # noqa: E402
+
+MODEL_DIR = os.path.join(tempfile.gettempdir(), "pastcast-e2e-models")   # shared with bench_e2e
+WORK_DIR = tempfile.mkdtemp(prefix="pastcast-tests-")
+
+STUBS = StubServer(latency_ms=0).start()
+os.environ.update(STUBS.env())
+os.environ.update({
+    "NLM_MODEL_ID": os.path.join(MODEL_DIR, "lm"),
+    "NLM_PRELOAD": "0",
+    "NLM_DRAFT_MODEL_ID": "",
+    "CHAT_DB_PATH": os.path.join(WORK_DIR, "chat.db"),
+    "RESPONSE_CACHE_TTL": "-1",
+    "RESPONSE_CACHE_DB": "",
+    "WEATHER_CACHE_TTL": "-1",
+    "WEATHER_STALE_TTL": "-1",
+    "KNOWLEDGE_CACHE_TTL": "-1",
+    "SEMANTIC_CACHE": "0",
+    "SEMANTIC_CACHE_PATH": "",
+})
+for name in ("MODEL_SERVER_SOCKET", "TRANSLATION_PRELOAD", "KNOWLEDGE_FIXTURE"):
+    os.environ.pop(name, None)
+
+os.chdir(BACKEND)   # data/trends.csv is resolved relative to the backend
+
+
+@pytest.fixture(scope="session")
+def tiny_lm():
+    return build_tiny_lm(os.environ["NLM_MODEL_ID"])
+
+
+@pytest.fixture
+def stubs():
+    return STUBS
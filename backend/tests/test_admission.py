@@ -0,0 +1,71 @@
+# backend/tests/test_admission.py
+
+import contextvars
+import threading
+import time
+
+import pytest
+
+from utils import admission
+from utils.admission import AdmissionController, DeadlineExceeded, Overloaded
+
+
+def in_request(fn, deadline=None):
+    """Run `fn` in its own context, as a request would, with an optional deadline."""
+    def call():
+        admission.start_deadline(deadline or 0)
+        return fn()
+    return contextvars.copy_context().run(call)
+
+
+def test_sheds_at_once_when_slots_and_queue_are_full():
+    controller = AdmissionController(max_concurrent=2, max_waiting=0, min_budget=0)
+    controller.acquire()
+    controller.acquire()
+
+    with pytest.raises(Overloaded) as shed:
+        in_request(controller.acquire)
+    assert shed.value.reason == "queue_full"
+    assert controller.stats()["active"] == 2
+    assert controller.shed == {"queue_full": 1}
+
+    controller.release()
+    in_request(controller.acquire)      # a freed slot is handed out again
+    assert controller.admitted == 3
+
+
+def test_waiter_is_shed_when_its_deadline_passes():
+    controller = AdmissionController(max_concurrent=1, max_waiting=4, min_budget=0.1)
+    controller.acquire()
+
+    t0 = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        in_request(controller.acquire, deadline=0.3)
+    assert time.perf_counter() - t0 < 1.0
+    assert controller.stats()["waiting"] == 0
+    assert controller.shed == {"deadline": 1}
+
+
+def test_waiter_gets_the_slot_when_it_is_released():
+    controller = AdmissionController(max_concurrent=1, max_waiting=1, min_budget=0)
+    controller.acquire()
+    admitted = threading.Event()
+
+    def wait_for_slot():
+        in_request(controller.acquire, deadline=5)
+        admitted.set()
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    time.sleep(0.05)
+    assert not admitted.is_set() and controller.stats()["waiting"] == 1
+    controller.release()
+    waiter.join(5)
+    assert admitted.is_set()
+
+
+def test_too_little_budget_left_is_shed_before_queueing():
+    controller = AdmissionController(max_concurrent=4, max_waiting=4, min_budget=1.0)
+    with pytest.raises(DeadlineExceeded):
+        in_request(controller.acquire, deadline=0.5)
+    assert controller.stats()["active"] == 0
@@ -0,0 +1,144 @@
+# backend/tests/test_async_app.py
+#
+# async_app.py through aiohttp's test client, against the stub APIs.
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")   # requirements-async.txt
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+import async_app  # noqa: E402
+
+
+def run(check):
+    """Run `check(client)` against a fresh async app; returns its result."""
+    async def main():
+        async with TestClient(TestServer(await async_app.create_app())) as client:
+            return await check(client)
+    return asyncio.run(main())
+
+
+async def message(client, text, session_id, **extra):
+    resp = await client.post("/api/message", json=dict(extra, text=text, session_id=session_id))
+    assert resp.status == 200
+    return resp
+
+
+def sse_frames(body: str) -> list:
+    """(event, payload) for every Server-Sent Events frame in `body`."""
+    frames = []
+    for block in body.strip().split("\n\n"):
+        event, data = None, None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        frames.append((event, data))
+    return frames
+
+
+def test_weather_message():
+    async def check(client):
+        resp = await message(client, "What's the weather in Pune?", "weather")
+        return await resp.json()
+
+    body = run(check)
+    assert body["status"] == "success"
+    assert body["reply"] == "Weather in Pune: Light rain, 26.4°C, humidity 84%."
+
+
+def test_lookup_message():
+    async def check(client):
+        resp = await message(client, "Who is Ada Lovelace?", "lookup")
+        return await resp.json()
+
+    reply = run(check)["reply"]
+    assert "Ada Lovelace was an English mathematician." in reply
+    assert "- She worked on the Analytical Engine" in reply
+
+
+def test_history_etag_and_304():
+    async def check(client):
+        await message(client, "What can you do?", "history")
+        first = await client.get("/api/history", params={"session_id": "history"})
+        rows, etag = await first.json(), first.headers["ETag"]
+
+        same = await client.get("/api/history", params={"session_id": "history"},
+                                headers={"If-None-Match": etag})
+        not_modified = (same.status, await same.read(), same.headers["ETag"])
+
+        await message(client, "What is the weather in Delhi", "history")
+        changed = await client.get("/api/history", params={"session_id": "history"},
+                                   headers={"If-None-Match": etag})
+        delta = await client.get("/api/history", params={"session_id": "history", "after_id": rows[-1]["id"]})
+        return first.status, rows, etag, not_modified, changed.status, changed.headers["ETag"], await delta.json()
+
+    status, rows, etag, not_modified, changed_status, changed_etag, delta = run(check)
+    assert status == 200
+    assert etag.startswith('W/"')
+    assert [(r["role"], r["content"]) for r in rows][0] == ("user", "What can you do?")
+    assert [r["role"] for r in rows] == ["user", "ai"]
+    assert not_modified == (304, b"", etag)
+    assert changed_status == 200 and changed_etag != etag
+    assert [(r["role"], r["content"]) for r in delta] == [
+        ("user", "What is the weather in Delhi"),
+        ("ai", "Weather in Delhi: Clear sky, 35.2°C, humidity 22%."),
+    ]
+
+
+def test_streamed_reply(tiny_lm):
+    async def check(client):
+        resp = await message(client, "Tell me a joke about cats", "stream", stream=True)
+        content_type = resp.headers["Content-Type"]
+        frames = sse_frames(await resp.text())
+        history = await client.get("/api/history", params={"session_id": "stream"})
+        return content_type, frames, await history.json()
+
+    content_type, frames, history = run(check)
+    assert content_type.startswith("text/event-stream")
+    deltas = [data["delta"] for event, data in frames if event is None]
+    event, done = frames[-1]
+    assert event == "done"
+    assert done["status"] == "success"
+    assert done["reply"] == "".join(deltas).strip()
+    assert done["reply"]
+    assert [(r["role"], r["content"]) for r in history] == [
+        ("user", "Tell me a joke about cats"),
+        ("ai", done["reply"]),
+    ]
+
+
+def test_hundreds_of_concurrent_weather_and_lookup_requests(stubs):
+    """200 requests at once over one event loop, each upstream call taking 50 ms."""
+    cities = ["Pune", "Mumbai", "Delhi", "Chennai"]
+    people = ["Ada Lovelace", "Alan Turing"]
+
+    async def check(client):
+        async def one(i):
+            if i % 2:
+                body = await (await message(client, f"weather in {cities[i % 4]}", f"c{i}")).json()
+            else:
+                body = await (await message(client, f"Who is {people[i % 4 // 2]}?", f"c{i}")).json()
+            return body["reply"]
+
+        t0 = time.perf_counter()
+        replies = await asyncio.gather(*(one(i) for i in range(200)))
+        return replies, time.perf_counter() - t0
+
+    stubs.httpd.latency = 0.05
+    try:
+        replies, wall = run(check)
+    finally:
+        stubs.httpd.latency = 0.0
+
+    for i, reply in enumerate(replies):
+        expected = f"Weather in {cities[i % 4]}:" if i % 2 else f"{people[i % 4 // 2]} was an English"
+        assert expected in reply
+    # One request at a time would take 200 × 50 ms = 10 s for the weather calls alone
+    assert wall < 5.0
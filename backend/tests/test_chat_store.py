@@ -0,0 +1,54 @@
+# backend/tests/test_chat_store.py
+#
+# utils.db group-commit writer: add_message() only enqueues, reads flush().
+
+import threading
+
+from utils import db
+
+
+def setup_module():
+    db.init_db()
+
+
+def test_read_your_writes_after_flush():
+    for i in range(50):
+        db.add_message("user" if i % 2 == 0 else "ai", f"message {i}", "ryw")
+    assert db.flush()
+    rows = db.get_history(100, session_id="ryw")
+    assert [c for _, _, c in rows] == [f"message {i}" for i in range(50)]
+    assert db.stats()["queued"] == 0
+
+
+def test_reads_see_writes_without_explicit_flush():
+    db.add_message("user", "hello", "implicit")
+    assert db.get_recent_messages(5, session_id="implicit") == [("user", "hello")]
+    oldest, newest = db.history_version("implicit")
+    assert oldest == newest is not None
+
+
+def test_concurrent_writers_all_land():
+    def write(t):
+        for i in range(25):
+            db.add_message("user", f"{t}-{i}", "concurrent")
+
+    threads = [threading.Thread(target=write, args=(t,)) for t in range(8)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert db.flush()
+    rows = db.get_history(1000, session_id="concurrent")
+    assert sorted(c for _, _, c in rows) == sorted(f"{t}-{i}" for t in range(8) for i in range(25))
+
+
+def test_a_bad_row_does_not_drop_its_batch():
+    before = db.stats()
+    db.add_message("user", "kept 1", "bad-row")
+    db.add_message("user", {"not": "storable"}, "bad-row")
+    db.add_message("user", "kept 2", "bad-row")
+    assert db.flush()
+    assert [c for _, _, c in db.get_history(10, session_id="bad-row")] == ["kept 1", "kept 2"]
+    after = db.stats()
+    assert after["failed"] - before["failed"] == 1
+    assert after["committed"] - before["committed"] == 2
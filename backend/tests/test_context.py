@@ -0,0 +1,48 @@
+# backend/tests/test_context.py
+
+import pytest
+from transformers import AutoTokenizer
+
+from utils.context import ContextAssembler, turn_segment
+
+PROMPT = "<|system|> Give a short, correct answer.\n<|user|> What is the weather like in Pune today?\n<|assistant|>"
+
+
+@pytest.fixture(scope="module")
+def tokenizer(tiny_lm):
+    return AutoTokenizer.from_pretrained(tiny_lm)
+
+
+def history(n):
+    return [("user" if i % 2 == 0 else "ai", f"Turn {i}: the monsoon brings heavy rain to India.")
+            for i in range(n)]
+
+
+def test_prompt_without_history_is_unchanged(tokenizer):
+    text, ids = ContextAssembler(budget=512).assemble(tokenizer, PROMPT)
+    assert text == PROMPT
+    assert ids == tokenizer(PROMPT)["input_ids"]
+
+
+def test_history_fits_the_budget_newest_first(tokenizer):
+    turns = history(40)
+    text, ids = ContextAssembler(budget=160).assemble(tokenizer, PROMPT, turns)
+    assert len(ids) <= 160
+    assert text.startswith("<|system|> Give a short")
+    assert text.endswith("<|user|> What is the weather like in Pune today?\n<|assistant|>")
+    assert turn_segment(*turns[-1]) in text         # the newest turn is kept
+    assert turn_segment(*turns[0]) not in text      # the oldest ones are not
+
+
+def test_kept_history_starts_with_a_question(tokenizer):
+    assembler = ContextAssembler(budget=160, summary_tokens=0)
+    text, _ = assembler.assemble(tokenizer, PROMPT, history(41))
+    first_turn = text.split("\n")[1]
+    assert first_turn.startswith("<|user|> Turn")
+
+
+def test_question_alone_over_budget_keeps_preamble_and_question_end(tokenizer):
+    long_prompt = PROMPT.replace("What is", "Context: " + "rain " * 300 + "What is")
+    _, ids = ContextAssembler(budget=64).assemble(tokenizer, long_prompt)
+    assert len(ids) == 64
+    assert tokenizer.decode(ids).endswith("Pune today?\n<|assistant|>")
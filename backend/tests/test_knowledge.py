@@ -0,0 +1,44 @@
+# backend/tests/test_knowledge.py
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.wiki_search import FixtureBackend, KnowledgeLookup
+
+FIXTURE = {
+    "search": {
+        "mercury": ["Mercury (planet)"],
+        "ada lovelace": ["Ada Lovelace"],
+        "lovelace": ["Ada Lovelace"],
+    },
+    "summaries": {
+        "mercury": "Mercury is a chemical element. It is a liquid metal.",
+        "mercury (planet)": "Mercury is the first planet from the Sun.",
+        "ada lovelace": "Ada Lovelace was an English mathematician.",
+    },
+}
+
+
+def lookup(**kwargs):
+    return KnowledgeLookup(backend=FixtureBackend(FIXTURE), cache_ttl=600, **kwargs)
+
+
+def test_person_exact_title_beats_search_hit():
+    for person_summary in (lookup().person_summary,
+                           lambda name: asyncio.run(lookup().person_summary_async(name))):
+        assert person_summary("Mercury") == "Mercury is a chemical element. It is a liquid metal."
+
+
+def test_person_falls_back_to_search_hit():
+    knowledge = lookup()
+    assert knowledge.person_summary("Lovelace") == "Ada Lovelace was an English mathematician."
+    assert asyncio.run(knowledge.person_summary_async("Lovelace")) == "Ada Lovelace was an English mathematician."
+    assert knowledge.person_summary("Nobody Atall") is None
+
+
+def test_counters_are_exact_under_threads():
+    knowledge = lookup()
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda i: knowledge.summary("Ada Lovelace"), range(2000)))
+    stats = knowledge.stats()
+    assert stats["cache_hits"] + stats["cache_misses"] == 2000
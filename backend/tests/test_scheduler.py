@@ -0,0 +1,86 @@
+# backend/tests/test_scheduler.py
+
+import threading
+import time
+
+import pytest
+
+from utils.admission import DeadlineExceeded
+from utils.scheduler import InferenceScheduler
+
+
+def test_groups_queued_items_by_key():
+    calls = []
+
+    def run_batch(key, payloads):
+        calls.append((key, list(payloads)))
+        return [f"{key}:{p}" for p in payloads]
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=8, max_wait_ms=100)
+    futures = [scheduler.submit(i, key="even" if i % 2 == 0 else "odd") for i in range(6)]
+
+    assert [f.result(timeout=5) for f in futures] == [f"{'even' if i % 2 == 0 else 'odd'}:{i}" for i in range(6)]
+    assert calls == [("even", [0, 2, 4]), ("odd", [1, 3, 5])]
+    assert scheduler.stats()["batches_run"] == 2
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+
+    def run_batch(key, payloads):
+        sizes.append(len(payloads))
+        return payloads
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=3, max_wait_ms=100)
+    futures = [scheduler.submit(i, key="k") for i in range(7)]
+    assert [f.result(timeout=5) for f in futures] == list(range(7))
+    assert max(sizes) <= 3 and sum(sizes) == 7
+
+
+def test_items_past_their_deadline_expire_in_the_queue():
+    release = threading.Event()
+    seen = []
+
+    def run_batch(key, payloads):
+        seen.extend(payloads)
+        if key == "block":
+            release.wait(5)
+        return payloads
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=1, max_wait_ms=0)
+    blocker = scheduler.submit("blocker", key="block")
+    time.sleep(0.05)                     # the worker is now busy with the blocker
+    late = scheduler.submit("late", key="k", deadline=time.time() + 0.05)
+    on_time = scheduler.submit("on time", key="k", deadline=time.time() + 60)
+    time.sleep(0.1)
+    release.set()
+
+    assert blocker.result(timeout=5) == "blocker"
+    assert on_time.result(timeout=5) == "on time"
+    with pytest.raises(DeadlineExceeded):
+        late.result(timeout=5)
+    assert "late" not in seen
+    assert scheduler.stats()["items_expired"] == 1
+
+
+def test_errors_reach_every_item_of_the_batch():
+    def run_batch(key, payloads):
+        raise RuntimeError("generation failed")
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=4, max_wait_ms=50)
+    futures = [scheduler.submit(i, key="k") for i in range(3)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="generation failed"):
+            f.result(timeout=5)
+
+
+def test_several_workers_run_batches_at_once():
+    running = threading.Barrier(2, timeout=5)
+
+    def run_batch(key, payloads):
+        running.wait()      # only passes if two batches are in flight together
+        return payloads
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=1, max_wait_ms=0, workers=2)
+    futures = [scheduler.submit(i, key="k") for i in range(2)]
+    assert [f.result(timeout=5) for f in futures] == [0, 1]
@@ -0,0 +1,57 @@
+# backend/tests/test_stream_cleaner.py
+#
+# ReplyStreamCleaner must produce exactly what _clean_reply() makes of the
+# whole text, however the text is split into chunks.
+
+import pytest
+
+from utils.nlp_model import ReplyStreamCleaner, _clean_reply
+
+RAW = [
+    " Paris is the capital of France.\nUser: and Germany?",
+    "<|assistant|> It rains a lot in June.\n<|user|> thanks",
+    "Short answer. Assistant: Something else",
+    "No marker here, just a reply that ends.",
+]
+
+
+def stream(raw: str, cuts, stop=()):
+    cleaner = ReplyStreamCleaner(stop)
+    out = []
+    for a, b in zip([0] + cuts, cuts + [len(raw)]):
+        out.append(cleaner.feed(raw[a:b]))
+        if cleaner.done:
+            break
+    out.append(cleaner.finish())
+    return "".join(out), cleaner
+
+
+@pytest.mark.parametrize("raw", RAW)
+def test_matches_clean_reply_at_every_split_point(raw):
+    expected = _clean_reply(raw)
+    for cut in range(1, len(raw)):
+        got, cleaner = stream(raw, [cut])
+        assert got == expected, f"split at {cut}: {raw[:cut]!r} | {raw[cut:]!r}"
+        assert cleaner.text() == _clean_reply(cleaner.raw)
+
+
+@pytest.mark.parametrize("raw", RAW)
+def test_matches_clean_reply_token_by_token(raw):
+    got, _ = stream(raw, list(range(1, len(raw))))
+    assert got == _clean_reply(raw)
+
+
+def test_turn_marker_is_never_sent():
+    raw = "Sure thing.\nUs" + "er: next question"
+    got, cleaner = stream(raw, [len("Sure thing.\nUs")])
+    assert got == "Sure thing."
+    assert cleaner.done
+
+
+def test_stop_string_split_across_chunks():
+    raw = "Answer one.###Answer two"
+    expected = _clean_reply(raw, ("###",))
+    for cut in range(1, len(raw)):
+        got, _ = stream(raw, [cut], stop=("###",))
+        assert got == expected
+    assert expected == "Answer one."
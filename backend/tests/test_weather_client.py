@@ -0,0 +1,104 @@
+# backend/tests/test_weather_client.py
+
+import threading
+import time
+
+import pytest
+
+from utils.weather_tools import WeatherClient, WeatherUnavailable, check_status
+
+
+@pytest.fixture
+def slow_stubs(stubs):
+    stubs.httpd.latency = 0.2
+    yield stubs
+    stubs.httpd.latency = 0.0
+
+
+def client(stubs, **kwargs):
+    return WeatherClient(api_key="stub-key", base_url=f"{stubs.base_url}/data/2.5", **kwargs)
+
+
+def concurrently(n, fn):
+    start = threading.Barrier(n)
+    results = [None] * n
+
+    def one(i):
+        start.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(n)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return results
+
+
+def upstream_calls(stubs):
+    return stubs.requests().get("/data/2.5/weather", 0)
+
+
+def test_concurrent_misses_share_one_upstream_call(slow_stubs):
+    weather = client(slow_stubs)
+    before = upstream_calls(slow_stubs)
+
+    results = concurrently(20, lambda: weather.current("pune"))
+
+    assert all(r["main"]["temp"] == 26.4 for r in results)
+    assert upstream_calls(slow_stubs) - before == 1
+    assert weather.upstream_calls == 1
+    assert weather.coalesced == 19
+
+
+def test_spellings_of_a_city_share_the_cache(stubs):
+    weather = client(stubs, ttl=600)
+    weather.current("Pune")
+    weather.current("  pune. ")
+    assert weather.upstream_calls == 1
+    assert weather.hits == 1
+
+
+def test_waiting_callers_give_up_at_their_own_timeout(slow_stubs):
+    weather = client(slow_stubs)
+    leader = threading.Thread(target=weather.current, args=("mumbai",))
+    leader.start()
+    time.sleep(0.05)
+
+    t0 = time.perf_counter()
+    with pytest.raises(WeatherUnavailable):
+        weather.current("mumbai", timeout=0.05)
+    assert time.perf_counter() - t0 < 0.15
+    leader.join()
+
+
+def test_not_found_is_an_answer_and_other_errors_are_not(stubs):
+    assert client(stubs).current("atlantis")["cod"] == "404"
+    for status in (200, 204, 404):
+        check_status(status)
+    for status in (301, 401, 429, 500, 503):
+        with pytest.raises(WeatherUnavailable):
+            check_status(status)
+
+
+def test_upstream_failure_serves_stale_then_raises(stubs):
+    weather = client(stubs, ttl=600, stale_ttl=3600)
+    fresh = weather.current("delhi")
+    weather.base_url = "http://127.0.0.1:9"     # nothing listens on the discard port
+    weather._cache["delhi"] = (time.time() - 700, fresh)     # expired, but within stale_ttl
+
+    assert weather.current("delhi") == fresh
+    assert weather.stale_served == 1
+    with pytest.raises(WeatherUnavailable):
+        weather.current("chennai")
+
+
+def test_cache_is_lru_capped(stubs):
+    weather = client(stubs, ttl=600, max_entries=2)
+    for city in ("pune", "mumbai", "pune", "delhi"):
+        weather.current(city)
+    assert list(weather._cache) == ["pune", "delhi"]
+    assert weather.evictions == 1
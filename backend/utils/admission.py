@@ -0,0 +1,147 @@
+# backend/utils/admission.py
+#
+# Request deadlines and admission control for LLM-backed requests.
+#
+# - Every HTTP request gets a deadline (REQUEST_DEADLINE seconds, or less
+#   if the client sends X-Request-Timeout). It lives in a contextvar, so
+#   weather / knowledge / generation calls read what is left of the budget
+#   instead of using fixed timeouts.
+# - Generation is admitted through one AdmissionController: at most
+#   NLM_MAX_CONCURRENT requests generating or queued on the scheduler, at
+#   most NLM_MAX_WAITING more waiting for a slot. Anything beyond that, or
+#   whose deadline passes while waiting, is shed at once with Overloaded,
+#   which app.py turns into a fast 503 / degraded reply.
+
+import contextvars
+import os
+import threading
+import time
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))      # seconds per HTTP request
+NLM_MAX_CONCURRENT = int(os.getenv("NLM_MAX_CONCURRENT", str(2 * int(os.getenv("NLM_MAX_BATCH_SIZE", "8")))))
+NLM_MAX_WAITING = int(os.getenv("NLM_MAX_WAITING", "32"))
+NLM_MIN_BUDGET = float(os.getenv("NLM_MIN_BUDGET", "1.0"))          # don't start generating with less left
+
+
+class Overloaded(Exception):
+    """The request was shed: no capacity, or not enough time left to serve it."""
+
+    def __init__(self, reason: str, message: str = None):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class DeadlineExceeded(Overloaded):
+    def __init__(self, message: str = "request deadline exceeded"):
+        super().__init__("deadline", message)
+
+
+# ============================================================
+# DEADLINES
+# ============================================================
+
+# Absolute time.time() (wall clock, so it means the same in the model server)
+_deadline = contextvars.ContextVar("pastcast_deadline", default=None)
+
+
+def start_deadline(seconds: float = None):
+    """Set the current request's deadline `seconds` from now (REQUEST_DEADLINE by default)."""
+    seconds = REQUEST_DEADLINE if seconds is None else seconds
+    _deadline.set(time.time() + seconds if seconds > 0 else None)
+
+
+def set_deadline(deadline_at):
+    """Adopt an absolute deadline (e.g. one forwarded from an HTTP worker)."""
+    _deadline.set(deadline_at)
+
+
+def current_deadline():
+    return _deadline.get()
+
+
+def remaining(default: float = None):
+    """Seconds left before the deadline, or `default` when there is none."""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return default
+    return deadline_at - time.time()
+
+
+def budget(cap: float) -> float:
+    """Timeout for one upstream call: `cap`, shortened to what is left (raises when nothing is)."""
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(cap, left)
+
+
+# ============================================================
+# ADMISSION CONTROL
+# ============================================================
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = NLM_MAX_CONCURRENT, max_waiting: int = NLM_MAX_WAITING,
+                 min_budget: float = NLM_MIN_BUDGET):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.min_budget = min_budget
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = {}          # reason → count
+
+    def _shed(self, reason: str, message: str):
+        # caller holds self._cond
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        raise (DeadlineExceeded(message) if reason == "deadline" else Overloaded(reason, message))
+
+    def acquire(self):
+        """Take a slot, waiting at most until the current deadline; raises Overloaded."""
+        with self._cond:
+            left = remaining()
+            if left is not None and left < self.min_budget:
+                self._shed("deadline", f"only {max(0.0, left):.1f}s left of the request budget")
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_waiting:
+                    self._shed("queue_full", "generation queue is full")
+                self.waiting += 1
+                try:
+                    while self.active >= self.max_concurrent:
+                        left = remaining()
+                        if left is not None and left < self.min_budget:
+                            self._shed("deadline", "deadline passed while waiting for a generation slot")
+                        self._cond.wait(None if left is None else left - self.min_budget)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+            }
+
+
+# Shared instance guarding generation in utils.nlp_model
+nlm_admission = AdmissionController()
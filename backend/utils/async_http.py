@@ -0,0 +1,62 @@
+# backend/utils/async_http.py
+#
+# Shared aiohttp client for the async serving mode (async_app.py).
+#
+# - one ClientSession per event loop: pooled keep-alive connections, up to
+#   ASYNC_HTTP_POOL sockets in total and ASYNC_HTTP_POOL_PER_HOST per host,
+#   so hundreds of concurrent lookups cost sockets, not threads
+# - DNS answers cached for ASYNC_HTTP_DNS_TTL seconds
+# - aiohttp comes from requirements-async.txt; the threaded Flask app
+#   never imports this module
+
+import asyncio
+import os
+
+try:
+    import aiohttp
+except ImportError:     # async serving mode unavailable
+    aiohttp = None
+
+ASYNC_HTTP_POOL = int(os.getenv("ASYNC_HTTP_POOL", "256"))
+ASYNC_HTTP_POOL_PER_HOST = int(os.getenv("ASYNC_HTTP_POOL_PER_HOST", "64"))
+ASYNC_HTTP_DNS_TTL = int(os.getenv("ASYNC_HTTP_DNS_TTL", "300"))
+
+_session = None
+_session_loop = None
+
+
+def available() -> bool:
+    return aiohttp is not None
+
+
+def session():
+    """The running loop's ClientSession (created on first use)."""
+    global _session, _session_loop
+    if aiohttp is None:
+        raise RuntimeError("aiohttp is not installed (pip install -r requirements-async.txt)")
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=ASYNC_HTTP_POOL,
+            limit_per_host=ASYNC_HTTP_POOL_PER_HOST,
+            ttl_dns_cache=ASYNC_HTTP_DNS_TTL,
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+    return _session
+
+
+async def get_json(url: str, params: dict, timeout: float, headers: dict = None):
+    """GET url and decode the JSON body. Returns (status, payload)."""
+    async with session().get(url, params=params, headers=headers,
+                             timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        # content_type=None: some APIs (DuckDuckGo) label JSON as x-javascript
+        return resp.status, await resp.json(content_type=None)
+
+
+async def close():
+    """Close the pooled connections (app shutdown)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = _session_loop = None
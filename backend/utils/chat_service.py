@@ -0,0 +1,608 @@
+# backend/utils/chat_service.py
+#
+# Request handling shared by both entry points, the Flask app (app.py) and
+# the async serving mode (async_app.py): routing, tool calls, prompts and
+# response bodies. The entry points only add their HTTP layer.
+#
+# Importing this module has no side effects; each entry point calls boot()
+# once at startup.
+
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+# pandas (trends index) and the NLM stack (torch/transformers) are imported
+# lazily, so the worker boots instantly and non-LLM routes are served
+# while the model loads in the background.
+from utils import admission, metrics, model_loader, probability
+from utils.admission import Overloaded
+from utils.model_loader import FALLBACK_REPLY, generate_nlm_reply, translate_text
+from utils.prefix_cache import register_prefix
+from utils.climatology import climate_store
+from utils.response_cache import response_cache
+from utils.weather_tools import OPENWEATHER_API, weather_client
+from utils.trends_store import TrendsStore
+from utils.wiki_search import knowledge
+from utils.intent_router import CAPABILITIES, TRANSLATION, WEATHER, classify
+from utils.db import init_db, get_recent_messages, DEFAULT_SESSION
+from utils import db as chat_db
+
+CORS_ORIGINS = [
+    "http://localhost:3000",
+    "https://your-frontend.vercel.app",
+]
+CORS_EXPOSE_HEADERS = ["ETag", "Retry-After"]
+
+# -------------------------
+# Config
+# -------------------------
+DATA_PATH = "data/trends.csv"
+trends_store = TrendsStore(DATA_PATH)
+
+# Constant <|system|> preambles. Registered with the prefix cache so their
+# prefill (past_key_values) is computed once and reused by every prompt.
+WIKI_SYSTEM_PROMPT = "<|system|> Provide 3–5 correct, concise bullet points.\n"
+DDG_SYSTEM_PROMPT = "<|system|> Provide 3–5 accurate bullet points based on the provided context.\n"
+GENERAL_SYSTEM_PROMPT = "<|system|> Give a short, correct answer. No repetition. No filler.\n"
+RETRY_SYSTEM_PROMPT = "<|system|> Provide a short correct answer.\n"
+
+# Stored messages offered to LLM prompts as conversation memory; the
+# assembler (utils.context) keeps the newest that fit NLM_CONTEXT_TOKENS
+# and summarizes the rest.
+NLM_HISTORY_MESSAGES = int(os.getenv("NLM_HISTORY_MESSAGES", "12"))
+
+# Start loading Qwen in a background thread at boot (set NLM_PRELOAD=0 to
+# load on the first LLM request instead). NLM_WARMUP runs one tiny
+# generation after loading so the first user doesn't pay for lazy init.
+NLM_PRELOAD = os.getenv("NLM_PRELOAD", "1") == "1"
+NLM_WARMUP = os.getenv("NLM_WARMUP", "1") == "1"
+
+TRANSLATE_MAX_ITEMS = int(os.getenv("TRANSLATE_MAX_ITEMS", "256"))
+
+_booted = False
+_boot_lock = threading.Lock()
+
+
+def boot(preload: bool = True):
+    """
+    Startup work of a serving process (idempotent): open the chat store,
+    load the trends index in the background, register the prompt prefixes
+    and the service gauges, and with `preload` start loading the models.
+    """
+    global _booted
+    with _boot_lock:
+        if _booted:
+            return
+        _booted = True
+
+    init_db()
+    threading.Thread(target=trends_store.load, name="trends-loader", daemon=True).start()
+
+    for template in (WIKI_SYSTEM_PROMPT, DDG_SYSTEM_PROMPT, GENERAL_SYSTEM_PROMPT, RETRY_SYSTEM_PROMPT):
+        register_prefix(template)
+
+    metrics.GaugeFunc("pastcast_model_ready", "1 once the chat model is loaded.",
+                      lambda: int(model_loader.is_ready()))
+    metrics.GaugeFunc("pastcast_nlm_queue_depth", "Prompts waiting for the generation worker.",
+                      model_loader.queue_depth)
+    metrics.GaugeFunc("pastcast_nlm_admission", "LLM requests holding (active) or waiting for a generation slot.",
+                      lambda: {(k,): v for k, v in model_loader.admission_stats().items() if k in ("active", "waiting")},
+                      labels=("state",))
+    metrics.GaugeFunc("pastcast_response_cache_entries", "Entries in the in-memory response cache.",
+                      lambda: response_cache.stats()["entries"])
+    metrics.GaugeFunc("pastcast_chat_write_queue", "Chat messages queued for the next group commit.",
+                      lambda: chat_db.stats()["queued"])
+
+    if not preload:
+        return
+    if NLM_PRELOAD:
+        model_loader.start_background_load(warmup=NLM_WARMUP)
+    # Optionally load MarianMT models at boot: TRANSLATION_PRELOAD="hindi,tamil" or "all"
+    if os.getenv("TRANSLATION_PRELOAD"):
+        model_loader.start_translation_preload()
+
+
+def client_budget(headers):
+    """A shorter deadline than REQUEST_DEADLINE when the client sends X-Request-Timeout (seconds)."""
+    try:
+        asked = float(headers.get("X-Request-Timeout", ""))
+    except ValueError:
+        return None
+    return min(asked, admission.REQUEST_DEADLINE) if asked > 0 else None
+
+
+# ============================================================
+# Utility Functions
+# ============================================================
+
+TIME_WORDS_RE = re.compile(r"\b(today|tonight|tomorrow|yesterday|now|this week|this weekend)\b", re.I)
+
+
+WEATHER_NO_KEY = "Weather unavailable (API key missing)."
+
+
+def weather_city(city: str) -> str:
+    # Remove common time words so queries like "Bengaluru tomorrow" still work
+    cleaned_city = TIME_WORDS_RE.sub("", city).strip(" ,.-")
+    return cleaned_city or city.strip(" ,.-")
+
+
+def describe_weather(city: str, r: dict) -> str:
+    """One-line reply from an OpenWeather /weather payload."""
+    try:
+        if "main" not in r:
+            return f"Couldn't fetch weather for {city}."
+
+        desc = r["weather"][0]["description"].capitalize()
+        temp = r["main"]["temp"]
+        humidity = r["main"]["humidity"]
+
+        return f"Weather in {city}: {desc}, {temp}°C, humidity {humidity}%."
+    except Exception:
+        return f"Couldn't fetch weather for {city}."
+
+
+def get_weather(city: str):
+    """Fetch real-time weather."""
+    if not OPENWEATHER_API:
+        return WEATHER_NO_KEY
+
+    cleaned_city = weather_city(city)
+    try:
+        # Pooled, cached and coalesced (see utils/weather_tools.py)
+        r = weather_client.current(cleaned_city, timeout=admission.budget(weather_client.timeout))
+    except Exception:
+        return f"Couldn't fetch weather for {cleaned_city}."
+    return describe_weather(cleaned_city, r)
+
+
+def get_wiki_summary(query: str):
+    """Smart Wikipedia fetch avoiding irrelevant pages (parallel + cached, see utils/wiki_search.py)."""
+    return knowledge.wiki_summary(query)
+
+
+def duckduckgo_fallback(query: str):
+    """Fallback factual search."""
+    try:
+        return knowledge.instant_answer(query)
+    except Exception:
+        return None
+
+
+def analyze_trends(text: str):
+    """Search the CSV for any related text (indexed, reloaded only when the file changes)."""
+    try:
+        return trends_store.related(text)
+    except Exception:
+        return ""
+
+
+def format_direct_with_bullets(subject: str, summary: str):
+    """Convert a Wikipedia summary into a clean bullet set."""
+    parts = [s.strip() for s in summary.split(".") if s.strip()]
+    if not parts:
+        return subject
+    first = parts[0] + "."
+    bullets = parts[1:5]
+    if bullets:
+        return f"{first}\n- " + "\n- ".join(bullets)
+    return first
+
+# ============================================================
+# INTENT DETECTION
+# ============================================================
+
+# Intent detection and slot parsing (precompiled, one pass) live in
+# utils/intent_router.py: classify(), extract_location(), parse_who_name(),
+# parse_translation_query().
+
+
+def assistant_capabilities():
+    return (
+        "I can help with:\n"
+        "- General questions and explanations.\n"
+        "- Wikipedia-based factual summaries.\n"
+        "- English → Hindi/Marathi/Tamil/Telugu translations.\n"
+        "- Accurate weather lookups.\n"
+        "- Trend lookup from CSV.\n"
+        "- Clean reasoning and short explanations using Qwen 1.5B."
+    )
+
+
+def conversation_history(user_input: str, session_id=DEFAULT_SESSION):
+    """
+    Earlier turns of this session, oldest first, for the LLM prompt.
+    The current message is already stored, so it is left out here; the
+    context assembler decides how many of these fit the token budget.
+    """
+    msgs = get_recent_messages(NLM_HISTORY_MESSAGES + 1, session_id=session_id)
+    if msgs and msgs[-1] == ("user", user_input):
+        msgs = msgs[:-1]
+    return msgs[-NLM_HISTORY_MESSAGES:] if NLM_HISTORY_MESSAGES > 0 else []
+
+# ============================================================
+# SEMANTIC ANSWER CACHE
+# ============================================================
+
+# Messages whose answer depends on earlier turns ("and in 1990?", "who
+# founded it?") are neither answered from nor stored in the semantic cache.
+FOLLOW_UP_RE = re.compile(
+    r"^\s*(and|but|so|also|then|what about|how about)\b"
+    r"|\b(it|its|that|this|those|these|he|she|they|him|her|them|his|their)\b",
+    re.I,
+)
+
+
+def semantic_eligible(user_input: str) -> bool:
+    """Self-contained LLM-backed questions only: not tools, not follow-ups."""
+    if FOLLOW_UP_RE.search(user_input):
+        return False
+    return classify(user_input).kind not in (TRANSLATION, CAPABILITIES, WEATHER)
+
+
+def semantic_answer(user_input: str):
+    """Stored reply to an earlier question that means the same, or None."""
+    if not semantic_eligible(user_input):
+        return None
+    hit = model_loader.semantic_lookup(user_input)
+    metrics.SEMANTIC_CACHE.inc(result="hit" if hit else "miss")
+    if hit is None:
+        return None
+    reply, similarity, question = hit
+    routed("semantic_cache")
+    metrics.annotate(semantic_similarity=round(similarity, 4), semantic_match=question)
+    return reply
+
+
+def remember_answer(user_input: str, reply: str):
+    """Offer a finished LLM reply to the semantic cache (not truncated or failed ones)."""
+    trace = metrics.current_trace()
+    info = trace.info if trace is not None else {}
+    if info.get("nlm_deadline_hit") or info.get("nlm_error"):
+        return
+    if not reply or reply.endswith(FALLBACK_REPLY) or not semantic_eligible(user_input):
+        return
+    model_loader.semantic_store(user_input, reply)
+
+# ============================================================
+# MASTER ROUTER — BRAIN
+# ============================================================
+
+def routed(branch: str):
+    """Count the router branch a message took (metrics + request trace)."""
+    metrics.ROUTE_TOTAL.inc(branch=branch)
+    metrics.annotate(branch=branch)
+
+
+def trends_for(user_input: str):
+    with metrics.stage("analyze_trends"):
+        return analyze_trends(user_input)
+
+
+def plan_response(user_input: str, session_id=DEFAULT_SESSION):
+    """
+    Route a message to the right tool.
+    Returns (text, prompt): ready-made reply text, plus an LLM prompt whose
+    generated answer must be appended to it (None when no LLM is needed).
+    Context is fetched per branch: trends only where they are shown; chat
+    history is added to LLM prompts by the caller (conversation_history).
+    """
+    with metrics.stage("route"):
+        intent = classify(user_input)
+
+    # 1) TRANSLATION
+    if intent.kind == TRANSLATION:
+        routed("translation")
+        if not intent.target:
+            return "Please specify a target language (e.g., Hindi).", None
+        trends = trends_for(user_input)
+        with metrics.stage("translate"):
+            return trends + translate_text(intent.phrase, intent.target), None
+
+    # 2) CAPABILITIES
+    if intent.kind == CAPABILITIES:
+        routed("capabilities")
+        return assistant_capabilities(), None
+
+    # 3) WEATHER
+    if intent.kind == WEATHER:
+        routed("weather")
+        if not intent.city:
+            return "Please specify a city, e.g., 'weather in Pune'.", None
+        with metrics.stage("weather"):
+            return get_weather(intent.city), None
+
+    # 4–6) WHO-IS / WIKIPEDIA / DUCKDUCKGO
+    # One speculative lookup: all sources start at once, results are
+    # used in the same priority order as before.
+    with metrics.stage("knowledge_lookup"):
+        found = knowledge.lookup(user_input, person=intent.who, deadline=admission.budget(knowledge.deadline))
+    return knowledge_reply(user_input, intent.who, found)
+
+
+def knowledge_reply(user_input: str, who, found):
+    """(text, prompt) for the who-is / Wikipedia / DuckDuckGo / general branches, given a LookupResult."""
+    # 4) WHO-IS
+    if found.person:
+        routed("who_is")
+        return trends_for(user_input) + format_direct_with_bullets(who, found.person), None
+
+    # 5) WIKIPEDIA FACTUAL
+    wiki = found.wiki
+    if wiki:
+        routed("wiki")
+        title, summary = wiki
+        prompt = (
+            f"{WIKI_SYSTEM_PROMPT}"
+            f"<|user|> {user_input}\n"
+            f"<|assistant|>"
+        )
+        return trends_for(user_input), prompt
+
+    # 6) DUCKDUCKGO
+    ddg = found.ddg
+    if ddg:
+        routed("ddg")
+        prompt = (
+            f"{DDG_SYSTEM_PROMPT}"
+            f"Context: {ddg}\n"
+            f"<|user|> {user_input}\n"
+            f"<|assistant|>"
+        )
+        return trends_for(user_input), prompt
+
+    # 7) GENERAL NLM
+    routed("general")
+    general_prompt = (
+        f"{GENERAL_SYSTEM_PROMPT}"
+        f"<|user|> {user_input}\n"
+        f"<|assistant|>"
+    )
+    return "", general_prompt
+
+
+def full_response(user_input: str, session_id=DEFAULT_SESSION):
+    """
+    Full reply text. Raises Overloaded when the LLM part cannot be served
+    in time; its `partial` attribute holds the tool output gathered so far.
+    """
+    cached = semantic_answer(user_input)
+    if cached is not None:
+        return cached
+    text, prompt = plan_response(user_input, session_id)
+    if prompt is None:
+        return text
+    try:
+        with metrics.stage("nlm"):
+            reply = text + generate_nlm_reply(prompt, history=conversation_history(user_input, session_id))
+    except Overloaded as e:
+        e.partial = text
+        raise
+    remember_answer(user_input, reply.strip())
+    return reply
+
+
+BUSY_REPLY = "I’m handling a lot of requests right now — please try again in a moment."
+RETRY_AFTER_SECONDS = 5
+
+
+def shed(e: Overloaded):
+    """Count a request answered without the LLM; returns the degraded reply text."""
+    metrics.REQUESTS_SHED.inc(reason=e.reason)
+    metrics.annotate(shed=e.reason)
+    partial = getattr(e, "partial", "").strip()
+    return f"{partial}\n\n{BUSY_REPLY}" if partial else BUSY_REPLY
+
+
+def retry_prompt_for(user_input: str):
+    return (
+        f"{RETRY_SYSTEM_PROMPT}"
+        f"<|user|> {user_input}\n"
+        "<|assistant|>"
+    )
+
+
+def sse_event(payload: dict, event: str = None):
+    """Format one Server-Sent Events frame."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def done_event(reply: str, shed_reason=None, timings=False):
+    """Closing "done" frame of a streamed reply."""
+    done = {
+        "reply": reply,
+        "status": "success" if shed_reason is None else "degraded",
+        "timestamp": datetime.now().isoformat()
+    }
+    if shed_reason is not None:
+        done["reason"] = shed_reason
+    trace = metrics.current_trace()
+    if timings and trace is not None:
+        done["timings"] = trace.as_dict()
+    return sse_event(done, event="done")
+
+# ============================================================
+# REQUEST PARSING / RESPONSE BODIES
+# ============================================================
+
+def probability_response(data: dict):
+    """(body, status) for /weather/probability."""
+    try:
+        print("[weather/probability] request body:", data)
+
+        try:
+            loc = probability.parse_location(data.get("location"))
+            dr = probability.parse_date_range(data.get("date_range"))
+        except ValueError as e:
+            return {"error": f"Missing required parameters: {e}"}, 400
+
+        response = probability.build_results(
+            [loc], [dr], probability.make_rng(data.get("seed")),
+            include_ai_insights=data.get("include_ai_insights", False),
+            dataset_mode=data.get("dataset_mode") or "Global",
+        )[0]
+        return response, 200
+
+    except Exception as e:
+        print("[weather/probability] handler error:", e)
+        return {"error": "Internal server error", "details": str(e)}, 500
+
+
+def probability_batch_response(data: dict):
+    """
+    (body, status) for /weather/probability/batch: many locations × date
+    ranges in one vectorized pass.
+    Body: {"locations": [...], "date_ranges": [...] (or one "date_range"),
+           "pairwise": false, "seed": null, "include_ai_insights", "dataset_mode"}
+    Every location is paired with every date range (location-major), or
+    element-wise with "pairwise": true. Results use the single-item schema.
+    """
+    try:
+        locations = data.get("locations") or []
+        date_ranges = data.get("date_ranges") or ([data["date_range"]] if data.get("date_range") else [])
+        if not isinstance(locations, list) or not isinstance(date_ranges, list) or not locations or not date_ranges:
+            return {"error": "Missing required parameters: locations and date_ranges arrays are required."}, 400
+
+        pairwise = bool(data.get("pairwise", False))
+        if pairwise and len(locations) != len(date_ranges):
+            return {"error": "pairwise needs as many date_ranges as locations."}, 400
+        count = len(locations) if pairwise else len(locations) * len(date_ranges)
+        if count > probability.PROBABILITY_BATCH_MAX:
+            return {"error": f"At most {probability.PROBABILITY_BATCH_MAX} items per request."}, 413
+
+        try:
+            locs = [probability.parse_location(loc) for loc in locations]
+        except (ValueError, TypeError) as e:
+            return {"error": f"Invalid location: {e}"}, 400
+        try:
+            drs = [probability.parse_date_range(dr) for dr in date_ranges]
+        except (ValueError, TypeError) as e:
+            return {"error": f"Invalid date_range: {e}"}, 400
+
+        if not pairwise:
+            locs, drs = [loc for loc in locs for _ in drs], drs * len(locs)
+
+        seed = data.get("seed")
+        with metrics.stage("probability_batch"):
+            results = probability.build_results(
+                locs, drs, probability.make_rng(seed),
+                include_ai_insights=data.get("include_ai_insights", False),
+                dataset_mode=data.get("dataset_mode") or "Global",
+            )
+        return {"results": results, "count": len(results), "seed": seed}, 200
+
+    except Exception as e:
+        print("[weather/probability/batch] handler error:", e)
+        return {"error": "Internal server error", "details": str(e)}, 500
+
+
+
+def session_id_for(data: dict, headers, args):
+    """Chat session: JSON "session_id", X-Session-ID header or ?session_id=, else the shared default."""
+    sid = (data or {}).get("session_id") or headers.get("X-Session-ID") or args.get("session_id")
+    sid = str(sid or "").strip()[:128]
+    return sid or DEFAULT_SESSION
+
+
+def wants_timings(data: dict, headers, args):
+    """Per-request stage breakdown: JSON "timings": true, ?timings=1 or X-Timings: 1."""
+    flag = (data or {}).get("timings") or args.get("timings") or headers.get("X-Timings")
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def shed_body(e: Overloaded) -> dict:
+    """503 body of a /api/message request shed under load."""
+    return {
+        "reply": shed(e),
+        "error": BUSY_REPLY,
+        "status": "degraded",
+        "reason": e.reason,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def reply_body(reply: str, timings=False) -> dict:
+    """JSON body of an answered /api/message request."""
+    body = {
+        "reply": reply,
+        "status": "success",
+        "timestamp": datetime.now().isoformat()
+    }
+    trace = metrics.current_trace()
+    if trace is not None and timings:
+        body["timings"] = trace.as_dict()
+    return body
+
+
+def translate_response(data: dict):
+    """
+    (body, status) for bulk translation.
+    Body: {"items": [{"text": ..., "lang": ...}, ...]} or {"texts": [...], "lang": "hindi"}.
+    Returns {"translations": [...]} in request order.
+    """
+    if "items" in data:
+        items = [((i or {}).get("text") or "", (i or {}).get("lang") or "") for i in data["items"]]
+    else:
+        items = [(t or "", data.get("lang") or "") for t in data.get("texts") or []]
+
+    if not items:
+        return {"error": "Nothing to translate."}, 400
+    if len(items) > TRANSLATE_MAX_ITEMS:
+        return {"error": f"At most {TRANSLATE_MAX_ITEMS} texts per request."}, 413
+
+    try:
+        translations = model_loader.translate_batch(items)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        print("❌ Batch translation error:", e)
+        return {"error": "Translation failed."}, 500
+
+    return {
+        "translations": translations,
+        "status": "success",
+        "timestamp": datetime.now().isoformat()
+    }, 200
+
+
+HISTORY_LIMIT = 20          # messages in a full /api/history response
+HISTORY_SYNC_LIMIT = 200    # max messages per ?after_id= page
+
+
+def history_etag(session_id: str, after_id, limit: int) -> str:
+    """Version tag of one history view: changes with the session's oldest / newest message id."""
+    oldest, newest = chat_db.history_version(session_id)
+    raw = f"{session_id}|{after_id}|{limit}|{oldest}|{newest}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def history_rows(session_id: str, after_id, limit: int) -> list:
+    rows = chat_db.get_history(limit, session_id=session_id, after_id=after_id)
+    return [{"id": i, "role": r, "content": c} for i, r, c in rows]
+
+
+def health_body():
+    """(body, ready) for /health."""
+    model = model_loader.status()
+    body = {
+        "status": "healthy",
+        "model": "Qwen2.5-1.5B + MarianMT",
+        "model_state": model,
+        "ready": model["ready"],
+        "response_cache": response_cache.stats(),
+        "weather_api": bool(OPENWEATHER_API),
+        "weather_client": weather_client.stats(),
+        "knowledge": knowledge.stats(),
+        "chat_store": chat_db.stats(),
+        "translation": model_loader.translation_stats(),
+        "climatology": climate_store.stats(),
+        "admission": model_loader.admission_stats(),
+        "semantic_cache": model_loader.semantic_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+    return body, model["ready"]
+
@@ -0,0 +1,337 @@
+# backend/utils/climatology.py
+#
+# Gridded day-of-year climatology for /weather/probability.
+#
+# build() turns daily observations (CSV, or NetCDF via the optional xarray)
+# into a lat/lon × day-of-year grid of event counts and writes one binary
+# file: a JSON header padded to HEADER_BYTES, then a little-endian uint32
+# array [lat, lon, day 0..366, channel]. Counts are stored cumulatively
+# along the day axis, so the total over any date range is two reads.
+#
+# ClimatologyStore memory-maps that file read-only. Nothing is copied into
+# the process: pages are faulted in on first touch and shared by every
+# worker through the OS page cache. Lookups interpolate bilinearly between
+# the four surrounding cells (cells without observations are skipped) and
+# are vectorized over a whole batch.
+
+import calendar
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+CLIMATOLOGY_PATH = os.getenv("CLIMATOLOGY_PATH", "data/climatology.bin")
+
+MAGIC = b"PCCLIM1\n"
+HEADER_BYTES = 4096             # page-aligned start of the array
+DAYS = 366                      # leap-year calendar: Feb 29 is day 59, Mar 1 day 60, every year
+EVENTS = ("rain", "extreme_heat", "high_wind", "cloudy", "good_weather")
+CHANNELS = EVENTS + ("observations",)
+
+# Event thresholds (the ones /weather/probability labels its conditions with)
+RAIN_MM = 5.0
+HEAT_C = 35.0
+WIND_KMH = 40.0
+CLOUD_PCT = 70.0
+
+# Accepted input column names (case-insensitive) → canonical name
+COLUMN_ALIASES = {
+    "date": ("date", "time", "day"),
+    "lat": ("lat", "latitude"),
+    "lon": ("lon", "lng", "longitude"),
+    "precip_mm": ("precip_mm", "precip", "prcp", "rain_mm", "rainfall"),
+    "tmax_c": ("tmax_c", "tmax", "temp_max", "max_temp"),
+    "wind_kmh": ("wind_kmh", "wind", "wind_speed"),
+    "cloud_pct": ("cloud_pct", "cloud", "cloud_cover", "cloudcover"),
+}
+
+
+def day_of_year(d) -> int:
+    """0-based day in the leap-year calendar used by the grid."""
+    doy = d.timetuple().tm_yday - 1
+    if d.month > 2 and not calendar.isleap(d.year):
+        doy += 1
+    return doy
+
+
+# ============================================================
+# OFFLINE BUILD
+# ============================================================
+
+def _standardize(df, source: str):
+    import pandas as pd
+
+    lower = {str(c).lower(): c for c in df.columns}
+    out = pd.DataFrame(index=df.index)
+    for name, aliases in COLUMN_ALIASES.items():
+        col = next((lower[a] for a in aliases if a in lower), None)
+        if col is None:
+            raise ValueError(f"{source}: no column for {name} (accepted: {', '.join(aliases)})")
+        out[name] = df[col]
+    out["date"] = pd.to_datetime(out["date"], errors="coerce")
+    for name in ("lat", "lon", "precip_mm", "tmax_c", "wind_kmh", "cloud_pct"):
+        out[name] = pd.to_numeric(out[name], errors="coerce")
+    return out
+
+
+def _read_observations(paths, chunk_rows: int):
+    """Yield standardized DataFrame chunks from CSV / NetCDF inputs."""
+    import pandas as pd
+
+    for path in paths:
+        if path.lower().endswith((".nc", ".nc4", ".netcdf")):
+            try:
+                import xarray as xr
+            except ImportError:
+                raise RuntimeError(f"{path}: NetCDF input needs xarray (pip install xarray netCDF4)")
+            with xr.open_dataset(path) as ds:
+                yield _standardize(ds.to_dataframe().reset_index(), path)
+        else:
+            for chunk in pd.read_csv(path, chunksize=chunk_rows):
+                yield _standardize(chunk, path)
+
+
+def _window_sums(grid: np.ndarray, window: int) -> np.ndarray:
+    """Circular moving sum of `window` days along axis 2 (window odd)."""
+    h = window // 2
+    padded = np.concatenate((grid[:, :, DAYS - h:], grid, grid[:, :, :h]), axis=2)
+    csum = np.cumsum(padded, axis=2)
+    csum = np.concatenate((np.zeros_like(csum[:, :, :1]), csum), axis=2)
+    return csum[:, :, window:] - csum[:, :, :-window]
+
+
+def build(paths, out_path: str, resolution=2.5, bbox=None, window=15, source=None,
+          chunk_rows=1_000_000) -> dict:
+    """
+    Grid daily observations into a climatology file; returns its header.
+
+    Each row is one day at one point (station or grid cell) with date,
+    lat, lon, precip_mm, tmax_c, wind_kmh and cloud_pct; rows with a
+    missing value are skipped. A row counts towards a cell's day of year
+    and, with window > 1, towards the days within ±window//2 of it too
+    (so a few decades of data still give stable daily frequencies).
+    """
+    paths = list(paths)
+    lat_min, lat_max, lon_min, lon_max = bbox or (-90.0, 90.0, -180.0, 180.0)
+    window = max(1, int(window) | 1)
+    nlat = int(np.ceil((lat_max - lat_min) / resolution))
+    nlon = int(np.ceil((lon_max - lon_min) / resolution))
+    if nlat <= 0 or nlon <= 0:
+        raise ValueError(f"empty grid for bbox {bbox}")
+    size = nlat * nlon * DAYS
+
+    sums = np.zeros((size, len(CHANNELS)), dtype=np.int64)
+    rows = used = 0
+    t0 = time.perf_counter()
+    for df in _read_observations(paths, chunk_rows):
+        rows += len(df)
+        df = df.dropna()
+        i = np.floor((df["lat"].to_numpy() - lat_min) / resolution).astype(np.int64)
+        j = np.floor((df["lon"].to_numpy() - lon_min) / resolution).astype(np.int64)
+        keep = (i >= 0) & (i < nlat) & (j >= 0) & (j < nlon)
+        if not keep.any():
+            continue
+        dates = df["date"].dt
+        doy = (dates.dayofyear - 1 + ((dates.month > 2) & ~dates.is_leap_year)).to_numpy()
+        flat = ((i * nlon + j) * DAYS + doy)[keep]
+
+        precip = df["precip_mm"].to_numpy()[keep]
+        tmax = df["tmax_c"].to_numpy()[keep]
+        wind = df["wind_kmh"].to_numpy()[keep]
+        cloud = df["cloud_pct"].to_numpy()[keep]
+        events = (
+            precip > RAIN_MM,
+            tmax > HEAT_C,
+            wind > WIND_KMH,
+            cloud > CLOUD_PCT,
+            (precip <= RAIN_MM) & (tmax <= HEAT_C) & (wind <= WIND_KMH) & (cloud <= CLOUD_PCT),
+        )
+        for c, hit in enumerate(events):
+            sums[:, c] += np.bincount(flat[hit], minlength=size)
+        sums[:, -1] += np.bincount(flat, minlength=size)
+        used += len(flat)
+
+    grid = sums.reshape(nlat, nlon, DAYS, len(CHANNELS))
+    del sums
+    if window > 1:
+        grid = _window_sums(grid, window)
+
+    cum = np.zeros((nlat, nlon, DAYS + 1, len(CHANNELS)), dtype=np.int64)
+    np.cumsum(grid, axis=2, out=cum[:, :, 1:])
+    del grid
+    if cum.size and cum[:, :, -1].max() > np.iinfo(np.uint32).max:
+        raise ValueError("too many observations per cell for uint32 counts; use a finer grid or a smaller window")
+
+    header = {
+        "version": 1,
+        "dtype": "<u4",
+        "shape": list(cum.shape),
+        "lat0": float(lat_min),
+        "lon0": float(lon_min),
+        "dlat": float(resolution),
+        "dlon": float(resolution),
+        "wrap_lon": nlon * resolution >= 360,
+        "window": window,
+        "channels": list(CHANNELS),
+        "thresholds": {"rain_mm": RAIN_MM, "heat_c": HEAT_C, "wind_kmh": WIND_KMH, "cloud_pct": CLOUD_PCT},
+        "source": source or ", ".join(os.path.basename(p) for p in paths),
+        "rows": rows,
+        "observations": used,
+        "built": datetime.now().isoformat(timespec="seconds"),
+    }
+    blob = MAGIC + json.dumps(header).encode()
+    if len(blob) > HEADER_BYTES:
+        raise ValueError("climatology header too large")
+
+    # Write next to the target and swap in atomically: running workers keep
+    # their mapping of the old file and pick up the new one on their next lookup.
+    tmp = f"{out_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob.ljust(HEADER_BYTES, b"\0"))
+        f.write(cum.astype("<u4").tobytes())
+    os.replace(tmp, out_path)
+    print(f"🌦️  Climatology written to {out_path}: {nlat}×{nlon} cells, {used:,} of {rows:,} rows, "
+          f"{os.path.getsize(out_path) / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s")
+    return header
+
+
+# ============================================================
+# MEMORY-MAPPED LOOKUPS
+# ============================================================
+
+class Climatology:
+    """One memory-mapped climatology file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+        if not head.startswith(MAGIC):
+            raise ValueError(f"{path}: not a climatology file")
+        meta = json.loads(head[len(MAGIC):].rstrip(b"\0").decode())
+        self.meta = meta
+        self.data = np.memmap(path, dtype=meta["dtype"], mode="r", offset=HEADER_BYTES,
+                              shape=tuple(meta["shape"]))
+        self.nlat, self.nlon = self.data.shape[:2]
+        self.lat0, self.lon0 = meta["lat0"], meta["lon0"]
+        self.dlat, self.dlon = meta["dlat"], meta["dlon"]
+        self.wrap_lon = meta["wrap_lon"]
+        self.window = meta["window"]
+        self.source = meta.get("source") or "gridded observations"
+
+    def _range_totals(self, i, j, first, last, full):
+        """(n, channels) totals over each item's day range (wrapping past Dec 31)."""
+        d = self.data
+        year = d[i, j, DAYS].astype(np.int64)
+        totals = d[i, j, last + 1].astype(np.int64) - d[i, j, first]
+        totals += np.where((first > last)[:, None], year, 0)
+        return np.where(full[:, None], year, totals)
+
+    def lookup(self, lats, lons, first_days, last_days, n_days):
+        """
+        Event probabilities over each item's date range.
+
+        Returns (percent, observations): percent is (n, len(EVENTS)) with
+        NaN rows where no surrounding cell has data; observations is the
+        interpolated number of daily observations behind each row.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        first = np.asarray(first_days, dtype=np.intp)
+        last = np.asarray(last_days, dtype=np.intp)
+        full = np.asarray(n_days) >= DAYS
+        n = len(lats)
+
+        # Cell centres sit at lat0 + (i + 0.5) * dlat
+        fi = (lats - self.lat0) / self.dlat - 0.5
+        inside = (fi >= -0.5) & (fi <= self.nlat - 0.5)
+        if self.wrap_lon:
+            fj = ((lons - self.lon0) % 360.0) / self.dlon - 0.5
+        else:
+            fj = (lons - self.lon0) / self.dlon - 0.5
+            inside &= (fj >= -0.5) & (fj <= self.nlon - 0.5)
+
+        i0 = np.floor(fi).astype(np.intp)
+        j0 = np.floor(fj).astype(np.intp)
+        ti = fi - i0
+        tj = fj - j0
+
+        weighted = np.zeros((n, len(EVENTS)))
+        obs = np.zeros(n)
+        wsum = np.zeros(n)
+        for di, dj in ((0, 0), (0, 1), (1, 0), (1, 1)):
+            i = np.clip(i0 + di, 0, self.nlat - 1)
+            j = (j0 + dj) % self.nlon if self.wrap_lon else np.clip(j0 + dj, 0, self.nlon - 1)
+            w = (ti if di else 1 - ti) * (tj if dj else 1 - tj)
+            totals = self._range_totals(i, j, first, last, full)
+            cell_obs = totals[:, -1]
+            w = np.where(inside & (cell_obs > 0), w, 0.0)
+            weighted += w[:, None] * totals[:, :-1] / np.maximum(cell_obs, 1)[:, None]
+            obs += w * cell_obs
+            wsum += w
+
+        have = wsum > 0
+        percent = np.full((n, len(EVENTS)), np.nan)
+        percent[have] = np.round(100 * weighted[have] / wsum[have, None], 2)
+        observations = np.zeros(n)
+        observations[have] = obs[have] / wsum[have] / self.window
+        return percent, observations
+
+    def stats(self) -> dict:
+        return {
+            "cells": [self.nlat, self.nlon],
+            "resolution": [self.dlat, self.dlon],
+            "window_days": self.window,
+            "observations": self.meta.get("observations"),
+            "source": self.source,
+            "built": self.meta.get("built"),
+            "mapped_mb": round(self.data.nbytes / 1e6, 1),
+        }
+
+
+class ClimatologyStore:
+    """Opens CLIMATOLOGY_PATH lazily and remaps it when the file is replaced."""
+
+    def __init__(self, path: str = CLIMATOLOGY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._clim = None
+        self._sig = None
+        self.loads = 0
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def get(self):
+        """The current Climatology, or None if there is no (usable) file."""
+        sig = self._signature()
+        if sig != self._sig:
+            with self._lock:
+                if sig != self._sig:
+                    clim = None
+                    if sig:
+                        try:
+                            clim = Climatology(self.path)
+                            self.loads += 1
+                            print(f"🌦️  Climatology mapped from {self.path} ({clim.source})")
+                        except Exception as e:
+                            print(f"❌ Climatology file {self.path} unusable:", e)
+                    self._clim, self._sig = clim, sig
+        return self._clim
+
+    def stats(self) -> dict:
+        clim = self.get()
+        body = {"path": self.path, "available": clim is not None, "loads": self.loads}
+        if clim is not None:
+            body.update(clim.stats())
+        return body
+
+
+# Shared store used by utils.probability
+climate_store = ClimatologyStore()
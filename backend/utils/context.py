@@ -0,0 +1,186 @@
+# backend/utils/context.py
+#
+# Token-budgeted prompt assembly for the chat model.
+#
+# A prompt is laid out as
+#
+#   <|system|> preamble\n                 head   (prefix-cached KV, see utils.prefix_cache)
+#   <|system|> Earlier in this ...\n      summary of turns that no longer fit (optional)
+#   <|user|> ...\n <|assistant|> ...\n    history, oldest → newest
+#   Context: ...\n<|user|> question\n     body
+#   <|assistant|>                         tail
+#
+# History turns are added newest-first while they fit NLM_CONTEXT_TOKENS;
+# older ones are folded into a one-line extractive summary instead of being
+# cut mid-turn. Every segment is tokenized on its own and memoized, so a
+# turn is tokenized once (when it is asked) and reused from then on: each
+# new message only tokenizes its own question.
+
+import os
+import threading
+from collections import OrderedDict
+
+from utils.text_summarizer import summarize_turns
+
+NLM_CONTEXT_TOKENS = int(os.getenv("NLM_CONTEXT_TOKENS", "1536"))    # prompt budget, generation excluded
+NLM_SUMMARY_TOKENS = int(os.getenv("NLM_SUMMARY_TOKENS", "64"))
+NLM_TOKEN_CACHE_SIZE = int(os.getenv("NLM_TOKEN_CACHE_SIZE", "4096"))  # memoized segments
+
+ASSISTANT_TAG = "<|assistant|>"
+_ROLE_TAGS = {"user": "<|user|>", "ai": ASSISTANT_TAG, "assistant": ASSISTANT_TAG}
+
+
+def turn_segment(role: str, content: str) -> str:
+    """Prompt text for one stored chat message (roles as in utils.db: user / ai)."""
+    return f"{_ROLE_TAGS.get(role, '<|user|>')} {content.strip()}\n"
+
+
+class ContextAssembler:
+    def __init__(self, budget: int = NLM_CONTEXT_TOKENS, summary_tokens: int = NLM_SUMMARY_TOKENS,
+                 cache_size: int = NLM_TOKEN_CACHE_SIZE):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.cache_size = cache_size
+        self._ids = OrderedDict()        # segment text → token ids (LRU)
+        self._specials = []              # what the tokenizer adds around a whole prompt (e.g. BOS)
+        self._tokenizer_id = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.turns_dropped = 0
+        self.hard_capped = 0
+
+    # ------------------------------------------------------------
+    # Segment tokenization (memoized)
+    # ------------------------------------------------------------
+
+    def _bind(self, tokenizer):
+        if self._tokenizer_id != id(tokenizer):
+            # different tokenizer (model reload) → cached ids are meaningless
+            self._ids.clear()
+            self._specials = list(tokenizer("")["input_ids"])
+            self._tokenizer_id = id(tokenizer)
+
+    def _encode(self, tokenizer, text: str) -> list:
+        with self._lock:
+            self._bind(tokenizer)
+            ids = self._ids.get(text)
+            if ids is not None:
+                self._ids.move_to_end(text)
+                self.hits += 1
+                self.tokens_saved += len(ids)
+                return ids
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        with self._lock:
+            self.misses += 1
+            self._ids[text] = ids
+            while len(self._ids) > self.cache_size:
+                self._ids.popitem(last=False)
+        return ids
+
+    # ------------------------------------------------------------
+    # Assembly
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _split(prompt: str):
+        """(head, body, tail): leading <|system|> line, the rest, trailing <|assistant|> tag."""
+        head = ""
+        if prompt.startswith("<|system|>") and "\n" in prompt:
+            cut = prompt.index("\n") + 1
+            head, prompt = prompt[:cut], prompt[cut:]
+        tail = ASSISTANT_TAG if prompt.endswith(ASSISTANT_TAG) else ""
+        return head, prompt[:len(prompt) - len(tail)], tail
+
+    def assemble(self, tokenizer, prompt: str, history=None, budget: int = None):
+        """
+        Build the prompt for `prompt` with as much of `history` ([(role,
+        content)], oldest first, not including the current question) as the
+        token budget allows. Returns (prompt text, input ids).
+        """
+        budget = budget or self.budget
+        head, body, tail = self._split(prompt)
+        head_ids = self._encode(tokenizer, head) if head else []
+        body_ids = self._encode(tokenizer, body) if body else []
+        tail_ids = self._encode(tokenizer, tail) if tail else []
+        fixed = len(self._specials) + len(head_ids) + len(tail_ids)
+
+        if fixed + len(body_ids) > budget:
+            # The question alone overflows: keep the preamble and the end
+            # of the body (the question itself), cut from the middle.
+            self.hard_capped += 1
+            keep = max(0, budget - fixed)
+            body_ids = body_ids[len(body_ids) - keep:] if keep else []
+            ids = self._specials + head_ids + body_ids + tail_ids
+            return prompt, ids
+
+        room = budget - fixed - len(body_ids)
+        turns = list(history or ())
+        kept = []       # (role, text, ids), newest first
+        used = 0
+        for role, content in reversed(turns):
+            text = turn_segment(role, content)
+            ids = self._encode(tokenizer, text)
+            if used + len(ids) > room:
+                break
+            kept.append((role, text, ids))
+            used += len(ids)
+        used -= self._trim_orphans(kept, len(turns))
+
+        summary_text, summary_ids = "", []
+        dropped = turns[:len(turns) - len(kept)]
+        if dropped:
+            summary_text, summary_ids = self._summary(tokenizer, dropped)
+            # Make room for the summary line by giving up the oldest kept turns
+            while kept and used + len(summary_ids) > room:
+                used -= len(kept.pop()[2])
+                used -= self._trim_orphans(kept, len(turns))
+                dropped = turns[:len(turns) - len(kept)]
+                summary_text, summary_ids = self._summary(tokenizer, dropped)
+            if used + len(summary_ids) > room:
+                summary_text, summary_ids = "", []
+            self.turns_dropped += len(dropped)
+
+        kept.reverse()
+        text = head + summary_text + "".join(t for _, t, _ in kept) + body + tail
+        ids = self._specials + head_ids + summary_ids
+        for _, _, turn_ids in kept:
+            ids += turn_ids
+        return text, ids + body_ids + tail_ids
+
+    @staticmethod
+    def _trim_orphans(kept: list, total: int) -> int:
+        """Drop a kept answer whose question did not fit; returns the tokens freed."""
+        freed = 0
+        while kept and len(kept) < total and kept[-1][0] != "user":
+            freed += len(kept.pop()[2])
+        return freed
+
+    def _summary(self, tokenizer, turns: list):
+        max_chars = self.summary_tokens * 4    # ~4 characters per token for English
+        while max_chars >= 40:
+            line = summarize_turns(turns, max_chars=max_chars)
+            if not line:
+                break
+            text = f"<|system|> {line}\n"
+            ids = self._encode(tokenizer, text)
+            if len(ids) <= self.summary_tokens:
+                return text, ids
+            max_chars //= 2
+        return "", []
+
+    def stats(self) -> dict:
+        return {
+            "budget_tokens": self.budget,
+            "cached_segments": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_saved": self.tokens_saved,
+            "turns_dropped": self.turns_dropped,
+            "hard_capped": self.hard_capped,
+        }
+
+
+# Shared instance used by utils.nlp_model
+context_assembler = ContextAssembler()
@@ -1,38 +1,327 @@
+import os
+import queue
 import sqlite3
+import threading
+import time
+
+DB = os.getenv("CHAT_DB_PATH", "chat_memory.db")
+DEFAULT_SESSION = "default"
+
+# Group commit: the writer thread commits up to WRITE_BATCH_SIZE queued
+# inserts at once, waiting at most WRITE_BATCH_WAIT_MS for a batch to fill.
+WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "256"))
+WRITE_BATCH_WAIT_MS = float(os.getenv("CHAT_WRITE_BATCH_WAIT_MS", "5"))
+
+# Optional retention (runs in a background thread, never on the request
+# path). Off by default: set either limit to prune; history is kept otherwise.
+RETENTION_ROWS = int(os.getenv("CHAT_RETENTION_ROWS", "0"))        # per session, 0 = keep all
+RETENTION_DAYS = float(os.getenv("CHAT_RETENTION_DAYS", "0"))      # 0 = keep forever
+PRUNE_INTERVAL = float(os.getenv("CHAT_PRUNE_INTERVAL", "300"))
+PRUNE_CHUNK = 5000
+
+_local = threading.local()
+
+
+# ============================================================
+# CONNECTIONS (one per thread, re-opened after fork)
+# ============================================================
+
+def _connect():
+    conn = sqlite3.connect(DB, timeout=30)
+    # Switching a file to WAL needs it to itself and does not wait on the busy
+    # timeout; several workers opening a fresh database at once must retry.
+    for attempt in range(100):
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            break
+        except sqlite3.OperationalError:
+            if attempt == 99:
+                raise
+            time.sleep(0.05)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
 
-DB = "chat_memory.db"
 
 def init_db():
-    conn = sqlite3.connect(DB)
+    conn = _conn()
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS chat_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             role TEXT,
             content TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id TEXT NOT NULL DEFAULT 'default'
         )
     """)
-    conn.commit()
-    conn.close()
 
-def add_message(role, content):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("INSERT INTO chat_history (role, content) VALUES (?, ?)", (role, content))
+    # Databases created before sessions existed: their rows become 'default'
+    cols = {row[1] for row in c.execute("PRAGMA table_info(chat_history)")}
+    if "session_id" not in cols:
+        c.execute("ALTER TABLE chat_history ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default'")
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history(session_id, id)")
+    if RETENTION_DAYS > 0:
+        c.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_ts ON chat_history(timestamp)")
     conn.commit()
-    conn.close()
 
-def get_recent_messages(limit=6):
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute("SELECT role, content FROM chat_history ORDER BY id DESC LIMIT ?", (limit,))
+    _start_pruner()
+
+
+# ============================================================
+# GROUP-COMMIT WRITER
+# ============================================================
+
+class _Writer:
+    """Single writer thread; add_message() only enqueues."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.cond = threading.Condition()
+        self.enqueued = 0
+        self.done = 0           # writes processed (committed or failed), in queue order
+        self.committed = 0
+        self.failed = 0
+        self.batches = 0
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, row):
+        with self.cond:
+            self.enqueued += 1
+            seq = self.enqueued
+        self.queue.put(row)
+        return seq
+
+    def wait_for(self, seq, timeout=5.0) -> bool:
+        """
+        Block until every write up to `seq` has been processed (read-your-writes).
+        False if that did not happen within `timeout` seconds.
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: self.done >= seq, timeout=timeout)
+
+    def _drain(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + WRITE_BATCH_WAIT_MS / 1000.0
+        while len(batch) < WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, remaining)) if remaining > 0
+                             else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, conn, rows) -> bool:
+        try:
+            conn.executemany(
+                "INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            conn.rollback()
+            if len(rows) == 1:
+                print("❌ Chat history write failed:", e)
+            return False
+
+    def _run(self):
+        conn = _conn()
+        while True:
+            batch = self._drain()
+            committed = len(batch)
+            if not self._insert(conn, batch):
+                # One bad row (or a transient error) must not take the whole batch with it
+                committed = sum(self._insert(conn, [row]) for row in batch)
+                if committed < len(batch):
+                    print(f"❌ Dropped {len(batch) - committed} of {len(batch)} chat messages")
+            with self.cond:
+                self.done += len(batch)
+                self.committed += committed
+                self.failed += len(batch) - committed
+                self.batches += 1
+                self.cond.notify_all()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = _Writer()
+    return _writer
+
+
+def flush() -> bool:
+    """
+    Wait until everything queued so far is written. False (and a warning)
+    if the writer is still behind after the wait: reads may then be stale.
+    """
+    w = _writer
+    if w is None or w.pid != os.getpid():
+        return True
+    if not w.wait_for(w.enqueued):
+        print(f"⚠️ Chat history writer is behind ({w.enqueued - w.done} queued); reads may be stale")
+        return False
+    return True
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def add_message(role, content, session_id=DEFAULT_SESSION):
+    _get_writer().put((session_id or DEFAULT_SESSION, role, content))
+
+
+def get_recent_messages(limit=6, session_id=DEFAULT_SESSION):
+    flush()
+    c = _conn().cursor()
+    c.execute(
+        "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+        (session_id or DEFAULT_SESSION, limit),
+    )
     rows = c.fetchall()
-    conn.close()
     return rows[::-1]
 
-def clear_history():
-    conn = sqlite3.connect(DB)
-    conn.execute("DELETE FROM chat_history")
+
+def get_history(limit=20, session_id=DEFAULT_SESSION, after_id=None):
+    """
+    (id, role, content) rows, oldest first: the last `limit` messages, or
+    with `after_id` the first `limit` messages newer than that id.
+    """
+    flush()
+    c = _conn().cursor()
+    sid = session_id or DEFAULT_SESSION
+    if after_id is None:
+        c.execute(
+            "SELECT id, role, content FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (sid, limit),
+        )
+        return c.fetchall()[::-1]
+    c.execute(
+        "SELECT id, role, content FROM chat_history WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+        (sid, after_id, limit),
+    )
+    return c.fetchall()
+
+
+def history_version(session_id=DEFAULT_SESSION):
+    """
+    (oldest id, newest id) of a session — (None, None) when empty. Ids only
+    grow (AUTOINCREMENT), so this changes whenever a message is added,
+    cleared or pruned; both ends are single seeks on the session index.
+    """
+    flush()
+    sid = session_id or DEFAULT_SESSION
+    # Two scalar subqueries: SQLite only turns a lone MIN()/MAX() into an index seek
+    row = _conn().execute(
+        "SELECT (SELECT MIN(id) FROM chat_history WHERE session_id = ?),"
+        "       (SELECT MAX(id) FROM chat_history WHERE session_id = ?)",
+        (sid, sid),
+    ).fetchone()
+    return row[0], row[1]
+
+
+def clear_history(session_id=None):
+    """Delete one session's history, or everything when session_id is None."""
+    flush()
+    conn = _conn()
+    if session_id is None:
+        conn.execute("DELETE FROM chat_history")
+    else:
+        conn.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
     conn.commit()
-    conn.close()
+
+
+def stats():
+    w = _writer
+    return {
+        "queued": 0 if w is None else w.enqueued - w.done,
+        "committed": 0 if w is None else w.committed,
+        "failed": 0 if w is None else w.failed,
+        "batches": 0 if w is None else w.batches,
+    }
+
+
+# ============================================================
+# RETENTION
+# ============================================================
+
+def prune_history():
+    """Cap each session at RETENTION_ROWS and drop rows older than RETENTION_DAYS."""
+    conn = _conn()
+    removed = 0
+
+    if RETENTION_ROWS > 0:
+        sessions = [r[0] for r in conn.execute("SELECT DISTINCT session_id FROM chat_history")]
+        for sid in sessions:
+            row = conn.execute(
+                "SELECT id FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (sid, RETENTION_ROWS),
+            ).fetchone()
+            if not row:
+                continue
+            # Delete in chunks so the write lock is never held for long
+            while True:
+                cur = conn.execute("""
+                    DELETE FROM chat_history WHERE id IN (
+                        SELECT id FROM chat_history WHERE session_id = ? AND id <= ? LIMIT ?
+                    )
+                """, (sid, row[0], PRUNE_CHUNK))
+                conn.commit()
+                removed += cur.rowcount
+                if cur.rowcount < PRUNE_CHUNK:
+                    break
+
+    if RETENTION_DAYS > 0:
+        while True:
+            cur = conn.execute("""
+                DELETE FROM chat_history WHERE id IN (
+                    SELECT id FROM chat_history WHERE timestamp < datetime('now', ?) LIMIT ?
+                )
+            """, (f"-{RETENTION_DAYS} days", PRUNE_CHUNK))
+            conn.commit()
+            removed += cur.rowcount
+            if cur.rowcount < PRUNE_CHUNK:
+                break
+
+    return removed
+
+
+_pruner_pid = None
+
+
+def _start_pruner():
+    global _pruner_pid
+    if _pruner_pid == os.getpid() or (RETENTION_ROWS <= 0 and RETENTION_DAYS <= 0):
+        return
+    _pruner_pid = os.getpid()
+
+    def loop():
+        while True:
+            time.sleep(PRUNE_INTERVAL)
+            try:
+                removed = prune_history()
+                if removed:
+                    print(f"🧹 Pruned {removed} old chat messages")
+            except sqlite3.Error as e:
+                print("❌ Chat history prune failed:", e)
+
+    threading.Thread(target=loop, name="chat-pruner", daemon=True).start()
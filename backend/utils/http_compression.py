@@ -0,0 +1,96 @@
+# backend/utils/http_compression.py
+#
+# Response compression for large JSON bodies (/weather/probability batch
+# results, chat history).
+#
+# - brotli when the client accepts it and the `brotli` package is
+#   installed (optional), else gzip (stdlib)
+# - only 2xx bodies of at least COMPRESS_MIN_BYTES with a text / JSON
+#   mimetype; streamed (SSE) and already-encoded responses pass through
+# - Vary: Accept-Encoding on everything that could be compressed, and a
+#   strong ETag becomes weak once the bytes are re-encoded
+
+import gzip
+import os
+
+from werkzeug.http import parse_accept_header
+
+from utils import metrics
+
+try:
+    import brotli
+except ImportError:     # gzip only
+    brotli = None
+
+COMPRESS = os.getenv("COMPRESS", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))   # 11 is too slow per request
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "text/")
+
+
+def encodings() -> tuple:
+    """Encodings this process can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept) -> str:
+    """Best encoding allowed by a werkzeug Accept-Encoding header, or None."""
+    best, best_q = None, 0
+    for enc in encodings():
+        q = accept.quality(enc)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def parse_accept_encoding(value: str):
+    """werkzeug Accept object for a raw Accept-Encoding header (non-Flask servers)."""
+    return parse_accept_header(value or "")
+
+
+def encode(data: bytes, encoding: str) -> bytes:
+    """Compress `data` with `encoding` ("br" or "gzip"), counting raw / sent bytes."""
+    with metrics.stage("compress"):
+        if encoding == "br":
+            body = brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+        else:
+            body = gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+    metrics.HTTP_BODY_BYTES.inc(len(data), encoding=encoding, stage="raw")
+    metrics.HTTP_BODY_BYTES.inc(len(body), encoding=encoding, stage="sent")
+    return body
+
+
+def _compressible(response) -> bool:
+    mimetype = response.mimetype or ""
+    return (
+        COMPRESS
+        and 200 <= response.status_code < 300
+        and response.status_code != 204
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and mimetype.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compress_response(response, accept):
+    """Compress `response` in place for the client's Accept-Encoding when worth it."""
+    if not _compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = choose_encoding(accept)
+    if encoding is None:
+        return response
+
+    response.set_data(encode(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
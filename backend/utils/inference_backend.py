@@ -0,0 +1,185 @@
+# backend/utils/inference_backend.py
+#
+# Inference backends for the chat model (utils.nlp_model) and the MarianMT
+# translators (utils.translation). Both only load weights and call
+# generate() through a backend, so the runtime is a deployment choice:
+#
+#   NLM_BACKEND=torch|onnx           chat model     (default torch)
+#   TRANSLATION_BACKEND=torch|onnx   translation    (default NLM_BACKEND)
+#
+# - torch: transformers on PyTorch, as before (precision modes, assisted
+#   decoding, prefix KV cache).
+# - onnx:  ONNX Runtime on CPU. Models are exported once with KV-cache
+#   inputs/outputs (optimum's exporter; decoder-with-past graphs for Qwen
+#   and for the Marian decoder) into ONNX_EXPORT_DIR and reused on later
+#   starts. Decoding is the same greedy generate() loop — stopping
+#   criteria, streamers and deadlines work unchanged — with every step a
+#   graph-optimized ORT session call on ORT_INTRA_OP_THREADS /
+#   ORT_INTER_OP_THREADS threads. Needs `pip install optimum[onnxruntime]`;
+#   without it the torch backend is used.
+
+import gc
+import os
+import re
+
+import torch
+
+NLM_BACKEND = os.getenv("NLM_BACKEND", "torch").strip().lower()
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", NLM_BACKEND).strip().lower()
+
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", "data/onnx")
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))   # 0 → ORT default (one per physical core)
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "1"))   # >1 runs independent graph branches in parallel
+
+
+# ============================================================
+# PYTORCH
+# ============================================================
+
+class TorchBackend:
+    name = "torch"
+    # generate() extras only PyTorch models accept
+    supports_assisted = True
+    supports_prefix_cache = True
+    supports_hidden_states = True
+
+    def __init__(self, device=None):
+        self.device = device or torch.device("cpu")
+
+    def load_causal_lm(self, model_id: str, precision: str = "fp32"):
+        """from_pretrained() in the requested precision, in eval mode on the device."""
+        from transformers import AutoModelForCausalLM
+
+        if precision == "int8" and self.device.type != "cpu":
+            print("⚠️ int8 dynamic quantization is CPU-only — using fp32")
+            precision = "fp32"
+
+        mod = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
+            low_cpu_mem_usage=True,   # no extra fp32 copy while loading
+        )
+        mod.to(self.device).eval()
+
+        if precision == "int8":
+            # Swaps each nn.Linear for an int8 one; the fp32 weights are freed
+            mod = torch.ao.quantization.quantize_dynamic(mod, {torch.nn.Linear}, dtype=torch.qint8)
+            gc.collect()
+        return mod
+
+    def load_seq2seq(self, model_id: str):
+        from transformers import MarianMTModel
+        return MarianMTModel.from_pretrained(model_id).to("cpu").eval()  # safer on CPU
+
+    def generate(self, model, **kwargs):
+        with torch.no_grad():
+            return model.generate(**kwargs)
+
+    def model_mb(self, model) -> float:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+
+    def stats(self) -> dict:
+        return {"name": self.name, "device": str(self.device), "threads": torch.get_num_threads()}
+
+
+# ============================================================
+# ONNX RUNTIME (CPU)
+# ============================================================
+
+class OnnxRuntimeBackend:
+    name = "onnx"
+    supports_assisted = False
+    supports_prefix_cache = False
+    supports_hidden_states = False
+
+    def __init__(self, export_dir=ONNX_EXPORT_DIR, intra_op_threads=ORT_INTRA_OP_THREADS,
+                 inter_op_threads=ORT_INTER_OP_THREADS):
+        import onnxruntime  # noqa: F401 — fail here (→ torch fallback) rather than at load time
+        from optimum import onnxruntime as _  # noqa: F401
+
+        self.export_dir = export_dir
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.device = torch.device("cpu")
+
+    def _session_options(self):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = self.intra_op_threads
+        opts.inter_op_num_threads = self.inter_op_threads
+        opts.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if self.inter_op_threads > 1
+                               else ort.ExecutionMode.ORT_SEQUENTIAL)
+        return opts
+
+    def _export_path(self, model_id: str) -> str:
+        return os.path.join(self.export_dir, re.sub(r"[^A-Za-z0-9._-]+", "--", model_id.strip("/")))
+
+    def _load(self, cls, model_id: str):
+        """Load the cached export of model_id, exporting it (with KV-cache I/O) first if needed."""
+        path = self._export_path(model_id)
+        opts = dict(provider="CPUExecutionProvider", session_options=self._session_options(), use_cache=True)
+        exported = os.path.isdir(path) and any(f.endswith(".onnx") for f in os.listdir(path))
+        if exported:
+            return cls.from_pretrained(path, **opts)
+
+        print(f"🔄 Exporting {model_id} to ONNX (one-time) → {path}")
+        mod = cls.from_pretrained(model_id, export=True, **opts)
+        try:
+            mod.save_pretrained(path)
+        except OSError as e:
+            print("⚠️ Could not keep the ONNX export (will export again next start):", e)
+        return mod
+
+    def load_causal_lm(self, model_id: str, precision: str = "fp32"):
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        if precision != "fp32":
+            print(f"⚠️ NLM_PRECISION={precision} applies to the torch backend only — ONNX runs fp32")
+        return self._load(ORTModelForCausalLM, model_id)
+
+    def load_seq2seq(self, model_id: str):
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        return self._load(ORTModelForSeq2SeqLM, model_id)
+
+    def generate(self, model, **kwargs):
+        # ORT does the math; no autograd graph to build for the torch glue either
+        with torch.no_grad():
+            return model.generate(**kwargs)
+
+    def model_mb(self, model) -> float:
+        path = str(getattr(model, "model_save_dir", "") or "")
+        if not os.path.isdir(path):
+            return 0.0
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+                   if ".onnx" in f) / (1024 * 1024)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "device": "cpu",
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "export_dir": self.export_dir,
+        }
+
+
+# ============================================================
+# SELECTION
+# ============================================================
+
+BACKENDS = {"torch": TorchBackend, "onnx": OnnxRuntimeBackend}
+
+
+def get_backend(name: str, device=None):
+    """Backend instance for `name`; unknown names or a missing runtime fall back to torch."""
+    if name == "onnx":
+        try:
+            return OnnxRuntimeBackend()
+        except ImportError as e:
+            print(f"⚠️ ONNX backend unavailable ({e}) — using torch. Install optimum[onnxruntime].")
+    elif name != "torch":
+        print(f"⚠️ Unknown inference backend {name!r} — using torch")
+    return TorchBackend(device)
@@ -0,0 +1,145 @@
+# backend/utils/intent_router.py
+#
+# Intent classification for plan_response().
+#
+# All routing keywords are compiled into one alternation, so a message is
+# lower-cased once and scanned once (findall runs entirely in C); the
+# highest-priority keyword found decides the intent
+# (translation > capabilities > weather > lookup).
+# Matching is plain substring matching, exactly like the old chain of
+# `in` checks. Slots (phrase/target, city, who-is name) are extracted with
+# precompiled patterns, only for the intent that needs them.
+
+import re
+
+TRANSLATION = "translation"
+CAPABILITIES = "capabilities"
+WEATHER = "weather"
+LOOKUP = "lookup"           # who-is / Wikipedia / DuckDuckGo / general LLM
+
+TRANSLATION_KEYS = ("translate",)
+CAPABILITY_KEYS = ("what can you do", "capabilities", "help", "what do you do")
+WEATHER_TERMS = ("weather", "temp", "temperature", "forecast", "humidity")
+
+_PRIORITY = {TRANSLATION: 0, CAPABILITIES: 1, WEATHER: 2}
+_KEYWORDS = {k: kind for kind, keys in ((TRANSLATION, TRANSLATION_KEYS),
+                                        (CAPABILITIES, CAPABILITY_KEYS),
+                                        (WEATHER, WEATHER_TERMS)) for k in keys}
+
+
+def _best_kind(s: str):
+    """Highest-priority intent among all keywords occurring in s."""
+    kinds = [kind for k, kind in _KEYWORDS.items() if k in s]
+    return min(kinds, key=_PRIORITY.__getitem__) if kinds else None
+
+
+def _compile_keywords():
+    """
+    One alternation over every keyword; findall() then reports the same
+    intents a separate `k in text` check per keyword would. Two details
+    keep that exact: a match string maps to the best intent of every
+    keyword it contains, and where a keyword's tail can start another one
+    ("forecast" + "translate") the first match stops short so the second
+    is still found.
+    """
+    alts, kinds = [], {}
+    for k in sorted(_KEYWORDS, key=len, reverse=True):
+        for j in _KEYWORDS:
+            for n in range(1, min(len(k), len(j))):
+                if k.endswith(j[:n]):
+                    head = k[:-n]
+                    alts.append(f"{re.escape(head)}(?={re.escape(j)})")
+                    kinds[head] = _best_kind(k)
+        alts.append(re.escape(k))
+        kinds[k] = _best_kind(k)
+    return re.compile("|".join(alts)), kinds
+
+
+_KEYWORD_RE, _MATCH_KIND = _compile_keywords()
+
+_LOCATION_RE = re.compile(r"\b(?:in|at|for)\s+([A-Za-z\s\.,-]+)$", re.I)
+_WHO_RE = re.compile(r"^\s*who\s+(is|was)\s+(.+?)\??\s*$", re.I)
+_WHO_TRAILING_PREP_RE = re.compile(r"\b(in|from|of|at)\s*$", re.I)
+_QUOTED_RE = re.compile(r"[\"'“”‘’](.+?)[\"'“”‘’]")
+_TARGET_LANG_RE = re.compile(r"\b(to|into)\s+([A-Za-z]+)$", re.I)
+_TRANSLATE_WORD_RE = re.compile(r"translate", re.I)
+
+
+class Intent:
+    """Router decision plus the slots its branch needs (unused slots stay None)."""
+
+    __slots__ = ("kind", "phrase", "target", "city", "who")
+
+    def __init__(self, kind, phrase=None, target=None, city=None, who=None):
+        self.kind = kind
+        self.phrase = phrase
+        self.target = target
+        self.city = city
+        self.who = who
+
+    def as_tuple(self) -> tuple:
+        return self.kind, self.phrase, self.target, self.city, self.who
+
+    def __eq__(self, other):
+        return isinstance(other, Intent) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        slots = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__[1:] if getattr(self, k))
+        return f"Intent({self.kind}{', ' + slots if slots else ''})"
+
+
+# ============================================================
+# SLOT EXTRACTION
+# ============================================================
+
+def extract_location(text: str):
+    """City name after 'in', 'at', or 'for' (handles trailing punctuation)."""
+    cleaned = text.strip().rstrip("?.!")
+    m = _LOCATION_RE.search(cleaned)
+    return m.group(1).strip(" .,-") if m else None
+
+
+def parse_who_name(q: str):
+    """Name from 'who is X' / 'who was X' questions, else None."""
+    m = _WHO_RE.match(q)
+    if not m:
+        return None
+    return _WHO_TRAILING_PREP_RE.sub("", m.group(2)).strip()
+
+
+def parse_translation_query(text: str):
+    """(quoted phrase or None, target language or None)."""
+    q = _QUOTED_RE.search(text)
+    lang = _TARGET_LANG_RE.search(text.strip())
+    return (q.group(1) if q else None), (lang.group(2) if lang else None)
+
+
+# ============================================================
+# CLASSIFIER
+# ============================================================
+
+def keyword_intent(text: str):
+    """Highest-priority keyword intent in (lower-cased) text, or None."""
+    found = _KEYWORD_RE.findall(text)
+    if not found:
+        return None
+    return min((_MATCH_KIND[m] for m in found), key=_PRIORITY.__getitem__)
+
+
+def classify(user_input: str) -> Intent:
+    text = user_input.lower()
+    kind = keyword_intent(text)
+
+    if kind == TRANSLATION:
+        phrase, target = parse_translation_query(user_input)
+        if not phrase:
+            phrase = _TRANSLATE_WORD_RE.sub("", text.strip()).strip()
+        return Intent(TRANSLATION, phrase=phrase, target=target)
+
+    if kind == CAPABILITIES:
+        return Intent(CAPABILITIES)
+
+    if kind == WEATHER:
+        return Intent(WEATHER, city=extract_location(user_input))
+
+    return Intent(LOOKUP, who=parse_who_name(user_input))
@@ -0,0 +1,274 @@
+# backend/utils/metrics.py
+#
+# Minimal in-process metrics + per-request tracing.
+#
+# - Counter / Histogram / GaugeFunc with labels, rendered in the
+#   Prometheus text exposition format by render() (served at /metrics)
+# - stage("name") times a block: it always feeds the
+#   pastcast_stage_seconds histogram and, if a Trace is active for the
+#   current request (start_trace()), also adds to that request's breakdown
+#
+# No client library needed; metrics are per process.
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # key → [bucket counts..., +Inf count], sum
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                running += n
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {running}")
+        return lines
+
+
+class GaugeFunc(_Metric):
+    """Gauge read at scrape time: fn() returns a number, or {label value tuple: number}."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self) -> list:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in sorted(value.items())
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ============================================================
+# SHARED METRICS
+# ============================================================
+
+HTTP_SECONDS = Histogram(
+    "pastcast_http_request_seconds", "Time to response headers, by route.",
+    labels=("route", "method", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "pastcast_stage_seconds", "Time spent in each pipeline stage.", labels=("stage",),
+)
+ROUTE_TOTAL = Counter(
+    "pastcast_router_branch_total", "Messages handled, by router branch.", labels=("branch",),
+)
+NLM_TOKENS = Counter("pastcast_nlm_generated_tokens_total", "Tokens generated by the chat model.")
+NLM_TOKENS_PER_SECOND = Histogram(
+    "pastcast_nlm_decode_tokens_per_second", "Decode throughput per generate() call.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+NLM_BATCH_SIZE = Histogram(
+    "pastcast_nlm_batch_size", "Prompts per generate() call.", buckets=(1, 2, 4, 8, 16, 32),
+)
+REQUESTS_SHED = Counter(
+    "pastcast_requests_shed_total", "Requests answered with a 503 / degraded reply instead of the LLM, by reason.",
+    labels=("reason",),
+)
+NLM_DRAFT_TOKENS = Counter(
+    "pastcast_nlm_draft_tokens_total", "Draft-model tokens in assisted decoding, by outcome (proposed / accepted).",
+    labels=("outcome",),
+)
+NLM_DRAFT_ACCEPTANCE = Histogram(
+    "pastcast_nlm_draft_acceptance_ratio", "Share of drafted tokens the base model accepted, per generate() call.",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+SEMANTIC_CACHE = Counter(
+    "pastcast_semantic_cache_total", "Semantic answer cache lookups, by result (hit / miss).",
+    labels=("result",),
+)
+HTTP_BODY_BYTES = Counter(
+    "pastcast_http_body_bytes_total", "Compressed response bodies: bytes before (raw) and after (sent), by encoding.",
+    labels=("encoding", "stage"),
+)
+HISTORY_POLLS = Counter(
+    "pastcast_history_polls_total", "/api/history requests, by result (full / delta / not_modified).",
+    labels=("result",),
+)
+
+
+# ============================================================
+# PER-REQUEST TRACE
+# ============================================================
+
+_trace = contextvars.ContextVar("pastcast_trace", default=None)
+
+
+class Trace:
+    """Stage → seconds for one request (stages repeated within a request add up)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.info = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_dict(self) -> dict:
+        return dict(
+            self.info,
+            total_ms=round((time.perf_counter() - self.started) * 1000, 2),
+            stages_ms={k: round(v * 1000, 2) for k, v in self.stages.items()},
+        )
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+def record(name: str, seconds: float):
+    """Account a stage timed by hand: stage histogram + current trace."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def attach(stages: dict):
+    """Add stages already observed elsewhere to the current trace only."""
+    trace = _trace.get()
+    if trace is not None:
+        for name, seconds in stages.items():
+            trace.add(name, seconds)
+
+
+def annotate(**info):
+    """Attach extra fields (branch, token counts …) to the current trace."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.info.update(info)
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
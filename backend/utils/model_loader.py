@@ -0,0 +1,291 @@
+# backend/utils/model_loader.py
+#
+# Lightweight front for utils.nlp_model. Importing this module costs
+# nothing: torch, transformers and the Qwen weights are pulled in by a
+# background thread (or on the first call that needs them), so routes
+# that never touch the LLM can be served while the model is loading.
+#
+# With MODEL_SERVER_SOCKET set, the models live in a separate process
+# (utils/model_server.py) and the call helpers below forward to it;
+# this process then never imports torch at all.
+
+import importlib
+import os
+import sys
+import threading
+import time
+
+from utils.admission import Overloaded, nlm_admission
+from utils.semantic_cache import semantic_cache
+
+FALLBACK_REPLY = "I’m sorry — I couldn’t generate a response just now."
+TRANSLATION_FAILED = "Translation failed. Please try again."
+
+_state = {
+    "state": "idle",        # idle → importing → loading → warming_up → ready (or error)
+    "error": None,
+    "started_at": None,
+    "timings": {},
+}
+_state_lock = threading.Lock()
+_thread = None
+_remote = None          # ModelClient while model calls are delegated to a model server
+
+
+def set_remote(socket_path):
+    """Send model calls to the model server at socket_path (None → run the models in-process)."""
+    global _remote
+    if socket_path:
+        from utils.model_server import ModelClient
+        _remote = ModelClient(socket_path)
+    else:
+        _remote = None
+
+
+def remote():
+    return _remote
+
+
+def nlp_model():
+    """Return the utils.nlp_model module, importing it on first use."""
+    return importlib.import_module("utils.nlp_model")
+
+
+def translation():
+    """Return the utils.translation module, importing it on first use."""
+    return importlib.import_module("utils.translation")
+
+
+def _set_state(state, **extra):
+    with _state_lock:
+        _state["state"] = state
+        _state.update(extra)
+
+
+def _load(warmup: bool):
+    t0 = time.perf_counter()
+    timings = {}
+    try:
+        _set_state("importing")
+        nlp = nlp_model()
+        timings["import_s"] = round(time.perf_counter() - t0, 3)
+
+        _set_state("loading")
+        t = time.perf_counter()
+        nlp.load_base_model()
+        timings["load_s"] = round(time.perf_counter() - t, 3)
+
+        if warmup:
+            _set_state("warming_up")
+            t = time.perf_counter()
+            nlp.warm_up()
+            timings["warmup_s"] = round(time.perf_counter() - t, 3)
+
+        timings["total_s"] = round(time.perf_counter() - t0, 3)
+        _set_state("ready", timings=timings)
+        print(f"✅ Base NLM model ready in {timings['total_s']}s")
+    except Exception as e:
+        timings["total_s"] = round(time.perf_counter() - t0, 3)
+        _set_state("error", error=str(e), timings=timings)
+        print("❌ Background model load failed:", e)
+
+
+def start_background_load(warmup: bool = True):
+    """Start loading the base model in a daemon thread (no-op if already started or remote)."""
+    global _thread
+    if _remote is not None:
+        return None   # the model server loads it
+    with _state_lock:
+        if _thread is not None:
+            return _thread
+        _state["started_at"] = time.time()
+        _thread = threading.Thread(target=_load, args=(warmup,), name="model-loader", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def _preload_translations(langs):
+    try:
+        translation().translator.preload(langs)
+        print(f"✅ Translation models ready: {translation().translator.pool.loaded()}")
+    except Exception as e:
+        print("❌ Translation preload failed:", e)
+
+
+def start_translation_preload(langs=None):
+    """Load MarianMT models (TRANSLATION_PRELOAD by default) in a daemon thread."""
+    if _remote is not None:
+        return None
+    t = threading.Thread(target=_preload_translations, args=(langs,), name="translation-preload", daemon=True)
+    t.start()
+    return t
+
+
+def translation_stats():
+    """Model pool stats, or None if translation was never used."""
+    if _remote is not None:
+        try:
+            return _remote.call("translation_stats")
+        except Exception as e:
+            return {"error": str(e)}
+    mod = sys.modules.get("utils.translation")
+    return mod.translator.stats() if mod is not None else None
+
+
+def _imported_nlp_model():
+    """utils.nlp_model once its import has finished, else None (never imports it)."""
+    nlp = sys.modules.get("utils.nlp_model")
+    # in sys.modules from the first line of its import; not usable until READY is set
+    return nlp if nlp is not None and getattr(nlp, "READY", False) else None
+
+
+def _loaded_locally() -> bool:
+    """Model usable in this process: loaded by the background thread, or on demand (NLM_PRELOAD=0)."""
+    if _state["state"] == "ready":
+        return True
+    nlp = _imported_nlp_model()
+    return _state["state"] == "idle" and nlp is not None and nlp.is_base_model_loaded()
+
+
+def is_ready() -> bool:
+    if _remote is not None:
+        try:
+            return _remote.call("is_ready")
+        except Exception:
+            return False
+    return _loaded_locally()
+
+
+def queue_depth() -> int:
+    """Prompts waiting for the generation worker (0 before the model module is imported)."""
+    if _remote is not None:
+        return _remote.call("queue_depth")
+    nlp = _imported_nlp_model()
+    if nlp is None:
+        return 0
+    return nlp.nlm_scheduler.pending() + nlp.stream_scheduler.pending()
+
+
+def admission_stats() -> dict:
+    """Generation admission control: active / waiting slots and shed counts."""
+    if _remote is not None:
+        try:
+            return _remote.call("admission_stats")
+        except Exception as e:
+            return {"error": str(e)}
+    return nlm_admission.stats()
+
+
+def semantic_stats() -> dict:
+    """Semantic answer cache: entries, hits / misses (empty until the encoder is bound)."""
+    if _remote is not None:
+        try:
+            return _remote.call("semantic_stats")
+        except Exception as e:
+            return {"error": str(e)}
+    return semantic_cache.stats()
+
+
+def status() -> dict:
+    """Snapshot for /health: load state, error (if any) and per-phase timings."""
+    if _remote is not None:
+        try:
+            snap = _remote.call("status")
+        except Exception as e:
+            snap = {"state": "error", "error": str(e), "ready": False}
+        snap["model_server"] = _remote.path
+        return snap
+    with _state_lock:
+        snap = dict(_state, timings=dict(_state["timings"]))
+    nlp = _imported_nlp_model()
+    if snap["state"] == "idle" and _loaded_locally():
+        snap["state"] = "ready"  # loaded on demand by a request
+    if nlp is not None:
+        snap["precision"] = nlp.NLM_PRECISION
+        snap["backend"] = nlp.backend.stats()
+        snap["context"] = nlp.context_assembler.stats()
+        draft = nlp.draft_stats()
+        if draft is not None:
+            snap["draft"] = draft
+    if snap["started_at"] and snap["state"] not in ("ready", "error"):
+        snap["elapsed_s"] = round(time.time() - snap["started_at"], 3)
+    snap["ready"] = snap["state"] == "ready"
+    return snap
+
+
+# ------------------------------------------------------------
+# Lazy proxies (same signatures as utils.nlp_model)
+# ------------------------------------------------------------
+
+def generate_nlm_reply(prompt: str, *args, **kwargs) -> str:
+    if _remote is not None:
+        try:
+            return _remote.call("generate_nlm_reply", prompt, *args, **kwargs)
+        except Overloaded:
+            raise
+        except Exception as e:
+            print("❌ Model server generation error:", e)
+            return FALLBACK_REPLY
+    return nlp_model().generate_nlm_reply(prompt, *args, **kwargs)
+
+
+def stream_nlm_reply(prompt: str, *args, **kwargs):
+    if _remote is not None:
+        return _stream_remote(prompt, *args, **kwargs)
+    return nlp_model().stream_nlm_reply(prompt, *args, **kwargs)
+
+
+def _stream_remote(prompt: str, *args, **kwargs):
+    sent = False
+    try:
+        for chunk in _remote.stream("stream_nlm_reply", prompt, *args, **kwargs):
+            sent = True
+            yield chunk
+    except Overloaded:
+        raise
+    except Exception as e:
+        print("❌ Model server streaming error:", e)
+        if not sent:
+            yield FALLBACK_REPLY
+
+
+def semantic_lookup(query: str):
+    """Cached answer to an equivalent earlier question, or None (also while the model is loading)."""
+    try:
+        if _remote is not None:
+            return _remote.call("semantic_lookup", query)
+        if not _loaded_locally():
+            return None
+        return nlp_model().semantic_lookup(query)
+    except Exception as e:
+        print("⚠️ Semantic cache lookup failed:", e)
+        return None
+
+
+def semantic_store(query: str, reply: str):
+    try:
+        if _remote is not None:
+            return _remote.call("semantic_store", query, reply)
+        if _loaded_locally():
+            nlp_model().semantic_store(query, reply)
+    except Exception as e:
+        print("⚠️ Semantic cache store failed:", e)
+
+
+def translate_text(phrase: str, target_lang: str) -> str:
+    if _remote is not None:
+        try:
+            return _remote.call("translate_text", phrase, target_lang)
+        except Exception as e:
+            print("❌ Model server translation error:", e)
+            return TRANSLATION_FAILED
+    return nlp_model().translate_text(phrase, target_lang)
+
+
+def translate_batch(items: list) -> list:
+    if _remote is not None:
+        return _remote.call("translate_batch", items)
+    return translation().translator.translate_batch(items)
+
+
+set_remote(os.getenv("MODEL_SERVER_SOCKET"))
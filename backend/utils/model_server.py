@@ -0,0 +1,348 @@
+# backend/utils/model_server.py
+#
+# Out-of-process model serving for multi-worker deployments.
+#
+# One model-server process loads Qwen (and the MarianMT pool) once and
+# answers generate / stream / translate calls over a Unix socket
+# (multiprocessing.connection, authkey-protected). HTTP workers started
+# with MODEL_SERVER_SOCKET set never import torch: utils.model_loader
+# forwards their model calls here, so adding workers adds request-handling
+# cores, not model copies. Concurrent calls from all workers meet in the
+# server's batching scheduler and share its response and prefix caches.
+#
+#   cd backend && MODEL_SERVER_AUTHKEY=... python -m utils.model_server   # gunicorn.conf.py starts it for you
+#
+# Both ends unpickle what they receive, so the channel must be private:
+# - the socket lives in a 0700 runtime directory ($XDG_RUNTIME_DIR/pastcast,
+#   else <tmp>/pastcast-<uid>); a parent directory other users can write
+#   to is refused
+# - the HMAC authkey (MODEL_SERVER_AUTHKEY) has no default: gunicorn.conf.py
+#   generates a random one per launch and hands it to the server and the
+#   workers through the environment; a separately run server and its
+#   workers must share one explicitly
+#
+# Messages are pickled tuples:
+#   request  (op, args, kwargs, deadline)
+#   reply    ("ok", value, stages, info) | ("error", exception type name, message, shed reason)
+#   stream   ("chunk", text) ... then ("end", None, stages, info) or an error
+# deadline is the worker's request deadline (utils.admission), adopted by
+# the server for that call. stages/info are the server-side trace of that
+# call; the client replays them into the worker's metrics and request trace.
+
+import argparse
+import os
+import signal
+import stat
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from utils import admission, metrics
+from utils.admission import DeadlineExceeded, Overloaded
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "300"))   # seconds per reply / chunk
+
+_STREAM_OPS = {"stream_nlm_reply"}
+
+
+class ModelServerError(RuntimeError):
+    """The model server is unreachable, timed out, or failed a call."""
+
+
+# ============================================================
+# SOCKET LOCATION + AUTHKEY
+# ============================================================
+
+def runtime_dir() -> str:
+    """Private directory for the socket: $XDG_RUNTIME_DIR/pastcast, else <tmp>/pastcast-<uid>."""
+    base = os.getenv("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, "pastcast")
+    return os.path.join(tempfile.gettempdir(), f"pastcast-{os.getuid()}")
+
+
+def default_socket() -> str:
+    return os.path.join(runtime_dir(), "model.sock")
+
+
+def ensure_private_dir(path: str) -> str:
+    """
+    Create `path` as a 0700 directory, or check an existing one: it must be
+    ours and not writable by anyone else (otherwise another local user
+    could bind or swap the socket). Returns path; raises PermissionError.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a directory owned by uid {os.getuid()}")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is writable by other users; use a private (0700) directory")
+    return path
+
+
+def authkey() -> bytes:
+    """Shared HMAC key, read at connect time (gunicorn.conf.py sets it before workers start)."""
+    key = os.getenv("MODEL_SERVER_AUTHKEY", "")
+    if not key:
+        raise ModelServerError("MODEL_SERVER_AUTHKEY is not set (gunicorn.conf.py generates one per launch; "
+                               "set the same random value for an external model server and its workers)")
+    return key.encode()
+
+
+# Exceptions callers rely on (e.g. ValueError → HTTP 400) are re-raised as themselves
+_ERRORS = {"ValueError": ValueError, "KeyError": KeyError, "TypeError": TypeError}
+
+
+def _error(msg) -> Exception:
+    _, name, text, reason = msg
+    if name == "DeadlineExceeded":
+        return DeadlineExceeded(text)
+    if name == "Overloaded":
+        return Overloaded(reason, text)   # load shedding → 503 in the worker
+    return _ERRORS.get(name, ModelServerError)(text)
+
+
+# ============================================================
+# CLIENT (HTTP workers)
+# ============================================================
+
+class ModelClient:
+    """One connection per thread (and per process, so it is fork-safe)."""
+
+    def __init__(self, path: str, authkey: bytes = None, timeout: float = MODEL_SERVER_TIMEOUT):
+        self.path = path
+        self.authkey = authkey      # None → MODEL_SERVER_AUTHKEY at connect time
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = Client(self.path, family="AF_UNIX", authkey=self.authkey or authkey())
+        self._local.conn, self._local.pid = conn, os.getpid()
+
+        # Prompt prefixes registered in this process get their KV cached server-side too
+        from utils.prefix_cache import prefix_cache
+        templates = prefix_cache.templates()
+        if templates:
+            conn.send(("register_prefixes", (templates,), {}, None))
+            self._reply(conn)
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _recv(self, conn):
+        # The server stops work at the request deadline; allow it a moment to say so
+        left = admission.remaining()
+        timeout = self.timeout if left is None else max(0.0, min(self.timeout, left + 5.0))
+        if not conn.poll(timeout):
+            self._drop()   # a late reply would be read by the next call
+            raise ModelServerError(f"model server did not answer within {timeout:.0f}s")
+        return conn.recv()
+
+    def _reply(self, conn):
+        msg = self._recv(conn)
+        if msg[0] == "error":
+            raise _error(msg)
+        return msg
+
+    @staticmethod
+    def _replay(stages: dict, info: dict):
+        for name, seconds in stages.items():
+            metrics.record(name, seconds)
+        if info:
+            metrics.annotate(**info)
+
+    def call(self, op: str, *args, **kwargs):
+        # One retry on a dead connection: the server may have restarted since
+        for attempt in (0, 1):
+            try:
+                conn = self._conn()
+                conn.send((op, args, kwargs, admission.current_deadline()))
+                msg = self._reply(conn)
+                break
+            except (EOFError, OSError) as e:
+                self._drop()
+                if attempt:
+                    raise ModelServerError(f"model server at {self.path} unreachable: {e}") from e
+        _, value, stages, info = msg
+        self._replay(stages, info)
+        return value
+
+    def stream(self, op: str, *args, **kwargs):
+        finished = False
+        try:
+            conn = self._conn()
+            conn.send((op, args, kwargs, admission.current_deadline()))
+            while True:
+                msg = self._reply(conn)
+                if msg[0] == "chunk":
+                    yield msg[1]
+                    continue
+                finished = True
+                self._replay(msg[2], msg[3])
+                return
+        except (EOFError, OSError) as e:
+            raise ModelServerError(f"model server at {self.path} unreachable: {e}") from e
+        finally:
+            if not finished:
+                self._drop()   # abandoned mid-stream: unread chunks stay on this connection
+
+
+# ============================================================
+# SERVER
+# ============================================================
+
+def _ops() -> dict:
+    from utils import model_loader
+    from utils.prefix_cache import register_prefix
+
+    def register_prefixes(templates):
+        for t in templates:
+            register_prefix(t)
+
+    return {
+        "generate_nlm_reply": model_loader.generate_nlm_reply,
+        "stream_nlm_reply": model_loader.stream_nlm_reply,
+        "translate_text": model_loader.translate_text,
+        "translate_batch": model_loader.translate_batch,
+        "status": model_loader.status,
+        "is_ready": model_loader.is_ready,
+        "translation_stats": model_loader.translation_stats,
+        "queue_depth": model_loader.queue_depth,
+        "admission_stats": model_loader.admission_stats,
+        "semantic_lookup": model_loader.semantic_lookup,
+        "semantic_store": model_loader.semantic_store,
+        "semantic_stats": model_loader.semantic_stats,
+        "register_prefixes": register_prefixes,
+        "ping": os.getpid,
+    }
+
+
+class _ClientGone(Exception):
+    pass
+
+
+def _serve_connection(conn, ops: dict):
+    def send(msg):
+        try:
+            conn.send(msg)
+        except (EOFError, OSError) as e:
+            raise _ClientGone from e
+
+    with conn:
+        while True:
+            try:
+                op, args, kwargs, deadline = conn.recv()
+            except (EOFError, OSError):
+                return
+            trace = metrics.start_trace()
+            admission.set_deadline(deadline)
+            try:
+                fn = ops.get(op)
+                if fn is None:
+                    raise ModelServerError(f"unknown model server op: {op!r}")
+                if op in _STREAM_OPS:
+                    chunks = fn(*args, **kwargs)
+                    try:
+                        for chunk in chunks:
+                            send(("chunk", chunk))
+                    finally:
+                        chunks.close()   # client gone mid-stream: stop its generation now
+                    send(("end", None, trace.stages, trace.info))
+                else:
+                    value = fn(*args, **kwargs)
+                    send(("ok", value, trace.stages, trace.info))
+            except _ClientGone:
+                return   # worker went away (e.g. client disconnected mid-stream)
+            except Exception as e:
+                try:
+                    send(("error", type(e).__name__, str(e), getattr(e, "reason", None)))
+                except _ClientGone:
+                    return
+
+
+def _exit_with(parent_pid: int):
+    while os.getppid() == parent_pid:
+        time.sleep(1.0)
+    print("🧠 Parent process gone; stopping model server")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def serve(path: str = None, warmup: bool = True, exit_with_parent: bool = False):
+    """Load the models once and answer worker calls until SIGTERM / Ctrl-C."""
+    from utils import model_loader
+
+    path = path or MODEL_SERVER_SOCKET or default_socket()
+    model_loader.set_remote(None)   # this process runs the models itself
+    try:
+        key = authkey()
+        ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    except (ModelServerError, PermissionError) as e:
+        raise SystemExit(f"❌ {e}")
+
+    if os.path.exists(path):
+        try:
+            Client(path, family="AF_UNIX", authkey=key).close()
+            raise SystemExit(f"❌ A model server is already listening on {path}")
+        except AuthenticationError:
+            raise SystemExit(f"❌ Another model server (different authkey) is listening on {path}")
+        except (OSError, EOFError):
+            os.unlink(path)   # stale socket from a crashed server
+
+    model_loader.start_background_load(warmup=warmup)
+    if os.getenv("TRANSLATION_PRELOAD"):
+        model_loader.start_translation_preload()
+
+    ops = _ops()
+    old_umask = os.umask(0o177)     # socket file: owner only
+    try:
+        listener = Listener(path, family="AF_UNIX", backlog=128, authkey=key)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if exit_with_parent:
+        threading.Thread(target=_exit_with, args=(os.getppid(),), name="parent-watch", daemon=True).start()
+    print(f"🧠 Model server listening on {path} (pid {os.getpid()})")
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                print("❌ Model server rejected a connection:", e)
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, ops), name="model-conn", daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()    # removes the socket file
+        print("🧠 Model server stopped")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="PastCast model server")
+    ap.add_argument("--socket", default=MODEL_SERVER_SOCKET or default_socket())
+    ap.add_argument("--no-warmup", action="store_true", help="skip the warm-up generation after loading")
+    ap.add_argument("--exit-with-parent", action="store_true", help="stop when the launching process dies")
+    args = ap.parse_args()
+    serve(args.socket, warmup=not args.no_warmup and os.getenv("NLM_WARMUP", "1") == "1",
+          exit_with_parent=args.exit_with_parent)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,31 @@
 # backend/utils/nlp_model.py
 
+import functools
+import os
 import re
+import threading
+import time
+import numpy as np
 import torch
 from transformers import (
     AutoTokenizer,
-    AutoModelForCausalLM,
-    MarianTokenizer,
-    MarianMTModel,
+    AutoModel,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
 )
 
+from utils import metrics
+from utils.admission import DeadlineExceeded, Overloaded, current_deadline, nlm_admission
+from utils.context import context_assembler
+from utils.inference_backend import NLM_BACKEND, get_backend
+from utils.model_loader import FALLBACK_REPLY, TRANSLATION_FAILED
+from utils.prefix_cache import prefix_cache
+from utils.response_cache import make_key, normalize_text, response_cache
+from utils.scheduler import InferenceScheduler
+from utils.semantic_cache import SEMANTIC_CACHE, semantic_cache
+from utils.translation import TRANSLATION_MODEL_IDS, translator
+
 # ============================================================
 # DEVICE SELECTION (M3-Pro Optimized)
 # ============================================================
@@ -25,95 +42,770 @@ else:
     print("⚠️ MPS not available — using CPU")
     device = torch.device("cpu")
 
+# Loading + generate() go through this (utils.inference_backend): PyTorch,
+# or ONNX Runtime with NLM_BACKEND=onnx
+backend = get_backend(NLM_BACKEND, device)
+
 # ============================================================
 # MAIN CHAT MODEL (Qwen 1.5B Instruct)
 # ============================================================
 
-BASE_MODEL_ID = "Qwen/Qwen2.5-1.5B-Instruct"
+BASE_MODEL_ID = os.getenv("NLM_MODEL_ID", "Qwen/Qwen2.5-1.5B-Instruct")
+
+# Weight precision: fp32 (default), bf16 (half the memory; fast on CPUs
+# with native bf16), or int8 (dynamic quantization of every nn.Linear —
+# int8 weights, activations quantized per call; CPU only).
+PRECISIONS = ("fp32", "bf16", "int8")
+NLM_PRECISION = os.getenv("NLM_PRECISION", "fp32").strip().lower()
+if NLM_PRECISION not in PRECISIONS:
+    print(f"⚠️ Unknown NLM_PRECISION={NLM_PRECISION!r} — using fp32")
+    NLM_PRECISION = "fp32"
+
+# Optional draft model for assisted (speculative) decoding: it proposes
+# NLM_DRAFT_TOKENS tokens, the base model verifies them all in one forward
+# pass and keeps the longest prefix it agrees with (plus its own next token).
+# Greedy verification means the reply is the same as without a draft.
+# Any checkpoint sharing the base tokenizer works, e.g.
+# NLM_DRAFT_MODEL_ID=Qwen/Qwen2.5-0.5B-Instruct. Empty = off.
+NLM_DRAFT_MODEL_ID = os.getenv("NLM_DRAFT_MODEL_ID", "").strip()
+NLM_DRAFT_TOKENS = int(os.getenv("NLM_DRAFT_TOKENS", "5"))
+NLM_DRAFT_SCHEDULE = os.getenv("NLM_DRAFT_SCHEDULE", "constant")   # or "heuristic": adapt to acceptance
+
+# Loaded on first use (or by utils.model_loader in the background),
+# so importing this module no longer blocks on the weights.
+base_tokenizer = None
+base_model = None
+draft_model = None
+_base_lock = threading.Lock()
+
+
+def load_base_model():
+    """Load the Qwen tokenizer + weights once (thread-safe). Returns (tokenizer, model)."""
+    global base_tokenizer, base_model
+
+    if base_model is not None:
+        return base_tokenizer, base_model
+
+    with _base_lock:
+        if base_model is None:
+            print(f"🔄 Loading base NLM model: {BASE_MODEL_ID}")
+
+            tok = AutoTokenizer.from_pretrained(BASE_MODEL_ID)
+            mod = backend.load_causal_lm(BASE_MODEL_ID, NLM_PRECISION)
+
+            # Left padding so batched prompts all end right where generation starts
+            tok.padding_side = "left"
+            if tok.pad_token is None:
+                tok.pad_token = tok.eos_token
+
+            base_tokenizer = tok
+            base_model = mod
+            _load_draft_model()
+
+    return base_tokenizer, base_model
+
+
+def _load_draft_model():
+    """Load NLM_DRAFT_MODEL_ID (if set); a failure only disables assisted decoding."""
+    global draft_model
+    if not NLM_DRAFT_MODEL_ID:
+        return
+    if not backend.supports_assisted:
+        print(f"⚠️ Draft model disabled: assisted decoding needs the torch backend (NLM_BACKEND={backend.name})")
+        return
+    try:
+        print(f"🔄 Loading draft model: {NLM_DRAFT_MODEL_ID} ({NLM_DRAFT_TOKENS} tokens/step)")
+        draft = backend.load_causal_lm(NLM_DRAFT_MODEL_ID, NLM_PRECISION)
+        if draft.config.vocab_size != base_model.config.vocab_size:
+            raise ValueError(f"vocab size {draft.config.vocab_size} != base {base_model.config.vocab_size}")
+        draft.generation_config.num_assistant_tokens = NLM_DRAFT_TOKENS
+        draft.generation_config.num_assistant_tokens_schedule = NLM_DRAFT_SCHEDULE
+        draft_model = draft
+    except Exception as e:
+        print("⚠️ Draft model disabled:", e)
 
-print(f"🔄 Loading base NLM model: {BASE_MODEL_ID}")
 
-base_tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_ID)
-base_model = AutoModelForCausalLM.from_pretrained(
-    BASE_MODEL_ID,
-    torch_dtype=torch.float32,  # Safe on MPS/CPU
-)
-base_model.to(device).eval()
+def is_base_model_loaded() -> bool:
+    return base_model is not None
 
 # ============================================================
-# TRANSLATION MODELS (MarianMT) — Lazy Loaded
+# BATCHING SCHEDULER (concurrent /api/message calls share one generate)
 # ============================================================
 
-TRANSLATION_MODEL_IDS = {
-    "hindi": "Helsinki-NLP/opus-mt-en-hi",
-    "marathi": "Helsinki-NLP/opus-mt-en-mr",
-    "tamil": "Helsinki-NLP/opus-mt-en-ta",
-    "telugu": "Helsinki-NLP/opus-mt-en-te",
-}
+NLM_MAX_BATCH_SIZE = int(os.getenv("NLM_MAX_BATCH_SIZE", "8"))
+NLM_BATCH_WAIT_MS = float(os.getenv("NLM_BATCH_WAIT_MS", "15"))
+# Streamed replies generate one prompt each, on their own worker threads
+# (beside the batch worker); more concurrent streams wait for a free one.
+NLM_STREAM_WORKERS = int(os.getenv("NLM_STREAM_WORKERS", "4"))
 
-translation_models = {}  # cache per-language
+# ============================================================
+# TRANSLATION MODELS (MarianMT) — Lazy Loaded
+# ============================================================
 
+# Model pool, batching and sentence splitting live in utils.translation
 
 def load_translation_model(lang: str):
-    """Load MarianMT model for a language only once (cached)."""
-    lang = lang.lower().strip()
+    """(tokenizer, model) for a language from the bounded model pool, or None."""
+    return translator.pool.get(lang.lower().strip())
+
+
+# ============================================================
+# QWEN NLM GENERATION (Stable + Clean)
+# ============================================================
+
+# Fake dialogue turns the model sometimes invents after its answer
+TURN_MARKER_RE = re.compile(r"(?:Human|User|Assistant|System)\s*[:：]")
+TURN_MARKER_WORDS = ("Human", "User", "Assistant", "System")
+
+# Decoded tail (in tokens) the stop check looks at on every step
+STOP_TAIL_TOKENS = 8
+
+
+def _find_stop(text: str, stop=()) -> int:
+    """Index of the earliest turn marker or stop string in text, or -1."""
+    m = TURN_MARKER_RE.search(text)
+    hits = [m.start()] if m else []
+    hits += [i for i in (text.find(s) for s in stop) if i >= 0]
+    return min(hits) if hits else -1
+
+
+class StopOnTurnMarkers(StoppingCriteria):
+    """
+    Per-row stopping criterion: a row is finished as soon as its newly
+    generated text contains a fake dialogue turn or one of its stop strings.
+    Only the last few new tokens are decoded on each step.
+    """
+
+    def __init__(self, tokenizer, prompt_len: int, stops: list):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.stops = stops
+        longest = max((len(s) for row in stops for s in row), default=0)
+        self.tail = max(STOP_TAIL_TOKENS, longest)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        new_ids = input_ids[:, self.prompt_len:][:, -self.tail:]
+        tails = self.tokenizer.batch_decode(new_ids, skip_special_tokens=True)
+        done = [_find_stop(t, stop) >= 0 for t, stop in zip(tails, self.stops)]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class StopAtDeadline(StoppingCriteria):
+    """Per-row criterion: a row stops once its request's deadline (time.time()) has passed."""
+
+    def __init__(self, deadlines: list):
+        self.deadlines = deadlines
+        self.hit = [False] * len(deadlines)
 
-    model_name = TRANSLATION_MODEL_IDS.get(lang)
-    if not model_name:
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.time()
+        for i, d in enumerate(self.deadlines):
+            if d is not None and now >= d:
+                self.hit[i] = True
+        return torch.tensor(self.hit, dtype=torch.bool, device=input_ids.device)
+
+
+class StopOnCancel(StoppingCriteria):
+    """Stops the (single-row) stream once its consumer has gone away."""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(),
+                          dtype=torch.bool, device=input_ids.device)
+
+
+class _StepTimer(StoppingCriteria):
+    """
+    Never stops a row; notes when the first and last new token arrived.
+
+    In assisted decoding generate() calls the stopping criteria twice per
+    step: on the draft's candidate tokens, then on what the base model
+    accepted. The timer pairs the two calls to count drafted / accepted
+    tokens and only times the second.
+    """
+
+    def __init__(self, prompt_len: int, assisted: bool = False):
+        self.prompt_len = prompt_len
+        self.assisted = assisted
+        self.first = None
+        self.last = None
+        self.steps = 0              # base-model decoding steps
+        self.tokens = 0             # new tokens so far
+        self.first_tokens = 0       # ... after the first step
+        self.drafted = 0
+        self.accepted = 0
+        self._candidate = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        length = input_ids.shape[1] - self.prompt_len
+        if self.assisted:
+            if self._candidate is None:
+                self._candidate = length   # draft proposal, not verified yet
+                return done
+            self.drafted += self._candidate - self.tokens
+            self.accepted += max(0, length - self.tokens - 1)   # the last token is the base model's own
+            self._candidate = None
+
+        self.last = time.perf_counter()
+        if self.first is None:
+            self.first = self.last
+            self.first_tokens = length
+        self.steps += 1
+        self.tokens = length
+        return done
+
+
+def _observe_generation(started: float, timer: _StepTimer, batch_size: int) -> dict:
+    """Split one generate() into prefill / decode, feed the metrics, return the stages."""
+    first = timer.first or time.perf_counter()
+    stages = {
+        "nlm_prefill": first - started,                     # prompt forward + first token
+        "nlm_decode": (timer.last or first) - first,        # every later token
+    }
+    decoded = max(0, timer.tokens - timer.first_tokens)
+    metrics.NLM_BATCH_SIZE.observe(batch_size)
+    if decoded and stages["nlm_decode"] > 0:
+        metrics.NLM_TOKENS_PER_SECOND.observe(decoded / stages["nlm_decode"])
+    for name, seconds in stages.items():
+        metrics.STAGE_SECONDS.observe(seconds, stage=name)
+    if timer.assisted:
+        _observe_draft(timer)
+    return stages
+
+
+_draft_totals = {"generations": 0, "steps": 0, "drafted": 0, "accepted": 0}
+_draft_lock = threading.Lock()
+
+
+def _observe_draft(timer: _StepTimer):
+    metrics.NLM_DRAFT_TOKENS.inc(timer.drafted, outcome="proposed")
+    metrics.NLM_DRAFT_TOKENS.inc(timer.accepted, outcome="accepted")
+    if timer.drafted:
+        metrics.NLM_DRAFT_ACCEPTANCE.observe(timer.accepted / timer.drafted)
+    with _draft_lock:
+        _draft_totals["generations"] += 1
+        _draft_totals["steps"] += timer.steps
+        _draft_totals["drafted"] += timer.drafted
+        _draft_totals["accepted"] += timer.accepted
+
+
+def _draft_counts(timer: _StepTimer) -> dict:
+    """
+    A row's drafted / accepted token counts, carried back in its stats.
+    The scheduler thread has no request trace; the caller annotates them.
+    """
+    if not timer.assisted:
+        return {}
+    return {"draft_proposed": timer.drafted, "draft_accepted": timer.accepted}
+
+
+def _annotate_draft(stats: dict):
+    if "draft_proposed" in stats:
+        metrics.annotate(nlm_draft_proposed=stats["draft_proposed"],
+                         nlm_draft_accepted=stats["draft_accepted"])
+
+
+def draft_stats() -> dict:
+    """Assisted-decoding totals for /health (None when no draft model is configured)."""
+    if not NLM_DRAFT_MODEL_ID:
         return None
+    with _draft_lock:
+        totals = dict(_draft_totals)
+    return dict(
+        totals,
+        model=NLM_DRAFT_MODEL_ID,
+        loaded=draft_model is not None,
+        draft_tokens=NLM_DRAFT_TOKENS,
+        schedule=NLM_DRAFT_SCHEDULE,
+        acceptance_rate=round(totals["accepted"] / totals["drafted"], 4) if totals["drafted"] else None,
+        tokens_per_step=round((totals["accepted"] + totals["steps"]) / totals["steps"], 3) if totals["steps"] else None,
+    )
+
+
+def _assistant_kwargs(batch_size: int) -> dict:
+    """
+    Draft model for generate(). transformers only supports assisted decoding
+    for a single sequence, so batched calls decode normally (batching already
+    amortizes their per-step cost).
+    """
+    if draft_model is None or batch_size != 1:
+        return {}
+    return {"assistant_model": draft_model}
 
-    if lang not in translation_models:
-        print(f"🌐 Loading translation model for {lang}: {model_name}")
-        tok = MarianTokenizer.from_pretrained(model_name)
-        mod = MarianMTModel.from_pretrained(model_name).to("cpu")  # safer on CPU
-        translation_models[lang] = (tok, mod)
 
-    return translation_models[lang]
+def _prefix_kwargs(prompts: list, inputs) -> dict:
+    """
+    Reuse the cached prefill of a registered system preamble (see
+    utils.prefix_cache). Only single-prompt calls qualify: left padding
+    shifts the preamble to a different position in every row of a batch.
+    """
+    if len(prompts) != 1 or not backend.supports_prefix_cache:
+        return {}
+    try:
+        cache = prefix_cache.lookup(base_tokenizer, base_model, prompts[0], inputs["input_ids"])
+    except Exception as e:
+        print("⚠️ Prefix cache lookup failed:", e)
+        return {}
+    return {"past_key_values": cache} if cache is not None else {}
 
 
-# ============================================================
-# QWEN NLM GENERATION (Stable + Clean)
-# ============================================================
+def _encode_prompts(payloads: list) -> dict:
+    """
+    Token-budgeted ids for each (prompt, stop[, history]) payload (see
+    utils.context), left-padded into one batch.
+    """
+    rows = [context_assembler.assemble(base_tokenizer, p[0], p[2] if len(p) > 2 else None)[1]
+            for p in payloads]
+    width = max(len(r) for r in rows)
+    pad_id = base_tokenizer.pad_token_id
+    input_ids = torch.tensor([[pad_id] * (width - len(r)) + r for r in rows], dtype=torch.long)
+    attention_mask = torch.tensor([[0] * (width - len(r)) + [1] * len(r) for r in rows], dtype=torch.long)
+    return {"input_ids": input_ids.to(device), "attention_mask": attention_mask.to(device)}
+
+
+def _generate_batch(max_tokens: int, payloads: list) -> list:
+    """
+    Run one padded greedy generate() over several (prompt, stop[, history
+    [, deadline]]) payloads. Returns (decoded new tokens, stats) for each
+    prompt; stats holds the batch's stage timings plus that row's new-token
+    count, draft counts (assisted decoding only) and whether its deadline
+    cut it short.
+    """
+    load_base_model()
+    prompts = [p[0] for p in payloads]
+    t0 = time.perf_counter()
+    inputs = _encode_prompts(payloads)
+    prompt_len = inputs["input_ids"].shape[1]
+    assist = _assistant_kwargs(len(prompts))
+    timer = _StepTimer(prompt_len, assisted=bool(assist))
+    deadline_stop = StopAtDeadline([p[3] if len(p) > 3 else None for p in payloads])
+    t1 = time.perf_counter()
+
+    output_ids = backend.generate(
+        base_model,
+        **inputs,
+        **_prefix_kwargs(prompts, inputs),
+        **assist,
+        max_new_tokens=max_tokens,
+        do_sample=False,  # deterministic (no junk)
+        eos_token_id=base_tokenizer.eos_token_id,
+        pad_token_id=base_tokenizer.eos_token_id,
+        stopping_criteria=StoppingCriteriaList([
+            StopOnTurnMarkers(base_tokenizer, prompt_len, [p[1] for p in payloads]),
+            deadline_stop,
+            timer,
+        ]),
+    )
+    stages = _observe_generation(t1, timer, len(prompts))
+
+    # Decode only what was generated (left padding keeps the prompt width uniform)
+    t2 = time.perf_counter()
+    new_ids = output_ids[:, prompt_len:]
+    texts = base_tokenizer.batch_decode(new_ids, skip_special_tokens=True)
+    stages["nlm_tokenize"] = t1 - t0
+    stages["nlm_detokenize"] = time.perf_counter() - t2
+    for name in ("nlm_tokenize", "nlm_detokenize"):
+        metrics.STAGE_SECONDS.observe(stages[name], stage=name)
+
+    new_tokens = (new_ids != base_tokenizer.pad_token_id).sum(dim=1).tolist()
+    metrics.NLM_TOKENS.inc(sum(new_tokens))
+    draft = _draft_counts(timer)   # assisted decoding is single-row only
+    return [(text, dict(stages, new_tokens=n, deadline_hit=hit, **draft))
+            for text, n, hit in zip(texts, new_tokens, deadline_stop.hit)]
+
+
+def _generate_streamed(max_tokens: int, prompt: str, stop: tuple, streamer, history=None, deadline=None,
+                       cancelled=None) -> dict:
+    """
+    Single-prompt generate() that pushes decoded text into `streamer` as it
+    goes, until done or `cancelled` is set. Returns {"deadline_hit": ...[, draft counts]} like a batch row's stats.
+    """
+    try:
+        load_base_model()
+        inputs = _encode_prompts([(prompt, stop, history)])
+        prompt_len = inputs["input_ids"].shape[1]
+        assist = _assistant_kwargs(1)
+        timer = _StepTimer(prompt_len, assisted=bool(assist))
+        deadline_stop = StopAtDeadline([deadline])
+        started = time.perf_counter()
+        backend.generate(
+            base_model,
+            **inputs,
+            **_prefix_kwargs([prompt], inputs),
+            **assist,
+            max_new_tokens=max_tokens,
+            do_sample=False,
+            eos_token_id=base_tokenizer.eos_token_id,
+            pad_token_id=base_tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList([
+                StopOnTurnMarkers(base_tokenizer, prompt_len, [stop]),
+                deadline_stop,
+                StopOnCancel(cancelled or threading.Event()),
+                timer,
+            ]),
+            streamer=streamer,
+        )
+        _observe_generation(started, timer, 1)
+        metrics.NLM_TOKENS.inc(timer.tokens)
+        return {"deadline_hit": deadline_stop.hit[0], **_draft_counts(timer)}
+    finally:
+        # Never leave the consumer blocked on a half-finished stream
+        streamer.end()
+
+
+def _run_nlm_batch(key, payloads: list) -> list:
+    """Scheduler entry point: key is ("batch", max_tokens) or ("stream", max_tokens)."""
+    if key[0] == "stream":
+        return [_generate_streamed(key[1], prompt, stop, streamer, history, deadline, cancelled)
+                for prompt, stop, streamer, history, deadline, cancelled in payloads]
+    return _generate_batch(key[1], payloads)
+
+
+nlm_scheduler = InferenceScheduler(
+    _run_nlm_batch,
+    max_batch_size=NLM_MAX_BATCH_SIZE,
+    max_wait_ms=NLM_BATCH_WAIT_MS,
+)
+
+# Streams are not batched (TextIteratorStreamer follows a single sequence);
+# a separate pool keeps them from holding up batched generate() calls.
+stream_scheduler = InferenceScheduler(
+    _run_nlm_batch,
+    max_batch_size=1,
+    max_wait_ms=0,
+    name="nlm-stream",
+    workers=NLM_STREAM_WORKERS,
+)
+
+
+def _clean_reply(text: str, stop=()) -> str:
+    """Trim generated text at the first fake dialogue turn or stop string."""
+    # Only new tokens are decoded, but drop an echoed <|assistant|> tag all the same
+    cleaned = text.strip()
+    if cleaned.startswith("<|assistant|>"):
+        cleaned = cleaned[len("<|assistant|>"):]
 
-def generate_nlm_reply(prompt: str, max_tokens: int = 200) -> str:
+    # Strip off any trailing fake dialogue turns like "Human:" / "User:" / "Assistant:"
+    cut = _find_stop(cleaned, stop)
+    if cut >= 0:
+        cleaned = cleaned[:cut]
+    return cleaned.strip()
+
+
+def _reply_cache_key(prompt: str, max_tokens: int, stop: tuple, history: tuple) -> str:
+    # Greedy decoding → same prompt/history/model/precision/backend/params always give the same reply
+    turns = [[role, normalize_text(content)] for role, content in history]
+    return make_key("nlm", BASE_MODEL_ID, NLM_PRECISION, backend.name, normalize_text(prompt), max_tokens, list(stop),
+                    turns, context_assembler.budget)
+
+
+def generate_nlm_reply(prompt: str, max_tokens: int = 200, stop=None, history=None) -> str:
     """
     Stable deterministic generation for Qwen.
-    Cleans output and extracts correct <|assistant|> text.
+    Served from the response cache when the same prompt was answered before;
+    otherwise queued on the batching scheduler, so concurrent callers share
+    one generate(). Generation stops early at a fake dialogue turn or any of
+    the `stop` strings. `history` ([(role, content)], oldest first) is fitted
+    into the prompt within the context token budget (utils.context).
+
+    Uncached requests go through admission control and respect the current
+    request deadline (utils.admission): Overloaded is raised when there is
+    no capacity or time to start, and a reply cut short by the deadline is
+    returned as is but not cached.
     """
+    stop = tuple(stop or ())
+    history = tuple(history or ())
+    key = _reply_cache_key(prompt, max_tokens, stop, history)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        inputs = base_tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-        ).to(device)
-
-        with torch.no_grad():
-            output_ids = base_model.generate(
-                **inputs,
-                max_new_tokens=max_tokens,
-                do_sample=False,  # deterministic (no junk)
-                eos_token_id=base_tokenizer.eos_token_id,
-                pad_token_id=base_tokenizer.eos_token_id,
-            )
-
-        # FULL decode
-        text = base_tokenizer.decode(output_ids[0], skip_special_tokens=True)
-
-        # Extract final answer after <|assistant|>
-        if "<|assistant|>" in text:
-            cleaned = text.split("<|assistant|>", 1)[1].strip()
+        deadline = current_deadline()
+        with nlm_admission:
+            t0 = time.perf_counter()
+            fut = nlm_scheduler.submit((prompt, stop, history, deadline), key=("batch", max_tokens),
+                                       deadline=deadline)
+            text, stats = fut.result()
+        stages = {k: v for k, v in stats.items() if k.startswith("nlm_")}
+        metrics.attach(stages)
+        metrics.record("nlm_queue", max(0.0, time.perf_counter() - t0 - sum(stages.values())))
+        metrics.annotate(nlm_new_tokens=stats["new_tokens"])
+        _annotate_draft(stats)
+        cleaned = _clean_reply(text, stop)
+
+        if stats["deadline_hit"]:
+            metrics.annotate(nlm_deadline_hit=True)
+            if not cleaned:
+                raise DeadlineExceeded("deadline passed before the model produced a reply")
+        elif cleaned:
+            response_cache.set(key, cleaned)
+        return cleaned or FALLBACK_REPLY
+
+    except Overloaded:
+        raise
+    except Exception as e:
+        print("❌ Qwen generation error:", e)
+        return FALLBACK_REPLY
+
+
+def warm_up():
+    """One tiny generation so the first real request doesn't pay for lazy init."""
+    generate_nlm_reply("<|user|> Hello\n<|assistant|>", max_tokens=4)
+    if backend.supports_prefix_cache:
+        prefix_cache.precompute(base_tokenizer, base_model)
+
+
+# ============================================================
+# STREAMING GENERATION (Server-Sent Events)
+# ============================================================
+
+class ReplyStreamCleaner:
+    """
+    Incremental version of _clean_reply().
+
+    Only new tokens are streamed, so the cleaner just trims leading
+    whitespace, holds back text that might be the start of a fake "User:"
+    turn or a stop string, and reports `done` once one shows up in full.
+    """
+
+    HOLD_CHARS = 16
+
+    def __init__(self, stop=()):
+        self.stop = tuple(stop)
+        self.raw = ""
+        self.sent = 0
+        self.done = False
+        self._prefixes = TURN_MARKER_WORDS + self.stop
+        self._hold = max([self.HOLD_CHARS] + [len(s) for s in self.stop])
+
+    def _safe_end(self, text: str) -> int:
+        # Earliest index in the tail where an unfinished marker could begin
+        for i in range(max(0, len(text) - self._hold), len(text)):
+            head = text[i:].rstrip()
+            if head and any(w.startswith(head) for w in self._prefixes):
+                return i
+        return len(text)
+
+    def _visible_raw(self):
+        # Same leading trim as _clean_reply(); None while an echoed tag may still be arriving
+        text = self.raw.lstrip()
+        if "<|assistant|>".startswith(text) and not self.done:
+            return None
+        if text.startswith("<|assistant|>"):
+            text = text[len("<|assistant|>"):].lstrip()    # _clean_reply strips after the tag too
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """Add raw generated text; returns the newly safe-to-send part of the reply."""
+        if self.done:
+            return ""
+        self.raw += chunk
+        text = self._visible_raw()
+        if text is None:
+            return ""
+
+        cut = _find_stop(text, self.stop)
+        if cut >= 0:
+            self.done = True
+            visible = text[:cut].rstrip()
         else:
-            cleaned = text.strip()
+            visible = text[:self._safe_end(text)].rstrip()
+
+        out = visible[self.sent:]
+        self.sent = max(self.sent, len(visible))
+        return out
+
+    def finish(self) -> str:
+        """Flush whatever was held back once generation has ended."""
+        if self.done:
+            return ""
+        self.done = True
+        visible = (self._visible_raw() or "").strip()
+        out = visible[self.sent:]
+        self.sent = max(self.sent, len(visible))
+        return out
 
-        # Strip off any trailing fake dialogue turns like "Human:" / "User:" / "Assistant:"
-        split = re.split(r"(?:Human|User|Assistant|System)\s*[:：]", cleaned)
-        cleaned = split[0].strip()
+    def text(self) -> str:
+        """The full cleaned reply (same result as _clean_reply on the raw text)."""
+        return _clean_reply(self.raw, self.stop)
 
-        return cleaned or "I’m sorry — I couldn’t generate a response just now."
 
+def stream_nlm_reply(prompt: str, max_tokens: int = 200, stop=None, history=None):
+    """
+    Same generation as generate_nlm_reply(), but yields the cleaned reply
+    in chunks as tokens are produced. Runs on one of NLM_STREAM_WORKERS
+    stream threads, concurrently with batched generate() calls; further
+    streams queue until a thread is free.
+    Admission and deadlines work as in generate_nlm_reply(); Overloaded is
+    raised before the first chunk. Closing the generator early (client
+    disconnected) stops the generation at its next decoding step.
+    """
+    stop = tuple(stop or ())
+    history = tuple(history or ())
+    key = _reply_cache_key(prompt, max_tokens, stop, history)
+    cached = response_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        load_base_model()
     except Exception as e:
-        print("❌ Qwen generation error:", e)
-        return "I’m sorry — I couldn’t generate a response just now."
+        print("❌ Qwen streaming error:", e)
+        yield FALLBACK_REPLY
+        return
+
+    deadline = current_deadline()
+    with nlm_admission:
+        streamer = TextIteratorStreamer(base_tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cleaner = ReplyStreamCleaner(stop)
+        cancelled = threading.Event()
+        fut = stream_scheduler.submit(
+            (prompt, stop, streamer, history, deadline, cancelled),
+            key=("stream", max_tokens),
+            deadline=deadline,
+        )
+        # Dropped unstarted (deadline passed in the queue): release the consumer
+        fut.add_done_callback(lambda f: f.exception() is not None and streamer.end())
+
+        ok = True
+        try:
+            for piece in streamer:
+                out = cleaner.feed(piece)
+                if out:
+                    yield out
+                if cleaner.done:
+                    break
+            else:
+                stats = fut.result()    # also surfaces generation errors
+                _annotate_draft(stats)
+                ok = not stats["deadline_hit"]
+                if not ok:
+                    metrics.annotate(nlm_deadline_hit=True)
+        except Overloaded:
+            if not cleaner.sent:
+                raise
+            ok = False
+            metrics.annotate(nlm_deadline_hit=True)
+        except Exception as e:
+            ok = False
+            metrics.annotate(nlm_error=True)
+            print("❌ Qwen streaming error:", e)
+        finally:
+            # No one reads past here (stop marker, error, or GeneratorExit from
+            # a consumer that went away): don't decode up to max_tokens
+            cancelled.set()
+
+    tail = cleaner.finish()
+    if tail:
+        yield tail
+    if not cleaner.sent:
+        yield FALLBACK_REPLY
+    elif ok:
+        response_cache.set(key, cleaner.text())
+
+
+# ============================================================
+# QUERY EMBEDDINGS (semantic answer cache)
+# ============================================================
+
+# "" → mean-pooled hidden states of the already-loaded chat model; or a small
+# local encoder, e.g. SEMANTIC_ENCODER_ID=sentence-transformers/all-MiniLM-L6-v2
+SEMANTIC_ENCODER_ID = os.getenv("SEMANTIC_ENCODER_ID", "").strip()
+SEMANTIC_EMBED_LAYER = int(os.getenv("SEMANTIC_EMBED_LAYER", "-1"))
+SEMANTIC_EMBED_MAX_TOKENS = 128
+
+# Decoder hidden states share one large common direction, which makes any
+# two questions look alike. The mean embedding of these unrelated sentences
+# is subtracted from every chat-model embedding before normalizing.
+_CENTERING_TEXTS = (
+    "what is the capital of france",
+    "how do vaccines work",
+    "weather in mumbai tomorrow",
+    "who wrote hamlet",
+    "explain photosynthesis simply",
+    "translate good morning to hindi",
+    "best way to learn python",
+    "why is the sky blue",
+    "how far is the moon from earth",
+    "tell me a joke",
+    "what causes inflation",
+    "who is the prime minister of india",
+    "how to cook rice",
+    "what is machine learning",
+    "history of the roman empire",
+    "how many players in a cricket team",
+)
+
+_encoder = None         # (tokenizer, model, center vector or None)
+_encoder_lock = threading.Lock()
+
+# Chat-model embeddings need PyTorch hidden states; other backends need an encoder
+SEMANTIC_ENABLED = SEMANTIC_CACHE and bool(SEMANTIC_ENCODER_ID or backend.supports_hidden_states)
+if SEMANTIC_CACHE and not SEMANTIC_ENABLED:
+    print(f"⚠️ Semantic cache off: NLM_BACKEND={backend.name} has no hidden states — set SEMANTIC_ENCODER_ID")
+
+
+def _mean_pool(tok, mod, text: str) -> np.ndarray:
+    # One text at a time: padding/truncation flags would reconfigure the
+    # shared fast tokenizer while the scheduler thread is using it.
+    ids = tok(text)["input_ids"][:SEMANTIC_EMBED_MAX_TOKENS]
+    with torch.no_grad():
+        out = mod.base_model(input_ids=torch.tensor([ids], device=device), output_hidden_states=True)
+    return out.hidden_states[SEMANTIC_EMBED_LAYER][0].float().mean(dim=0).cpu().numpy()
+
+
+def _load_encoder():
+    global _encoder
+    if _encoder is not None:
+        return _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            if SEMANTIC_ENCODER_ID:
+                tok = AutoTokenizer.from_pretrained(SEMANTIC_ENCODER_ID)
+                mod = AutoModel.from_pretrained(SEMANTIC_ENCODER_ID).to(device).eval()
+                center, tag = None, f"{SEMANTIC_ENCODER_ID}:layer{SEMANTIC_EMBED_LAYER}"
+            else:
+                tok, mod = load_base_model()
+                center = np.mean([_mean_pool(tok, mod, t) for t in _CENTERING_TEXTS], axis=0)
+                tag = f"{BASE_MODEL_ID}:{NLM_PRECISION}:layer{SEMANTIC_EMBED_LAYER}"
+            dim = _mean_pool(tok, mod, "hello").shape[0]
+            semantic_cache.bind(tag, dim)
+            _encoder = (tok, mod, center)
+    return _encoder
+
+
+@functools.lru_cache(maxsize=256)
+def embed_query(text: str) -> np.ndarray:
+    """L2-normalized embedding of a (whitespace/case-normalized) question; read-only, memoized."""
+    tok, mod, center = _load_encoder()
+    vec = _mean_pool(tok, mod, text)
+    if center is not None:
+        vec = vec - center
+    vec = (vec / max(float(np.linalg.norm(vec)), 1e-12)).astype(np.float32)
+    vec.flags.writeable = False
+    return vec
+
+
+def _semantic_key(query: str) -> str:
+    return normalize_text(query).lower().rstrip("?.! ")
+
+
+def semantic_lookup(query: str):
+    """(reply, similarity, cached question) for an earlier question that means the same, or None."""
+    if not SEMANTIC_ENABLED:
+        return None
+    with metrics.stage("semantic_lookup"):
+        return semantic_cache.lookup(embed_query(_semantic_key(query)))
+
+
+def semantic_store(query: str, reply: str):
+    if SEMANTIC_ENABLED:
+        semantic_cache.add(query, embed_query(_semantic_key(query)), reply)
 
 
 # ============================================================
@@ -129,22 +821,16 @@ def translate_text(phrase: str, target_lang: str) -> str:
         return "Please specify a target language (e.g., Hindi, Marathi)."
 
     lang = target_lang.lower().strip()
-    model_data = load_translation_model(lang)
-
-    if not model_data:
+    if lang not in TRANSLATION_MODEL_IDS:
         return f"Sorry, translation to '{target_lang}' is not supported yet."
 
-    tok, mod = model_data
-
     try:
-        batch = tok([phrase], return_tensors="pt", truncation=True)
-        with torch.no_grad():
-            generated = mod.generate(
-                **batch,
-                max_new_tokens=80,
-            )
-        out = tok.batch_decode(generated, skip_special_tokens=True)[0]
-        return out.strip()
+        return translator.translate(phrase, lang)
     except Exception as e:
         print("❌ Translation error:", e)
-        return "Translation failed. Please try again."
\ No newline at end of file
+        return TRANSLATION_FAILED
+
+
+# Last statement: utils.model_loader only reads this module's attributes
+# once READY exists (it is in sys.modules from the start of its import).
+READY = True
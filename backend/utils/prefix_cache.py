@@ -0,0 +1,118 @@
+# backend/utils/prefix_cache.py
+#
+# Prefix KV-cache for the fixed <|system|> preambles used by the router.
+# Registering a template is free (no torch import), so app.py can do it at
+# boot; the past_key_values for each template are computed once, the first
+# time the model is available, and reused for every prompt that starts with
+# that template.
+
+import threading
+
+
+class PrefixCache:
+    def __init__(self):
+        self._templates = []          # registration order
+        self._entries = {}            # template -> (token_ids, legacy_kv)
+        self._model_id = None         # id() of the model the entries belong to
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    # ------------------------------------------------------------
+    # Registration
+    # ------------------------------------------------------------
+
+    def register(self, template: str):
+        """Register a constant prompt prefix (e.g. a <|system|> line)."""
+        with self._lock:
+            if template and template not in self._templates:
+                self._templates.append(template)
+
+    def templates(self) -> list:
+        return list(self._templates)
+
+    # ------------------------------------------------------------
+    # Prefill
+    # ------------------------------------------------------------
+
+    def _compute(self, tokenizer, model, template: str):
+        import torch
+
+        ids = tokenizer(template, return_tensors="pt")["input_ids"].to(model.device)
+        with torch.no_grad():
+            out = model(input_ids=ids, use_cache=True)
+
+        kv = out.past_key_values
+        legacy = kv.to_legacy_cache() if hasattr(kv, "to_legacy_cache") else kv
+        return ids[0].tolist(), legacy
+
+    def precompute(self, tokenizer, model):
+        """Prefill every registered template now (called after the model loads)."""
+        for template in self.templates():
+            self._entry(tokenizer, model, template)
+
+    def _entry(self, tokenizer, model, template: str):
+        with self._lock:
+            if self._model_id != id(model):
+                # different weights (reload / precision change) → stale KV
+                self._entries.clear()
+                self._model_id = id(model)
+            entry = self._entries.get(template)
+            if entry is None:
+                entry = self._compute(tokenizer, model, template)
+                self._entries[template] = entry
+            return entry
+
+    # ------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------
+
+    def lookup(self, tokenizer, model, prompt: str, input_ids):
+        """
+        Return a fresh DynamicCache holding the KV for the longest registered
+        template that `prompt` starts with, or None.
+
+        `input_ids` is the (1, seq_len) tokenized prompt; the template must
+        tokenize to exactly its first tokens and leave at least one token
+        for generate() to prefill.
+        """
+        from transformers import DynamicCache
+
+        candidates = sorted(
+            (t for t in self._templates if prompt.startswith(t)),
+            key=len,
+            reverse=True,
+        )
+        row = input_ids[0].tolist()
+
+        for template in candidates:
+            ids, legacy = self._entry(tokenizer, model, template)
+            if len(ids) < len(row) and row[:len(ids)] == ids:
+                self.hits += 1
+                self.tokens_saved += len(ids)
+                # DynamicCache.update() concatenates into new tensors, so the
+                # stored prefix tensors are shared safely across requests.
+                return DynamicCache.from_legacy_cache(legacy)
+
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "templates": len(self._templates),
+            "computed": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+# Shared instance used by utils.nlp_model
+prefix_cache = PrefixCache()
+
+
+def register_prefix(template: str):
+    """Public API: reuse the prefill of `template` for every prompt that starts with it."""
+    prefix_cache.register(template)
@@ -0,0 +1,193 @@
+# backend/utils/probability.py
+#
+# Condition probabilities for /weather/probability.
+#
+# When a gridded climatology file is available (utils/climatology.py,
+# CLIMATOLOGY_PATH) probabilities are the observed event frequencies over
+# the requested date range, interpolated between grid cells, and
+# data_points is the number of daily observations behind them. Items
+# outside the grid (or with no file) fall back to the seasonal model.
+#
+# The seasonal table is a (hemisphere, month, field) NumPy array built once
+# at import, so any number of (location, date range) items is handled in
+# one vectorized pass: a fancy-indexed table lookup for the seasonal
+# bases, then one RNG draw of shape (n, conditions) for the ±10 point
+# jitter. Pass a seed for reproducible results.
+
+import os
+from datetime import datetime
+
+import numpy as np
+
+from utils.climatology import climate_store, day_of_year
+
+PROBABILITY_BATCH_MAX = int(os.getenv("PROBABILITY_BATCH_MAX", "10000"))
+
+SEASONAL_FIELDS = ("rain", "sunny", "cloudy", "temp")
+DATA_SOURCES = ["Historical Climate Data", "Weather Stations", "Satellite Data"]
+MIN_GOOD_OBSERVATIONS = 100     # fewer daily observations → data_quality "Limited"
+
+# name, label, threshold, description (order = columns of the probability matrix)
+CONDITIONS = (
+    ("rain", "Moderate", ">5mm", "Chance of rainfall"),
+    ("extreme_heat", "Low", ">35°C", "Risk of extreme heat"),
+    ("high_wind", "Low", ">40km/h", "Strong wind conditions"),
+    ("cloudy", "High", ">70%", "Cloud coverage"),
+    ("good_weather", "High", "Clear skies", "Favorable conditions"),
+)
+
+_DRY = (15, 70, 30, 20)
+_SPRING = (25, 60, 40, 28)
+_MONSOON = (70, 45, 60, 32)
+_AUTUMN = (50, 55, 45, 26)
+
+
+def _season(is_northern: bool, month: int):
+    """Seasonal base for a 0-based month (Python port of the frontend's JS logic)."""
+    if is_northern:
+        if 2 <= month <= 4:
+            return _SPRING
+        if 5 <= month <= 7:
+            return _MONSOON
+        if 8 <= month <= 10:
+            return _AUTUMN
+        return _DRY
+    if 8 <= month <= 10:
+        return _SPRING
+    if month >= 11 or month <= 1:
+        return _MONSOON
+    if 2 <= month <= 4:
+        return _AUTUMN
+    return _DRY
+
+
+# [0 = northern / 1 = southern, month 0..11, SEASONAL_FIELDS]
+SEASONAL_TABLE = np.array(
+    [[_season(north, m) for m in range(12)] for north in (True, False)], dtype=np.float64
+)
+
+
+def make_rng(seed=None) -> np.random.Generator:
+    """Fresh generator per call (Generators are not thread-safe); seed → reproducible."""
+    return np.random.default_rng(seed)
+
+
+# ============================================================
+# INPUT PARSING
+# ============================================================
+
+def parse_location(location) -> tuple:
+    """(lat, lng, city_name) from a request location object; ValueError if unusable."""
+    if not location or not isinstance(location, dict):
+        raise ValueError("location is required.")
+    lat = float(location.get("latitude", 0))
+    lng = float(location.get("longitude", 0))
+    city_name = location.get("city_name") or f"Location ({lat}, {lng})"
+    return lat, lng, city_name
+
+
+def parse_date_range(date_range) -> tuple:
+    """
+    (start_date, end_date, 0-based month of start_date, first day of year,
+    last day of year, number of days); ValueError if unusable.
+    """
+    if not date_range or not isinstance(date_range, dict) or not date_range.get("start_date"):
+        raise ValueError("date_range with start_date required.")
+    start = date_range["start_date"]
+    end = date_range.get("end_date") or start
+    first, last = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    if last < first:
+        raise ValueError("end_date is before start_date.")
+    n_days = (last.date() - first.date()).days + 1
+    return start, end, first.month - 1, day_of_year(first), day_of_year(last), n_days
+
+
+# ============================================================
+# VECTORIZED PASS
+# ============================================================
+
+def seasonal_bases(lats, months) -> np.ndarray:
+    """(n, len(SEASONAL_FIELDS)) seasonal bases for parallel latitude / 0-based month arrays."""
+    hemisphere = (np.asarray(lats, dtype=np.float64) <= 0).astype(np.intp)
+    return SEASONAL_TABLE[hemisphere, np.asarray(months, dtype=np.intp)]
+
+
+def condition_probabilities(seasonal: np.ndarray, rng: np.random.Generator):
+    """
+    (probabilities, data_points) for seasonal bases of shape (n, 4):
+    probabilities is (n, len(CONDITIONS)) in percent, rounded to 2 places.
+    """
+    rain, temp, cloudy = seasonal[:, 0], seasonal[:, 3], seasonal[:, 2]
+    base = np.column_stack((
+        rain,
+        np.maximum(5, temp - 25),
+        np.full_like(rain, 20),
+        cloudy,
+        100 - rain,
+    ))
+    noise = rng.random(base.shape) * 20 - 10
+    probs = np.round(np.clip(base + noise, 0, 100), 2)
+    data_points = rng.integers(100, 601, size=len(base))
+    return probs, data_points
+
+
+def build_results(locations: list, date_ranges: list, rng: np.random.Generator,
+                  include_ai_insights=False, dataset_mode="Global") -> list:
+    """
+    Per-item /weather/probability responses for parallel lists of parsed
+    locations (parse_location) and date ranges (parse_date_range).
+    """
+    if not locations:
+        return []
+    lats = [loc[0] for loc in locations]
+    seasonal = seasonal_bases(lats, [dr[2] for dr in date_ranges])
+    probs, data_points = condition_probabilities(seasonal, rng)
+
+    observed = np.zeros(len(locations), dtype=bool)
+    clim_sources = DATA_SOURCES
+    clim = climate_store.get()
+    if clim is not None:
+        percent, observations = clim.lookup(
+            lats, [loc[1] for loc in locations],
+            [dr[3] for dr in date_ranges], [dr[4] for dr in date_ranges],
+            [dr[5] for dr in date_ranges],
+        )
+        observed = ~np.isnan(percent[:, 0])
+        probs[observed] = percent[observed]
+        data_points[observed] = np.rint(observations[observed])
+        clim_sources = [f"Gridded Climatology ({clim.source})"]
+
+    probs, data_points, seasonal = probs.tolist(), data_points.tolist(), seasonal.tolist()
+
+    results = []
+    for (lat, lng, city_name), (start, end, *_), row, points, season, measured in zip(
+            locations, date_ranges, probs, data_points, seasonal, observed.tolist()):
+        period = f"{start} to {end}"
+        probabilities = {
+            name: {"probability": p, "label": label, "threshold": threshold, "description": desc}
+            for (name, label, threshold, desc), p in zip(CONDITIONS, row)
+        }
+        probabilities["summary"] = {
+            "data_points": points,
+            "date_range": period,
+            "location": city_name,
+            "risk_level": "Moderate",
+            "data_quality": "Good" if not measured or points >= MIN_GOOD_OBSERVATIONS else "Limited",
+        }
+        item = {
+            "location": {"latitude": lat, "longitude": lng, "city_name": city_name},
+            "date_range": {"start_date": start, "end_date": end},
+            "probabilities": probabilities,
+            "data_sources": list(clim_sources if measured else DATA_SOURCES),
+            "analysis_period": period,
+            "dataset_mode": dataset_mode,
+        }
+        if include_ai_insights:
+            item["ai_insights"] = (
+                f"Based on historical data for {city_name}, "
+                f"there's a {row[0]:.1f}% chance of rain. "
+                f"Sunny conditions around {season[1]:.1f}% are expected. "
+                f"Temperature around {season[3]:.1f}°C is expected."
+            )
+        results.append(item)
+    return results
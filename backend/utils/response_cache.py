@@ -0,0 +1,184 @@
+# backend/utils/response_cache.py
+#
+# Deterministic response cache for generate_nlm_reply / translate_text.
+# Generation is greedy (do_sample=False), so the same prompt + model +
+# parameters always produce the same reply and can be served from here.
+#
+# Tier 1: in-memory LRU (OrderedDict) with TTL.
+# Tier 2: optional SQLite table that survives restarts (RESPONSE_CACHE_DB).
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")          # "" → memory only
+RESPONSE_CACHE_DB_MAX = int(os.getenv("RESPONSE_CACHE_DB_MAX", "100000"))
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different prompts share an entry."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def make_key(*parts) -> str:
+    """Stable hash of the normalized prompt, model id and generation params."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=24 * 3600, db_path="", db_max_entries=100000):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.db_path = db_path
+        self.db_max_entries = int(db_max_entries)
+
+        self._mem = OrderedDict()     # key → (stored_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_writes = 0
+
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._open_db()
+
+    # ------------------------------------------------------------
+    # SQLite tier
+    # ------------------------------------------------------------
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    stored_at REAL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_age ON response_cache(stored_at)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print("⚠️ Response cache DB disabled:", e)
+            self._db = None
+
+    def _db_get(self, key):
+        row = self._db.execute(
+            "SELECT value, stored_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        value, stored_at = row
+        if time.time() - stored_at > self.ttl:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return stored_at, value
+
+    def _db_set(self, key, value, stored_at):
+        self._db.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, stored_at) VALUES (?, ?, ?)",
+            (key, value, stored_at),
+        )
+        self._db_writes += 1
+        # Size / TTL pruning every few hundred writes keeps the table bounded
+        if self._db_writes % 256 == 0:
+            self._db.execute("DELETE FROM response_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+            self._db.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.db_max_entries,))
+        self._db.commit()
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+
+    def get(self, key):
+        """Return the cached value for key, or None (expired entries count as misses)."""
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                if now - item[0] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._mem[key]
+
+            if self._db is not None:
+                try:
+                    item = self._db_get(key)
+                except sqlite3.Error as e:
+                    print("⚠️ Response cache DB read failed:", e)
+                    item = None
+                if item is not None:
+                    self._put_mem(key, item)
+                    self.hits += 1
+                    self.db_hits += 1
+                    return item[1]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._put_mem(key, (stored_at, value))
+            if self._db is not None:
+                try:
+                    self._db_set(key, value, stored_at)
+                except sqlite3.Error as e:
+                    print("⚠️ Response cache DB write failed:", e)
+
+    def _put_mem(self, key, item):
+        # caller holds self._lock
+        self._mem[key] = item
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared instance for the NLM and translation wrappers
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL,
+    db_path=RESPONSE_CACHE_DB,
+    db_max_entries=RESPONSE_CACHE_DB_MAX,
+)
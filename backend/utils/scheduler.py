@@ -0,0 +1,138 @@
+# backend/utils/scheduler.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from utils.admission import DeadlineExceeded
+
+
+# ============================================================
+# DYNAMIC BATCHING SCHEDULER
+# ============================================================
+
+class InferenceScheduler:
+    """
+    In-process request queue served by `workers` threads (default one).
+
+    Callers `submit()` a payload and get a Future back. The worker packs
+    pending payloads that share the same `key` into one batch (up to
+    `max_batch_size`, waiting at most `max_wait_ms` for the batch to fill)
+    and hands them to `run_batch(key, payloads)`, which must return one
+    result per payload, in order. Payloads submitted with a `deadline`
+    (time.time()) that passes while they are queued fail with
+    DeadlineExceeded instead of being run. With several workers, up to
+    `workers` batches run at once.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=15.0, name="nlm-scheduler", workers=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.workers = max(1, int(workers))
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+
+        # counters (read by /health and benchmarks)
+        self.batches_run = 0
+        self.items_run = 0
+        self.items_expired = 0
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+
+    def submit(self, payload, key=None, deadline=None) -> Future:
+        """Queue one payload; the returned Future resolves to its result."""
+        fut = Future()
+        with self._cond:
+            self._pending.append((key, payload, fut, deadline))
+            self._ensure_worker()
+            self._cond.notify()
+        return fut
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+            "items_expired": self.items_expired,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "workers": self.workers,
+        }
+
+    # ------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------
+
+    def _ensure_worker(self):
+        # caller holds self._cond
+        self._threads = [t for t in self._threads if t.is_alive()]
+        if len(self._threads) < self.workers:
+            name = self.name if self.workers == 1 else f"{self.name}-{len(self._threads)}"
+            thread = threading.Thread(target=self._worker, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            # Give concurrent requests a short window to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Take the oldest request's key and every queued item that matches it
+            key = self._pending[0][0]
+            batch, skipped = [], []
+            while self._pending and len(batch) < self.max_batch_size:
+                item = self._pending.popleft()
+                (batch if item[0] == key else skipped).append(item)
+            self._pending.extendleft(reversed(skipped))
+
+        return key, batch
+
+    def _worker(self):
+        while True:
+            key, batch = self._next_batch()
+            now = time.time()
+            live = []
+            for _, p, f, deadline in batch:
+                if not f.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and now >= deadline:
+                    with self._cond:
+                        self.items_expired += 1
+                    f.set_exception(DeadlineExceeded("deadline passed while queued for generation"))
+                    continue
+                live.append((p, f))
+            if not live:
+                continue
+
+            try:
+                results = self.run_batch(key, [p for p, _ in live])
+            except Exception as e:
+                for _, fut in live:
+                    fut.set_exception(e)
+                continue
+
+            with self._cond:
+                self.batches_run += 1
+                self.items_run += len(live)
+            for (_, fut), res in zip(live, results):
+                fut.set_result(res)
@@ -0,0 +1,226 @@
+# backend/utils/semantic_cache.py
+#
+# Semantic answer cache: "who invented the telephone" and "telephone
+# inventor?" should share one answer, which the exact-match response cache
+# cannot do.
+#
+# - Each cached question is an L2-normalized embedding row in one
+#   contiguous float32 matrix (preallocated, SEMANTIC_CACHE_SIZE rows), so a
+#   lookup is a single matrix-vector product: brute-force cosine search,
+#   a few milliseconds even when full.
+# - A reply is returned when the best similarity is >= the threshold and the
+#   entry is younger than SEMANTIC_CACHE_TTL.
+# - Full cache → the least recently used row is overwritten.
+# - Optional snapshots (SEMANTIC_CACHE_PATH; vectors + texts, one .npz, no
+#   pickle) are written atomically every SEMANTIC_CACHE_SNAPSHOT seconds
+#   when dirty and at exit, and are reloaded only if they were built with
+#   the same embedding model. Memory only by default.
+#
+# Off by default (SEMANTIC_CACHE=1 turns it on): a threshold that is too
+# low for the embedding model answers one question with another's reply.
+# Calibrate SEMANTIC_CACHE_THRESHOLD for the deployed model / encoder with
+# benchmarks/bench_semantic_cache.py before enabling it.
+#
+# Embeddings come from utils.nlp_model.embed_query(); this module is
+# plain NumPy.
+
+import atexit
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils.response_cache import normalize_text
+
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "4096"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "")     # e.g. data/semantic_cache.npz; "" → memory only
+SEMANTIC_CACHE_SNAPSHOT = float(os.getenv("SEMANTIC_CACHE_SNAPSHOT", "300"))
+
+
+class SemanticCache:
+    def __init__(self, capacity=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl=SEMANTIC_CACHE_TTL, path=SEMANTIC_CACHE_PATH, snapshot_every=SEMANTIC_CACHE_SNAPSHOT):
+        self.capacity = max(1, int(capacity))
+        self.threshold = float(threshold)
+        self.ttl = float(ttl)
+        self.path = path
+        self.snapshot_every = snapshot_every
+
+        self.model = None           # embedding model tag the rows were made with
+        self._vecs = None           # (capacity, dim) float32, rows [0, size) in use
+        self._created = np.zeros(self.capacity, dtype=np.float64)
+        self._used = np.zeros(self.capacity, dtype=np.int64)    # LRU clock per row
+        self._queries = [None] * self.capacity
+        self._replies = [None] * self.capacity
+        self._slots = {}            # normalized query → row
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._snapshotter = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------
+
+    def bind(self, model: str, dim: int):
+        """Attach to an embedding model: load a matching snapshot, start snapshots."""
+        with self._lock:
+            if self.model == model and self._vecs is not None and self._vecs.shape[1] == dim:
+                return
+            self.model = model
+            self._reset(dim)
+            if self.path:
+                self._load()
+        if self.path and self.snapshot_every > 0 and self._snapshotter is None:
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name="semantic-snapshot", daemon=True)
+            self._snapshotter.start()
+            atexit.register(self.save)
+
+    def _reset(self, dim: int):
+        # caller holds self._lock
+        self._vecs = np.zeros((self.capacity, dim), dtype=np.float32)
+        self._created[:] = 0
+        self._used[:] = 0
+        self._queries = [None] * self.capacity
+        self._replies = [None] * self.capacity
+        self._slots = {}
+        self._size = 0
+
+    # ------------------------------------------------------------
+    # Lookup / insert
+    # ------------------------------------------------------------
+
+    def lookup(self, vec):
+        """(reply, similarity, cached question) for the nearest fresh entry above the threshold, or None."""
+        with self._lock:
+            n = self._size
+            if self._vecs is None or n == 0:
+                self.misses += 1
+                return None
+            scores = self._vecs[:n] @ vec
+            if self.ttl > 0:
+                scores[self._created[:n] < time.time() - self.ttl] = -np.inf
+            i = int(np.argmax(scores))
+            score = float(scores[i])
+            if score < self.threshold:
+                self.misses += 1
+                return None
+            self._clock += 1
+            self._used[i] = self._clock
+            self.hits += 1
+            return self._replies[i], score, self._queries[i]
+
+    def add(self, query: str, vec, reply: str):
+        key = normalize_text(query).lower()
+        with self._lock:
+            if self._vecs is None:
+                return
+            i = self._slots.get(key)
+            if i is None:
+                if self._size < self.capacity:
+                    i = self._size
+                    self._size += 1
+                else:
+                    i = int(np.argmin(self._used))
+                    self._slots.pop(normalize_text(self._queries[i]).lower(), None)
+                    self.evictions += 1
+                self._slots[key] = i
+            self._vecs[i] = vec
+            self._queries[i] = query
+            self._replies[i] = reply
+            self._created[i] = time.time()
+            self._clock += 1
+            self._used[i] = self._clock
+            self._dirty = True
+
+    # ------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------
+
+    def save(self):
+        """Write the cache to `path` (atomic replace); no-op when unchanged."""
+        with self._lock:
+            if not self.path or self._vecs is None or not self._dirty:
+                return
+            n = self._size
+            meta = json.dumps({
+                "model": self.model,
+                "queries": self._queries[:n],
+                "replies": self._replies[:n],
+            }, ensure_ascii=False).encode("utf-8")
+            arrays = {
+                "vectors": self._vecs[:n].copy(),
+                "created": self._created[:n].copy(),
+                "used": self._used[:n].copy(),
+                "meta": np.frombuffer(meta, dtype=np.uint8),
+            }
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print("⚠️ Semantic cache snapshot failed:", e)
+
+    def _load(self):
+        # caller holds self._lock; rows already reset to the bound model's dim
+        try:
+            with np.load(self.path, allow_pickle=False) as snap:
+                meta = json.loads(snap["meta"].tobytes().decode("utf-8"))
+                vectors = snap["vectors"]
+                created, used = snap["created"], snap["used"]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print("⚠️ Ignoring unreadable semantic cache snapshot:", e)
+            return
+        if meta.get("model") != self.model or vectors.shape[1:] != self._vecs.shape[1:]:
+            print("⚠️ Semantic cache snapshot was built with another embedding model; starting empty")
+            return
+
+        keep = np.argsort(used)[::-1][:self.capacity]        # most recently used first
+        for row, i in enumerate(keep):
+            self._vecs[row] = vectors[i]
+            self._created[row] = created[i]
+            self._used[row] = used[i]
+            self._queries[row] = meta["queries"][i]
+            self._replies[row] = meta["replies"][i]
+            self._slots[normalize_text(meta["queries"][i]).lower()] = row
+        self._size = len(keep)
+        self._clock = int(used.max()) if len(used) else 0
+        print(f"✅ Semantic cache: {self._size} entries loaded from {self.path}")
+
+    def _snapshot_loop(self):
+        while True:
+            time.sleep(self.snapshot_every)
+            self.save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": SEMANTIC_CACHE,
+            "model": self.model,
+            "entries": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# Shared instance used by utils.nlp_model
+semantic_cache = SemanticCache()
@@ -0,0 +1,39 @@
+# backend/utils/text_summarizer.py
+#
+# Cheap extractive summaries (no model call), used to keep older chat
+# turns in the prompt as one short line once they no longer fit whole.
+
+import re
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def first_sentence(text: str, max_chars: int = 120) -> str:
+    """First sentence of text, whitespace-collapsed and clipped at a word boundary."""
+    text = _SPACE_RE.sub(" ", text or "").strip()
+    sentence = _SENTENCE_RE.split(text, 1)[0]
+    if len(sentence) <= max_chars:
+        return sentence
+    cut = sentence.rfind(" ", 0, max_chars)
+    return sentence[:cut if cut > 0 else max_chars].rstrip(" ,;:") + "…"
+
+
+def summarize_turns(turns: list, max_chars: int = 400) -> str:
+    """
+    One line recalling what the user asked in `turns` ([(role, content)],
+    oldest first), newest questions kept first when it has to be cut.
+    """
+    asked = []
+    used = 0
+    for role, content in reversed(turns):
+        if role != "user":
+            continue
+        item = f'"{first_sentence(content, 100)}"'
+        if used + len(item) + 2 > max_chars:
+            break
+        asked.append(item)
+        used += len(item) + 2
+    if not asked:
+        return ""
+    return "Earlier in this conversation the user asked: " + "; ".join(reversed(asked)) + "."
@@ -0,0 +1,255 @@
+# backend/utils/translation.py
+#
+# English → Indic translation engine (MarianMT).
+#
+# - batch API: translate_batch([(text, lang), ...]) in one call
+# - long text is split into sentences, translated as padded batches
+#   (sorted by length, so little padding) and stitched back together
+# - per-sentence response cache, so repeated sentences are free
+# - loaded models live in an LRU pool bounded by TRANSLATION_POOL_MB;
+#   the least recently used model is evicted to make room
+# - optional preload of TRANSLATION_PRELOAD languages at startup
+# - weights load and generate() runs through utils.inference_backend
+#   (PyTorch, or ONNX Runtime with TRANSLATION_BACKEND=onnx)
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from transformers import MarianTokenizer
+
+from utils import metrics
+from utils.inference_backend import TRANSLATION_BACKEND, get_backend
+from utils.response_cache import make_key, normalize_text, response_cache
+
+TRANSLATION_MODEL_IDS = {
+    "hindi": "Helsinki-NLP/opus-mt-en-hi",
+    "marathi": "Helsinki-NLP/opus-mt-en-mr",
+    "tamil": "Helsinki-NLP/opus-mt-en-ta",
+    "telugu": "Helsinki-NLP/opus-mt-en-te",
+}
+
+TRANSLATION_POOL_MB = float(os.getenv("TRANSLATION_POOL_MB", "1024"))
+TRANSLATION_MODEL_MB_ESTIMATE = float(os.getenv("TRANSLATION_MODEL_MB_ESTIMATE", "300"))  # before first load
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "16"))
+TRANSLATION_PRELOAD = os.getenv("TRANSLATION_PRELOAD", "")      # "hindi,tamil" or "all"
+
+MAX_INPUT_TOKENS = 512          # Marian position limit
+MAX_SEGMENT_CHARS = 400         # longer sentences are split again at word boundaries
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?।])\s+|\s*\n\s*")
+
+
+def split_sentences(text: str) -> list:
+    """
+    Split text into (segment, separator) pairs such that
+    ''.join(seg + sep) == text. Over-long sentences are cut at spaces.
+    """
+    parts, pos = [], 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        parts.append((text[pos:m.start()], m.group()))
+        pos = m.end()
+    parts.append((text[pos:], ""))
+
+    out = []
+    for seg, sep in parts:
+        while len(seg) > MAX_SEGMENT_CHARS:
+            cut = seg.rfind(" ", 0, MAX_SEGMENT_CHARS)
+            if cut <= 0:
+                cut = MAX_SEGMENT_CHARS
+            out.append((seg[:cut], " "))
+            seg = seg[cut:].lstrip()
+        if seg or sep:
+            out.append((seg, sep))
+    return out
+
+
+class ModelPool:
+    """LRU of loaded (tokenizer, model) pairs, bounded by an approximate memory budget."""
+
+    def __init__(self, budget_mb=TRANSLATION_POOL_MB, model_ids=None, backend=None):
+        self.budget_mb = budget_mb
+        self.model_ids = dict(model_ids or TRANSLATION_MODEL_IDS)
+        self.backend = backend or get_backend(TRANSLATION_BACKEND)
+        self._models = OrderedDict()   # lang → (tok, model, mb)
+        self._sizes = {}               # model id → mb, remembered across evictions
+        self._lock = threading.Lock()
+        self._loading = {}             # lang → Lock (one load per language at a time)
+
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _load(self, model_id: str):
+        tok = MarianTokenizer.from_pretrained(model_id)
+        mod = self.backend.load_seq2seq(model_id)
+        return tok, mod
+
+    def used_mb(self) -> float:
+        return sum(mb for _, _, mb in self._models.values())
+
+    def _evict_for(self, need_mb: float, keep: str = None):
+        # caller holds self._lock
+        while self._models and self.used_mb() + need_mb > self.budget_mb:
+            victim = next((k for k in self._models if k != keep), None)
+            if victim is None:
+                break
+            print(f"🌐 Evicting translation model for {victim} (pool budget {self.budget_mb:.0f} MB)")
+            del self._models[victim]
+            self.evictions += 1
+
+    def get(self, lang: str):
+        """(tokenizer, model) for `lang`, loading (and evicting) as needed; None if unsupported."""
+        model_id = self.model_ids.get(lang)
+        if not model_id:
+            return None
+
+        with self._lock:
+            entry = self._models.get(lang)
+            if entry:
+                self._models.move_to_end(lang)
+                return entry[0], entry[1]
+            load_lock = self._loading.setdefault(lang, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(lang)
+                if entry:
+                    self._models.move_to_end(lang)
+                    return entry[0], entry[1]
+                # Make room first so the budget holds while the new weights load
+                self._evict_for(self._sizes.get(model_id, TRANSLATION_MODEL_MB_ESTIMATE))
+
+            print(f"🌐 Loading translation model for {lang}: {model_id}")
+            t0 = time.perf_counter()
+            with metrics.stage("translate_model_load"):
+                tok, mod = self._load(model_id)
+            mb = self.backend.model_mb(mod) or TRANSLATION_MODEL_MB_ESTIMATE
+
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += time.perf_counter() - t0
+                self._sizes[model_id] = mb
+                self._evict_for(mb, keep=lang)
+                self._models[lang] = (tok, mod, mb)
+            return tok, mod
+
+    def loaded(self) -> list:
+        with self._lock:
+            return list(self._models)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "loaded": list(self._models),
+                "used_mb": round(self.used_mb(), 1),
+                "budget_mb": self.budget_mb,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "load_s": round(self.load_seconds, 3),
+            }
+
+
+class TranslationEngine:
+    def __init__(self, pool: ModelPool = None, batch_size=TRANSLATION_BATCH_SIZE):
+        self.pool = pool or ModelPool()
+        self.batch_size = max(1, batch_size)
+        self.segments_translated = 0
+        self.segments_cached = 0
+
+    def supported(self, lang: str) -> bool:
+        return (lang or "").lower().strip() in self.pool.model_ids
+
+    def _segment_key(self, lang: str, seg: str) -> str:
+        return make_key("translate", self.pool.model_ids[lang], self.pool.backend.name, normalize_text(seg))
+
+    def _translate_segments(self, lang: str, segments: list) -> dict:
+        """Translate distinct segments for one language; returns {segment: translation}."""
+        tok, mod = self.pool.get(lang)
+        out = {}
+        # Similar lengths in one batch → less padding
+        ordered = sorted(segments, key=len)
+        for i in range(0, len(ordered), self.batch_size):
+            chunk = ordered[i:i + self.batch_size]
+            with metrics.stage("translate_tokenize"):
+                batch = tok(chunk, return_tensors="pt", padding=True, truncation=True,
+                            max_length=MAX_INPUT_TOKENS)
+            in_len = batch["input_ids"].shape[1]
+            with metrics.stage("translate_generate"):
+                generated = self.pool.backend.generate(
+                    mod,
+                    **batch,
+                    max_new_tokens=min(MAX_INPUT_TOKENS, 2 * in_len + 16),
+                )
+            with metrics.stage("translate_decode"):
+                decoded = tok.batch_decode(generated, skip_special_tokens=True)
+            for seg, text in zip(chunk, decoded):
+                out[seg] = text.strip()
+                response_cache.set(self._segment_key(lang, seg), out[seg])
+        self.segments_translated += len(ordered)
+        return out
+
+    def translate_batch(self, items: list) -> list:
+        """
+        Translate [(text, lang), ...] → [translation, ...] (same order).
+        Unsupported languages raise ValueError before any work is done.
+        """
+        plans = []                      # per item: (lang, [(segment, separator)])
+        todo = {}                       # lang → {segment: None} (ordered, distinct)
+        done = {}                       # (lang, segment) → translation
+
+        for text, lang in items:
+            lang = (lang or "").lower().strip()
+            if lang not in self.pool.model_ids:
+                raise ValueError(f"unsupported language: {lang!r}")
+            parts = split_sentences((text or "").strip())
+            plans.append((lang, parts))
+            for seg, _ in parts:
+                if not seg.strip() or (lang, seg) in done:
+                    continue
+                cached = response_cache.get(self._segment_key(lang, seg))
+                if cached is not None:
+                    done[(lang, seg)] = cached
+                    self.segments_cached += 1
+                else:
+                    todo.setdefault(lang, {})[seg] = None
+
+        for lang, segs in todo.items():
+            for seg, text in self._translate_segments(lang, list(segs)).items():
+                done[(lang, seg)] = text
+
+        return [
+            "".join((done[(lang, seg)] if seg.strip() else seg) + sep for seg, sep in parts).strip()
+            for lang, parts in plans
+        ]
+
+    def translate(self, text: str, lang: str) -> str:
+        return self.translate_batch([(text, lang)])[0]
+
+    def preload(self, langs=None):
+        """Load the given languages (default: TRANSLATION_PRELOAD) into the pool."""
+        if langs is None:
+            langs = TRANSLATION_PRELOAD
+        if isinstance(langs, str):
+            langs = list(self.pool.model_ids) if langs.strip().lower() == "all" else langs.split(",")
+        for lang in langs:
+            lang = lang.lower().strip()
+            if lang in self.pool.model_ids:
+                try:
+                    self.pool.get(lang)
+                except Exception as e:
+                    print(f"❌ Translation preload failed for {lang}:", e)
+
+    def stats(self) -> dict:
+        return dict(
+            self.pool.stats(),
+            segments_translated=self.segments_translated,
+            segments_cached=self.segments_cached,
+        )
+
+
+# Shared engine used by nlp_model.translate_text and /api/translate
+translator = TranslationEngine()
@@ -0,0 +1,197 @@
+# backend/utils/trends_store.py
+#
+# In-memory, indexed view of data/trends.csv for analyze_trends().
+#
+# The CSV is parsed once (and again only when its mtime/size changes).
+# Every distinct text value is lower-cased and indexed by character
+# trigrams, so a case-insensitive substring lookup only has to verify the
+# handful of values whose trigrams all contain the query's trigrams.
+# Rows are reached through a per-column (value → sorted row ids) table,
+# which keeps "first 3 matching rows in file order" exact.
+
+import os
+import threading
+import time
+
+import numpy as np
+
+NGRAM = 3
+MAX_RESULTS = 3
+
+
+class _TrendsIndex:
+    """Immutable snapshot of one CSV version (swapped in whole on reload)."""
+
+    SCAN_CHUNK = 256
+
+    def __init__(self):
+        self.display = None     # first text column, as object array (what we report)
+        self.values = []        # distinct lower-cased text values, ordered by first row
+        self.first_row = None   # value id → first row it appears in (ascending)
+        self.entries = []       # value id → [(column index, local code)]
+        self.postings = {}      # trigram → np.ndarray of value ids (sorted)
+        self.short_grams = set()  # every 1- and 2-char substring of any value
+        self.columns = []       # per text column: (row order, start offsets)
+
+    @classmethod
+    def build(cls, path: str):
+        import pandas as pd
+
+        idx = cls()
+        df = pd.read_csv(path)
+        text_cols = list(df.select_dtypes(include=["object", "string"]).columns)
+        if not text_cols:
+            return idx
+
+        value_ids = {}
+        values, entries, first_row = [], [], []
+        postings = {}
+        for ci, col in enumerate(text_cols):
+            codes, uniques = pd.factorize(df[col])
+            codes = codes.astype(np.int32, copy=False)
+
+            # Rows grouped by value: order[starts[k]:starts[k + 1]] are the rows
+            # holding value k, ascending (stable sort). Missing values (-1) sort first.
+            order = np.argsort(codes, kind="stable").astype(np.int32)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            starts = np.concatenate(([0], np.cumsum(counts))) + int((codes < 0).sum())
+            idx.columns.append((order, starts))
+            firsts = order[starts[:-1]].tolist()
+
+            for k, raw in enumerate(uniques):
+                low = str(raw).lower()
+                vid = value_ids.get(low)
+                if vid is None:
+                    vid = value_ids[low] = len(values)
+                    values.append(low)
+                    entries.append([])
+                    first_row.append(firsts[k])
+                    for gram in {low[i:i + NGRAM] for i in range(len(low) - NGRAM + 1)}:
+                        postings.setdefault(gram, []).append(vid)
+                    if len(low) < NGRAM:
+                        idx.short_grams.update(low[i:j] for i in range(len(low)) for j in range(i + 1, len(low) + 1))
+                else:
+                    first_row[vid] = min(first_row[vid], firsts[k])
+                entries[vid].append((ci, k))
+
+        # Renumber values by first appearance, so ascending value ids are also
+        # ascending rows and a scan can stop as soon as it has enough rows.
+        first = np.asarray(first_row, dtype=np.int64)
+        perm = np.argsort(first, kind="stable")
+        rank = np.empty_like(perm)
+        rank[perm] = np.arange(len(perm))
+
+        idx.values = [values[i] for i in perm]
+        idx.entries = [entries[i] for i in perm]
+        idx.first_row = first[perm].tolist()
+        idx.postings = {g: np.sort(rank[np.asarray(v)]).astype(np.int32) for g, v in postings.items()}
+        for g in idx.postings:
+            idx.short_grams.update((g[0], g[1], g[2], g[:2], g[1:]))
+        idx.display = df[text_cols[0]].to_numpy(dtype=object)
+        return idx
+
+    def candidates(self, q: str):
+        """Value ids that may contain q, ascending (yields plain ints, lazily)."""
+        if len(q) < NGRAM:
+            if q in self.short_grams:
+                yield from range(len(self.values))  # short query: scan every value in order
+            return
+
+        lists = []
+        for g in {q[i:i + NGRAM] for i in range(len(q) - NGRAM + 1)}:
+            found = self.postings.get(g)
+            if found is None:
+                return                              # a trigram nobody has → no match
+            lists.append(found)
+        lists.sort(key=len)
+
+        # Hits usually end the scan within the first few ids of the rarest
+        # trigram; only if they don't is the rest narrowed by intersection.
+        ids = lists[0]
+        head = ids[:self.SCAN_CHUNK]
+        yield from head.tolist()
+
+        rest = ids[self.SCAN_CHUNK:]
+        for other in lists[1:]:
+            if not len(rest):
+                return
+            rest = np.intersect1d(rest, other, assume_unique=True)
+        yield from rest.tolist()
+
+
+class TrendsStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sig = None            # (mtime_ns, size) of the loaded file
+        self._index = _TrendsIndex()
+
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _current(self) -> _TrendsIndex:
+        """Index for the file as it is now; rebuilt only when mtime/size change."""
+        sig = self._signature()
+        if sig != self._sig:
+            with self._lock:
+                if sig != self._sig:
+                    t0 = time.perf_counter()
+                    self._index = _TrendsIndex.build(self.path) if sig else _TrendsIndex()
+                    self._sig = sig
+                    self.loads += 1
+                    self.load_seconds = time.perf_counter() - t0
+        return self._index
+
+    def load(self):
+        """Build (or refresh) the index now instead of on the first lookup."""
+        self._current()
+
+    def matching_rows(self, text: str, limit: int = MAX_RESULTS) -> list:
+        """First `limit` row ids (file order) with a text cell containing `text` (case-insensitive)."""
+        return self._match(self._current(), text, limit)
+
+    @staticmethod
+    def _match(idx: _TrendsIndex, text: str, limit: int) -> list:
+        q = (text or "").lower()
+        if not q or not idx.values:
+            return []
+
+        best = []
+        for vid in idx.candidates(q):
+            # Values come in first-row order: nothing later can beat a full result
+            if len(best) >= limit and idx.first_row[vid] > best[-1]:
+                break
+            if q in idx.values[vid]:
+                rows = set(best)
+                for ci, k in idx.entries[vid]:
+                    order, starts = idx.columns[ci]
+                    rows.update(order[starts[k]:min(starts[k + 1], starts[k] + limit)].tolist())
+                best = sorted(rows)[:limit]
+        return best
+
+    def related(self, text: str) -> str:
+        """Same output as the old pandas scan: 'Historical trends related: a, b, c. ' or ''."""
+        idx = self._current()
+        rows = self._match(idx, text, MAX_RESULTS)
+        if not rows:
+            return ""
+        values = ", ".join(str(idx.display[r]) for r in rows)
+        return f"Historical trends related: {values}. "
+
+    def stats(self) -> dict:
+        idx = self._index
+        return {
+            "path": self.path,
+            "rows": 0 if idx.display is None else len(idx.display),
+            "distinct_values": len(idx.values),
+            "ngrams": len(idx.postings),
+            "loads": self.loads,
+            "last_load_s": round(self.load_seconds, 4),
+        }
@@ -0,0 +1,228 @@
+# backend/utils/weather_tools.py
+#
+# OpenWeather client shared by every request:
+# - one keep-alive requests.Session (pooled connections)
+# - per-city TTL cache (normalized city name), LRU-capped at WEATHER_CACHE_SIZE
+# - single-flight: concurrent misses for the same city share one upstream call
+# - stale-while-revalidate: on upstream errors, serve the last good payload;
+#   only 2xx and 404 ("city not found") replies are answers, anything else
+#   (bad / expired key, rate limit, 5xx) is an upstream error
+# - configurable base URL (OPENWEATHER_BASE_URL) so a local stub can stand in
+# - current_async(): the same cache / single-flight / stale fallback over the
+#   aiohttp pool (utils.async_http) for the async serving mode
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import async_http
+
+OPENWEATHER_API = os.getenv("OPENWEATHER_API") or os.getenv("OPENWEATHER_API_KEY")
+WEATHER_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5").rstrip("/")
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))      # fresh for 10 min
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "3600"))     # stale fallback for 1 h
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "8"))
+WEATHER_POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", "16"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))    # cities kept (LRU)
+
+
+class WeatherUnavailable(Exception):
+    """Upstream failed and there was no cached payload to fall back on."""
+
+
+def check_status(status: int):
+    """404 "city not found" is a real answer (cacheable); any other non-2xx is not."""
+    if status != 404 and not 200 <= status < 300:
+        raise WeatherUnavailable(f"upstream HTTP {status}")
+
+
+def normalize_city(city: str) -> str:
+    """Cache key for a city: case-, space- and punctuation-insensitive."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s-]", " ", city or "")).strip().lower()
+
+
+class WeatherClient:
+    def __init__(self, api_key=OPENWEATHER_API, base_url=WEATHER_URL, ttl=WEATHER_CACHE_TTL,
+                 stale_ttl=WEATHER_STALE_TTL, timeout=WEATHER_TIMEOUT, pool_size=WEATHER_POOL_SIZE,
+                 max_entries=WEATHER_CACHE_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.max_entries = max(1, max_entries)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._cache = OrderedDict()     # key → (fetched_at, payload), least recently used first
+        self._inflight = {}     # key → Future shared by concurrent callers
+        self._ainflight = {}    # key → asyncio.Task shared by concurrent async callers
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.stale_served = 0
+        self.evictions = 0
+
+    def _fetch(self, city: str, timeout: float) -> dict:
+        self.upstream_calls += 1
+        resp = self.session.get(
+            f"{self.base_url}/weather",
+            params={"q": city, "appid": self.api_key, "units": "metric"},
+            timeout=timeout,
+        )
+        check_status(resp.status_code)
+        return resp.json()
+
+    def current(self, city: str, timeout: float = None) -> dict:
+        """
+        Current-weather payload for `city` (OpenWeather /weather JSON).
+        Raises WeatherUnavailable if upstream fails and nothing is cached.
+        """
+        key = normalize_city(city)
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return entry[1]
+
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        timeout = timeout if timeout is not None else self.timeout
+        if not leader:
+            try:
+                return fut.result(timeout=timeout)
+            except FutureTimeout:
+                # The leader's fetch is hanging: give up on it like the leader would
+                stale = self._stale(key)
+                if stale is not None:
+                    return stale
+                raise WeatherUnavailable(f"no weather reply within {timeout:g}s") from None
+
+        try:
+            payload = self._fetch(city, timeout)
+            with self._lock:
+                self._store(key, payload)
+            fut.set_result(payload)
+            return payload
+        except Exception as e:
+            self.upstream_errors += 1
+            stale = self._stale(key)
+            if stale is not None:
+                fut.set_result(stale)
+                return stale
+            err = e if isinstance(e, WeatherUnavailable) else WeatherUnavailable(str(e))
+            fut.set_exception(err)
+            raise err
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # ------------------------------------------------------------
+    # Async (event loop) path
+    # ------------------------------------------------------------
+
+    async def _fetch_async(self, city: str, timeout: float) -> dict:
+        self.upstream_calls += 1
+        status, payload = await async_http.get_json(
+            f"{self.base_url}/weather",
+            params={"q": city, "appid": self.api_key, "units": "metric"},
+            timeout=timeout,
+        )
+        check_status(status)
+        return payload
+
+    async def _refresh_async(self, key: str, city: str, timeout: float) -> dict:
+        try:
+            payload = await self._fetch_async(city, timeout)
+            with self._lock:
+                self._store(key, payload)
+            return payload
+        except Exception as e:
+            self.upstream_errors += 1
+            stale = self._stale(key)
+            if stale is not None:
+                return stale
+            raise e if isinstance(e, WeatherUnavailable) else WeatherUnavailable(str(e))
+        finally:
+            self._ainflight.pop(key, None)
+
+    async def current_async(self, city: str, timeout: float = None) -> dict:
+        """
+        current() without blocking the event loop. Concurrent misses for a
+        city await one shared upstream task; a caller that is cancelled
+        (client gone, deadline) does not cancel it for the others.
+        """
+        key = normalize_city(city)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.time() - entry[0] <= self.ttl:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return entry[1]
+
+        task = self._ainflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(
+                self._refresh_async(key, city, timeout if timeout is not None else self.timeout))
+            self._ainflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _stale(self, key: str):
+        """The last good payload for `key` if it is within stale_ttl, else None."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.time() - entry[0] <= self.stale_ttl:
+                self.stale_served += 1
+                return entry[1]
+        return None
+
+    def _store(self, key: str, payload: dict):
+        # caller holds self._lock; evict least recently used cities beyond max_entries
+        self._cache[key] = (time.time(), payload)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "cached_cities": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+            "stale_served": self.stale_served,
+            "evictions": self.evictions,
+        }
+
+
+# Shared client used by app.get_weather
+weather_client = WeatherClient()
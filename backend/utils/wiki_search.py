@@ -0,0 +1,551 @@
+# backend/utils/wiki_search.py
+#
+# Knowledge lookup for the who-is / Wikipedia / DuckDuckGo router branches.
+#
+# - Candidate summaries are fetched concurrently on a thread pool.
+# - DuckDuckGo runs speculatively alongside Wikipedia instead of after it.
+# - Every lookup has a deadline; per-request timeouts shrink to fit it.
+# - Search results, summaries and instant answers are cached with a TTL.
+# - The backend is pluggable: WebKnowledgeBackend talks to the MediaWiki and
+#   DuckDuckGo APIs (base URLs configurable), FixtureBackend serves a local
+#   JSON fixture for tests and benchmarks (KNOWLEDGE_FIXTURE=path.json).
+# - lookup_async() is the same lookup as event-loop tasks (async serving
+#   mode): backends with an async transport (aiohttp, utils.async_http)
+#   use no threads at all; others run on asyncio's default thread pool.
+
+import abc
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import async_http
+
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+DUCKDUCKGO_API_URL = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
+KNOWLEDGE_FIXTURE = os.getenv("KNOWLEDGE_FIXTURE", "")
+KNOWLEDGE_CACHE_TTL = float(os.getenv("KNOWLEDGE_CACHE_TTL", "3600"))
+KNOWLEDGE_DEADLINE = float(os.getenv("KNOWLEDGE_DEADLINE", "6"))     # seconds per lookup
+KNOWLEDGE_WORKERS = int(os.getenv("KNOWLEDGE_WORKERS", "16"))
+KNOWLEDGE_FANOUT = int(os.getenv("KNOWLEDGE_FANOUT", "3"))           # summaries fetched at once
+WIKI_TIMEOUT = 5.0
+DDG_TIMEOUT = 5.0
+
+# Avoid bad pages (like light bulbs for invention queries)
+TITLE_BLACKLIST = ["centennial light", "light bulb", "lamp", "incandescent"]
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class KnowledgeBackend(abc.ABC):
+    """
+    Interface for knowledge sources. Methods return None / [] for "nothing
+    found" and raise on transport errors (which are never cached).
+    """
+
+    @abc.abstractmethod
+    def search(self, query: str, limit: int, timeout: float) -> list:
+        """Ranked page titles for `query`."""
+
+    @abc.abstractmethod
+    def summary(self, title: str, sentences: int, timeout: float):
+        """First `sentences` sentences of a page, or None (missing / disambiguation)."""
+
+    @abc.abstractmethod
+    def instant_answer(self, query: str, timeout: float):
+        """DuckDuckGo-style abstract text for `query`, or None."""
+
+    # Async variants; by default the blocking call on a worker thread
+    async def search_async(self, query: str, limit: int, timeout: float) -> list:
+        return await asyncio.to_thread(self.search, query, limit, timeout)
+
+    async def summary_async(self, title: str, sentences: int, timeout: float):
+        return await asyncio.to_thread(self.summary, title, sentences, timeout)
+
+    async def instant_answer_async(self, query: str, timeout: float):
+        return await asyncio.to_thread(self.instant_answer, query, timeout)
+
+
+class WebKnowledgeBackend(KnowledgeBackend):
+    """MediaWiki action API + DuckDuckGo Instant Answer API over one pooled session."""
+
+    def __init__(self, wiki_url=WIKIPEDIA_API_URL, ddg_url=DUCKDUCKGO_API_URL, pool_size=KNOWLEDGE_WORKERS):
+        self.wiki_url = wiki_url
+        self.ddg_url = ddg_url
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "PastCAST-AI/1.0 (knowledge lookup)"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # Request parameters and response parsing, shared by both transports
+
+    @staticmethod
+    def _search_params(query, limit):
+        return {
+            "action": "query",
+            "list": "search",
+            "srsearch": query,
+            "srlimit": limit,
+            "srprop": "",
+            "format": "json",
+        }
+
+    @staticmethod
+    def _parse_search(data):
+        return [hit["title"] for hit in data.get("query", {}).get("search", [])]
+
+    @staticmethod
+    def _summary_params(title, sentences):
+        return {
+            "action": "query",
+            "prop": "extracts|pageprops",
+            "explaintext": 1,
+            "exsentences": sentences,
+            "ppprop": "disambiguation",
+            "redirects": 1,
+            "titles": title,
+            "format": "json",
+        }
+
+    @staticmethod
+    def _parse_summary(data):
+        for page in data.get("query", {}).get("pages", {}).values():
+            if "missing" in page or "disambiguation" in page.get("pageprops", {}):
+                return None
+            return page.get("extract") or None
+        return None
+
+    @staticmethod
+    def _instant_params(query):
+        return {"q": query, "format": "json"}
+
+    @staticmethod
+    def _parse_instant(data):
+        if data.get("AbstractText"):
+            return data["AbstractText"]
+        for item in data.get("RelatedTopics") or []:
+            if isinstance(item, dict) and item.get("Text"):
+                return item["Text"]
+        return None
+
+    def search(self, query, limit, timeout):
+        data = self.session.get(self.wiki_url, params=self._search_params(query, limit), timeout=timeout).json()
+        return self._parse_search(data)
+
+    def summary(self, title, sentences, timeout):
+        data = self.session.get(self.wiki_url, params=self._summary_params(title, sentences), timeout=timeout).json()
+        return self._parse_summary(data)
+
+    def instant_answer(self, query, timeout):
+        data = self.session.get(self.ddg_url, params=self._instant_params(query), timeout=timeout).json()
+        return self._parse_instant(data)
+
+    # aiohttp transport (async serving mode)
+
+    async def _get_json_async(self, url, params, timeout):
+        headers = {"User-Agent": self.session.headers["User-Agent"]}
+        _, data = await async_http.get_json(url, params, timeout, headers=headers)
+        return data
+
+    async def search_async(self, query, limit, timeout):
+        return self._parse_search(await self._get_json_async(self.wiki_url, self._search_params(query, limit), timeout))
+
+    async def summary_async(self, title, sentences, timeout):
+        return self._parse_summary(await self._get_json_async(self.wiki_url, self._summary_params(title, sentences), timeout))
+
+    async def instant_answer_async(self, query, timeout):
+        return self._parse_instant(await self._get_json_async(self.ddg_url, self._instant_params(query), timeout))
+
+
+class FixtureBackend(KnowledgeBackend):
+    """
+    Local stand-in. Fixture shape:
+        {"search": {query: [titles]}, "summaries": {title: text},
+         "instant": {query: text}, "latency_ms": 0}
+    Lookups are case-insensitive.
+    """
+
+    def __init__(self, fixture):
+        if isinstance(fixture, str):
+            with open(fixture, encoding="utf-8") as f:
+                fixture = json.load(f)
+        self.latency = float(fixture.get("latency_ms", 0)) / 1000.0
+        self._search = {k.lower(): v for k, v in fixture.get("search", {}).items()}
+        self._summaries = {k.lower(): v for k, v in fixture.get("summaries", {}).items()}
+        self._instant = {k.lower(): v for k, v in fixture.get("instant", {}).items()}
+
+    def _wait(self, timeout):
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+            if self.latency > timeout:
+                raise TimeoutError("fixture latency exceeds timeout")
+
+    def search(self, query, limit, timeout):
+        self._wait(timeout)
+        return list(self._search.get(query.lower().strip(), []))[:limit]
+
+    def summary(self, title, sentences, timeout):
+        self._wait(timeout)
+        text = self._summaries.get(title.lower())
+        if not text:
+            return None
+        return ". ".join(text.split(". ")[:sentences])
+
+    def instant_answer(self, query, timeout):
+        self._wait(timeout)
+        return self._instant.get(query.lower().strip())
+
+    async def _wait_async(self, timeout):
+        if self.latency:
+            await asyncio.sleep(min(self.latency, timeout))
+            if self.latency > timeout:
+                raise TimeoutError("fixture latency exceeds timeout")
+
+    async def search_async(self, query, limit, timeout):
+        await self._wait_async(timeout)
+        return list(self._search.get(query.lower().strip(), []))[:limit]
+
+    async def summary_async(self, title, sentences, timeout):
+        await self._wait_async(timeout)
+        text = self._summaries.get(title.lower())
+        if not text:
+            return None
+        return ". ".join(text.split(". ")[:sentences])
+
+    async def instant_answer_async(self, query, timeout):
+        await self._wait_async(timeout)
+        return self._instant.get(query.lower().strip())
+
+
+# ============================================================
+# LOOKUP LAYER
+# ============================================================
+
+class _TTLCache:
+    def __init__(self, ttl, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item and time.time() - item[0] <= self.ttl:
+                return True, item[1]
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                # drop the oldest quarter in one go
+                for k, _ in sorted(self._data.items(), key=lambda kv: kv[1][0])[: self.max_entries // 4]:
+                    del self._data[k]
+            self._data[key] = (time.time(), value)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LookupResult:
+    """Outcome of one speculative lookup; fields are None when a source had nothing."""
+
+    def __init__(self, person=None, wiki=None, ddg=None):
+        self.person = person   # summary text for a who-is name
+        self.wiki = wiki       # (title, summary)
+        self.ddg = ddg         # DuckDuckGo abstract text
+
+
+class KnowledgeLookup:
+    def __init__(self, backend=None, cache_ttl=KNOWLEDGE_CACHE_TTL, max_workers=KNOWLEDGE_WORKERS,
+                 deadline=KNOWLEDGE_DEADLINE, fanout=KNOWLEDGE_FANOUT):
+        self.backend = backend or self._default_backend()
+        self.deadline = deadline
+        self.fanout = max(1, fanout)
+        self.cache = _TTLCache(cache_ttl)
+        # Separate pools: top-level lookups wait on summary fan-out tasks,
+        # so sharing one pool could starve it under load.
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="knowledge")
+        self.fetch_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="knowledge-fetch")
+
+        # Bumped from pool threads; `+=` on an attribute is not atomic
+        self._stats_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def _default_backend():
+        if KNOWLEDGE_FIXTURE:
+            return FixtureBackend(KNOWLEDGE_FIXTURE)
+        return WebKnowledgeBackend()
+
+    def set_backend(self, backend):
+        """Swap the knowledge source (e.g. a FixtureBackend in tests) and drop cached results."""
+        self.backend = backend
+        self.cache = _TTLCache(self.cache.ttl)
+
+    # ------------------------------------------------------------
+    # Cached primitives
+    # ------------------------------------------------------------
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _cache_get(self, key):
+        hit, value = self.cache.get(key)
+        self._count("cache_hits" if hit else "cache_misses")
+        return hit, value
+
+    def _cached(self, key, fn, timeout):
+        hit, value = self._cache_get(key)
+        if hit:
+            return value
+        value = fn(max(0.05, timeout))
+        self.cache.set(key, value)
+        return value
+
+    def search(self, query, limit=10, timeout=WIKI_TIMEOUT):
+        return self._cached(("search", query.lower().strip(), limit),
+                            lambda t: self.backend.search(query, limit, t), timeout)
+
+    def summary(self, title, sentences=3, timeout=WIKI_TIMEOUT):
+        return self._cached(("summary", title, sentences),
+                            lambda t: self.backend.summary(title, sentences, t), timeout)
+
+    def instant_answer(self, query, timeout=DDG_TIMEOUT):
+        return self._cached(("ddg", query.lower().strip()),
+                            lambda t: self.backend.instant_answer(query, t), timeout)
+
+    # ------------------------------------------------------------
+    # Composite lookups
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _remaining(deadline_at):
+        return deadline_at - time.monotonic()
+
+    def _wait(self, fut, deadline_at):
+        """Result of fut, or None on error / when the deadline passes first."""
+        try:
+            return fut.result(timeout=max(0.0, self._remaining(deadline_at)))
+        except FutureTimeout:
+            self._count("timeouts")
+            return None
+        except Exception:
+            return None
+
+    def wiki_summary(self, query, deadline_at=None):
+        """
+        (title, summary) for the best non-blacklisted search hit, or None.
+        Candidate summaries are fetched `fanout` at a time, in parallel, and
+        the earliest-ranked success wins (same preference as a serial scan).
+        """
+        deadline_at = deadline_at or time.monotonic() + self.deadline
+        try:
+            results = self.search(query, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at)))
+        except Exception:
+            return None
+        if not results:
+            return None
+
+        candidates = [t for t in results if not any(b in t.lower() for b in TITLE_BLACKLIST)]
+        for start in range(0, len(candidates), self.fanout):
+            chunk = candidates[start:start + self.fanout]
+            timeout = min(WIKI_TIMEOUT, self._remaining(deadline_at))
+            futures = [self.fetch_pool.submit(self.summary, title, 3, timeout) for title in chunk]
+            for title, fut in zip(chunk, futures):
+                summary = self._wait(fut, deadline_at)
+                if summary:
+                    return title, summary
+            if self._remaining(deadline_at) <= 0:
+                return None
+
+        # fallback
+        title = results[0]
+        try:
+            summary = self.summary(title, 3, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at)))
+        except Exception:
+            return None
+        return (title, summary) if summary else None
+
+    def person_summary(self, name, deadline_at=None):
+        """
+        Summary for a who-is name, or None. The page titled exactly `name`
+        (redirects followed) wins; if it is missing or a disambiguation page,
+        the top search hit is used instead. The search starts alongside the
+        exact-title fetch so the fallback costs no extra round trip.
+        """
+        deadline_at = deadline_at or time.monotonic() + self.deadline
+        timeout = min(WIKI_TIMEOUT, self._remaining(deadline_at))
+        search_fut = self.fetch_pool.submit(self.search, name, 1, timeout)
+        try:
+            summary = self.summary(name, 3, timeout=timeout)
+        except Exception:
+            summary = None
+        if summary:
+            return summary
+
+        results = self._wait(search_fut, deadline_at)
+        if not results or results[0] == name:
+            return None
+        try:
+            return self.summary(results[0], 3, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at)))
+        except Exception:
+            return None
+
+    def lookup(self, query, person=None, deadline=None):
+        """
+        Speculative lookup for the router: the who-is summary (if `person`),
+        the Wikipedia summary and the DuckDuckGo answer all start at once.
+        Results are consumed in router priority order, so a Wikipedia hit
+        returns without waiting for DuckDuckGo.
+        """
+        deadline_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+        ddg_fut = self.pool.submit(self._safe_instant_answer, query, deadline_at)
+        wiki_fut = self.pool.submit(self.wiki_summary, query, deadline_at)
+
+        if person:
+            summary = self.person_summary(person, deadline_at)
+            if summary:
+                return LookupResult(person=summary)
+
+        wiki = self._wait(wiki_fut, deadline_at)
+        if wiki:
+            return LookupResult(wiki=wiki)
+
+        return LookupResult(ddg=self._wait(ddg_fut, deadline_at))
+
+    def _safe_instant_answer(self, query, deadline_at):
+        try:
+            return self.instant_answer(query, timeout=min(DDG_TIMEOUT, self._remaining(deadline_at)))
+        except Exception:
+            return None
+
+    # ------------------------------------------------------------
+    # Async (event loop) path — same cache, priorities and deadline
+    # ------------------------------------------------------------
+
+    async def _cached_async(self, key, fn, timeout):
+        hit, value = self._cache_get(key)
+        if hit:
+            return value
+        value = await fn(max(0.05, timeout))
+        self.cache.set(key, value)
+        return value
+
+    async def search_async(self, query, limit=10, timeout=WIKI_TIMEOUT):
+        return await self._cached_async(("search", query.lower().strip(), limit),
+                                        lambda t: self.backend.search_async(query, limit, t), timeout)
+
+    async def summary_async(self, title, sentences=3, timeout=WIKI_TIMEOUT):
+        return await self._cached_async(("summary", title, sentences),
+                                        lambda t: self.backend.summary_async(title, sentences, t), timeout)
+
+    async def instant_answer_async(self, query, timeout=DDG_TIMEOUT):
+        return await self._cached_async(("ddg", query.lower().strip()),
+                                        lambda t: self.backend.instant_answer_async(query, t), timeout)
+
+    async def _wait_async(self, aw, deadline_at):
+        """Result of an awaitable, or None on error / when the deadline passes first."""
+        try:
+            return await asyncio.wait_for(aw, timeout=max(0.0, self._remaining(deadline_at)))
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            return None
+        except Exception:
+            return None
+
+    async def wiki_summary_async(self, query, deadline_at=None):
+        """wiki_summary() as coroutines: each candidate chunk is fetched with gather()."""
+        deadline_at = deadline_at or time.monotonic() + self.deadline
+        results = await self._wait_async(
+            self.search_async(query, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at))), deadline_at)
+        if not results:
+            return None
+
+        candidates = [t for t in results if not any(b in t.lower() for b in TITLE_BLACKLIST)]
+        for start in range(0, len(candidates), self.fanout):
+            chunk = candidates[start:start + self.fanout]
+            timeout = min(WIKI_TIMEOUT, self._remaining(deadline_at))
+            tasks = [asyncio.ensure_future(self.summary_async(title, 3, timeout)) for title in chunk]
+            try:
+                for title, task in zip(chunk, tasks):
+                    summary = await self._wait_async(asyncio.shield(task), deadline_at)
+                    if summary:
+                        return title, summary
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if self._remaining(deadline_at) <= 0:
+                return None
+
+        # fallback
+        title = results[0]
+        summary = await self._wait_async(
+            self.summary_async(title, 3, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at))), deadline_at)
+        return (title, summary) if summary else None
+
+    async def person_summary_async(self, name, deadline_at=None):
+        """person_summary() as coroutines: exact title first, then the top search hit."""
+        deadline_at = deadline_at or time.monotonic() + self.deadline
+        timeout = min(WIKI_TIMEOUT, self._remaining(deadline_at))
+        search_task = asyncio.ensure_future(self.search_async(name, limit=1, timeout=timeout))
+        try:
+            summary = await self._wait_async(self.summary_async(name, 3, timeout=timeout), deadline_at)
+            if summary:
+                return summary
+
+            results = await self._wait_async(asyncio.shield(search_task), deadline_at)
+            if not results or results[0] == name:
+                return None
+            return await self._wait_async(
+                self.summary_async(results[0], 3, timeout=min(WIKI_TIMEOUT, self._remaining(deadline_at))), deadline_at)
+        finally:
+            search_task.cancel()
+
+    async def lookup_async(self, query, person=None, deadline=None):
+        """lookup() on the event loop: the speculative sources are tasks, not pool threads."""
+        deadline_at = time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+        ddg_task = asyncio.ensure_future(self.instant_answer_async(
+            query, timeout=min(DDG_TIMEOUT, self._remaining(deadline_at))))
+        wiki_task = asyncio.ensure_future(self.wiki_summary_async(query, deadline_at))
+        try:
+            if person:
+                summary = await self.person_summary_async(person, deadline_at)
+                if summary:
+                    return LookupResult(person=summary)
+
+            wiki = await self._wait_async(asyncio.shield(wiki_task), deadline_at)
+            if wiki:
+                return LookupResult(wiki=wiki)
+
+            return LookupResult(ddg=await self._wait_async(asyncio.shield(ddg_task), deadline_at))
+        finally:
+            # Unlike pool threads, leftover tasks can be stopped outright
+            for task in (ddg_task, wiki_task):
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "cached": len(self.cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "timeouts": self.timeouts,
+        }
+
+
+# Shared instance used by app.py
+knowledge = KnowledgeLookup()
@@ -225,6 +225,16 @@ app.post('/weather/probability', (req, res) => {
   return res.json(buildWeatherData(req.body || {}));
 });
 
+app.post('/weather/probability/batch', (req, res) => {
+  const { locations = [], date_ranges, date_range, pairwise, dataset_mode } = req.body || {};
+  const ranges = date_ranges || (date_range ? [date_range] : []);
+  const items = pairwise
+    ? locations.map((location, i) => [location, ranges[i]])
+    : locations.flatMap((location) => ranges.map((range) => [location, range]));
+  const results = items.map(([location, range]) => buildWeatherData({ location, date_range: range, dataset_mode }));
+  return res.json({ results, count: results.length, seed: null });
+});
+
 app.post('/weather/compare', (req, res) => {
   const { locations = [], date_range, dataset_mode } = req.body || {};
   const comparison_results = locations.slice(0, 3).map((loc) => buildWeatherData({ location: loc, date_range, dataset_mode }));
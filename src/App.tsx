@@ -113,31 +113,27 @@ function App() {
   const handleComparisonSubmit = async (locations: LocationInput[], startDate: string, endDate?: string, datasetMode?: 'IMD' | 'Global' | 'Combined') => {
     setIsLoading(true);
     try {
-      // Make API calls for each location
-      const comparisonPromises = locations.map(async (location) => {
-        const response = await fetch('http://localhost:8000/weather/probability', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-        location,
-        date_range: {
-          start_date: startDate,
-          end_date: endDate
+      // One batch call for all locations
+      const response = await fetch('http://localhost:8000/weather/probability/batch', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
         },
-            dataset_mode: datasetMode
-          })
-        });
-
-        if (!response.ok) {
-          throw new Error(`API Error: ${response.status}`);
-        }
-
-        return await response.json();
+        body: JSON.stringify({
+          locations,
+          date_ranges: [{
+            start_date: startDate,
+            end_date: endDate
+          }],
+          dataset_mode: datasetMode
+        })
       });
 
-      const comparisonResults = await Promise.all(comparisonPromises);
+      if (!response.ok) {
+        throw new Error(`API Error: ${response.status}`);
+      }
+
+      const comparisonResults = (await response.json()).results;
       
       // Create a combined comparison result
       const comparisonData = {